@@ -0,0 +1,118 @@
+"""
+Per-endpoint admission control.
+
+Each endpoint gets an AdmissionGate: at most max_concurrent requests run at
+once, at most max_queue more wait for a slot (each for at most queue_timeout
+seconds), and everything beyond that is shed immediately so the caller can
+answer 503 with a Retry-After header. Because every endpoint has its own
+gate, a burst of slow prescription extractions can only occupy its own
+slots and never the capacity reserved for fever predictions.
+
+Limits apply per serving process. A request holds a server thread while it
+runs and while it waits in the queue, so check_thread_budget makes sure the
+slow endpoints can never take every thread of a worker.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator
+
+
+class AdmissionGate:
+    """A concurrency limit with a bounded, time-limited wait queue."""
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrent: int,
+        max_queue: int = 0,
+        queue_timeout: float = 0.0,
+        retry_after: int = 1,
+    ):
+        if max_concurrent < 1:
+            raise ValueError(f"{name}: max_concurrent must be at least 1")
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = max(0.0, queue_timeout)
+        self.retry_after = retry_after
+
+        self._slots = threading.Condition()
+        self._in_flight = 0
+        self._queued = 0
+        self._admitted = 0
+        self._shed_queue_full = 0
+        self._shed_timeout = 0
+        self._peak_queued = 0
+        self._wait_seconds = 0.0
+
+    def acquire(self) -> bool:
+        """Take a slot, waiting in the queue if there is room; False means the request was shed."""
+        with self._slots:
+            if self._in_flight < self.max_concurrent:
+                self._in_flight += 1
+                self._admitted += 1
+                return True
+            if self._queued >= self.max_queue:
+                self._shed_queue_full += 1
+                return False
+
+            self._queued += 1
+            self._peak_queued = max(self._peak_queued, self._queued)
+            start = time.monotonic()
+            deadline = start + self.queue_timeout
+            try:
+                while self._in_flight >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._shed_timeout += 1
+                        return False
+                    self._slots.wait(remaining)
+                self._in_flight += 1
+                self._admitted += 1
+                self._wait_seconds += time.monotonic() - start
+                return True
+            finally:
+                self._queued -= 1
+
+    def release(self):
+        with self._slots:
+            self._in_flight -= 1
+            self._slots.notify()
+
+    @contextmanager
+    def slot(self) -> Iterator[bool]:
+        """Context manager form of acquire/release; yields whether the request was admitted."""
+        admitted = self.acquire()
+        try:
+            yield admitted
+        finally:
+            if admitted:
+                self.release()
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        with self._slots:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "queue_timeout_s": self.queue_timeout,
+                "in_flight": self._in_flight,
+                "queued": self._queued,
+                "peak_queued": self._peak_queued,
+                "admitted": self._admitted,
+                "shed_queue_full": self._shed_queue_full,
+                "shed_timeout": self._shed_timeout,
+                "avg_queue_wait_ms": self._wait_seconds / self._admitted * 1000 if self._admitted else 0.0,
+            }
+
+
+def check_thread_budget(gates: Iterable[AdmissionGate], threads: int):
+    """Raise ValueError unless the gates' running and queued requests together leave at least one of threads free."""
+    gates = list(gates)
+    held = sum(gate.max_concurrent + gate.max_queue for gate in gates)
+    if held >= threads:
+        names = " and ".join(gate.name for gate in gates)
+        raise ValueError(f"{names} can hold {held} of {threads} server threads while running or queued; "
+                         "lower their concurrency and queue limits or raise GUNICORN_THREADS")
@@ -1,21 +1,48 @@
+import atexit
+import csv
+import functools
+import hashlib
+import io
 import json
 import logging
 import os
 import pickle
+import re
+import threading
+import time
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import threading_profiles
+
+# Per-worker XGBoost threads and BLAS/OpenMP caps; the caps must be set before numpy is imported
+threading_profile = threading_profiles.serving_profile().apply_env()
 
 import numpy as np
 import pandas as pd
 from dotenv import load_dotenv
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, stream_with_context
 from flask_cors import CORS
-from PIL import Image
+from PIL import Image, ImageDraw
 from google.api_core import exceptions as google_exceptions
 import google.generativeai as genai
 import pytesseract
 import xgboost as xgb
 
+from admission import AdmissionGate, check_thread_budget
+from audit_log import PredictionAuditLog
+from cascade import ConfidenceCascade
+from drift_monitor import DriftMonitor
+from hedging import HedgingPolicy
+from model_registry import ModelRegistry
+from prescription_filter import filter_medication_lines
+from response_builder import JSON_MIMETYPE, NDJSON_MIMETYPE, SSE_MIMETYPE, PredictionResponseBuilder, dumps
+from rules_engine import Rule, RuleSet, feature_columns
+from sensitivity import SweepCache, build_grid, parse_axes, summarize
+from shap_explainer import ContributionExplainer
+from streaming_json import IncrementalObjectParser
+from symptom_matcher import SymptomMatcher
+
 load_dotenv()
 
 app = Flask(__name__)
@@ -64,19 +91,274 @@ if MODEL_NAME == DEFAULT_MODEL:
 else:
     logger.info("Using custom Gemini model: %s", MODEL_NAME)
 
+# Gemini replies are constrained to this schema (structured JSON output), so they always parse.
+# The raw OCR text is not part of it: the server adds extracted_text itself.
+MEDICATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "medication_name": {"type": "string"},
+        "medication_type": {"type": "string", "format": "enum", "enum": ["Antipyretic", "Antibiotic", "Antiviral", "Other"]},
+        "dosage": {"type": "string", "nullable": True},
+        "frequency": {"type": "string", "nullable": True},
+        "duration_days": {"type": "integer", "nullable": True},
+        "confidence": {"type": "string", "format": "enum", "enum": ["high", "medium", "low"]},
+    },
+    "required": ["medication_name", "medication_type", "dosage", "frequency", "duration_days", "confidence"],
+}
+# Set to false for models without structured output support; the prompt then asks for JSON instead
+GEMINI_STRUCTURED_OUTPUT = os.getenv("GEMINI_STRUCTURED_OUTPUT", "true").lower() in ("1", "true", "yes")
+GEMINI_GENERATION_CONFIG = (
+    genai.GenerationConfig(response_mime_type="application/json", response_schema=MEDICATION_SCHEMA)
+    if GEMINI_STRUCTURED_OUTPUT else None
+)
+# OCR text sent to Gemini is pre-filtered to medication-relevant lines and capped at this length
+GEMINI_MAX_PROMPT_TEXT_CHARS = int(os.getenv("GEMINI_MAX_PROMPT_TEXT_CHARS", "2000"))
+
+# Tail-latency hedging and quota failover. A call still running at the GEMINI_HEDGE_PERCENTILE latency of
+# recent calls is hedged (GEMINI_HEDGE: "fallback" model, "same" model or "off"); the first valid reply wins.
+GEMINI_FALLBACK_MODEL = os.getenv("GEMINI_FALLBACK_MODEL", "models/gemini-flash-lite-latest")
+GEMINI_FAILOVER_ON_QUOTA = os.getenv("GEMINI_FAILOVER_ON_QUOTA", "true").lower() in ("1", "true", "yes")
+GEMINI_REQUEST_TIMEOUT_S = float(os.getenv("GEMINI_REQUEST_TIMEOUT_S", "60"))
+gemini_hedging = HedgingPolicy(
+    MODEL_NAME,
+    fallback_model=GEMINI_FALLBACK_MODEL if GEMINI_FALLBACK_MODEL != MODEL_NAME else None,
+    mode=os.getenv("GEMINI_HEDGE", "fallback").lower(),
+    percentile=float(os.getenv("GEMINI_HEDGE_PERCENTILE", "95")),
+    min_samples=int(os.getenv("GEMINI_HEDGE_MIN_SAMPLES", "20")),
+    initial_delay=float(os.getenv("GEMINI_HEDGE_INITIAL_DELAY_S", "10")),
+    min_delay=float(os.getenv("GEMINI_HEDGE_MIN_DELAY_S", "1")),
+    failover_on=(google_exceptions.ResourceExhausted,) if GEMINI_FAILOVER_ON_QUOTA else (),
+)
+
+# Prompt size, latency and parse-failure counters for /api/extract-medication/stats
+extraction_stats: Dict[str, float] = {
+    "calls": 0,
+    "parse_failures": 0,
+    "ocr_chars": 0,
+    "prompt_chars": 0,
+    "prompt_tokens": 0,
+    "output_tokens": 0,
+    "gemini_seconds": 0.0,
+}
+_extraction_stats_lock = threading.Lock()
+
+
+def _record_extraction(**values: float):
+    with _extraction_stats_lock:
+        for key, value in values.items():
+            extraction_stats[key] += value
+
+
+# Per-endpoint admission control: concurrent requests, waiting requests, seconds a request may wait,
+# and the Retry-After sent when a request is shed. Limits apply per serving process.
+PREDICT_MAX_CONCURRENT = int(os.getenv("PREDICT_MAX_CONCURRENT", "16"))
+PREDICT_MAX_QUEUE = int(os.getenv("PREDICT_MAX_QUEUE", "64"))
+PREDICT_QUEUE_TIMEOUT_S = float(os.getenv("PREDICT_QUEUE_TIMEOUT_S", "1"))
+EXTRACT_MAX_CONCURRENT = int(os.getenv("EXTRACT_MAX_CONCURRENT", "2"))
+EXTRACT_MAX_QUEUE = int(os.getenv("EXTRACT_MAX_QUEUE", "2"))
+EXTRACT_QUEUE_TIMEOUT_S = float(os.getenv("EXTRACT_QUEUE_TIMEOUT_S", "15"))
+BULK_MAX_CONCURRENT = int(os.getenv("BULK_MAX_CONCURRENT", "1"))
+BULK_MAX_QUEUE = int(os.getenv("BULK_MAX_QUEUE", "0"))
+# Threads per serving process (gunicorn.conf.py exports GUNICORN_THREADS)
+SERVER_THREADS = int(os.getenv("GUNICORN_THREADS", "8"))
+
+admission_gates = {
+    "predict-fever": AdmissionGate("predict-fever", PREDICT_MAX_CONCURRENT, PREDICT_MAX_QUEUE,
+                                   PREDICT_QUEUE_TIMEOUT_S, retry_after=1),
+    "extract-medication": AdmissionGate("extract-medication", EXTRACT_MAX_CONCURRENT, EXTRACT_MAX_QUEUE,
+                                        EXTRACT_QUEUE_TIMEOUT_S, retry_after=10),
+    "predict-fever-bulk": AdmissionGate("predict-fever-bulk", BULK_MAX_CONCURRENT, BULK_MAX_QUEUE,
+                                        retry_after=30),
+}
+# Extractions and bulk streams hold a thread for seconds to minutes, running or queued; refuse to start
+# if they could take every thread and leave fever predictions none
+check_thread_budget([admission_gates["extract-medication"], admission_gates["predict-fever-bulk"]], SERVER_THREADS)
+
+
+def _shed_response(gate: AdmissionGate):
+    """503 for a request the endpoint's admission gate turned away."""
+    response = jsonify({
+        "error": f"Server is busy ({gate.name}). Please retry later.",
+        "retry_after": gate.retry_after,
+    })
+    response.status_code = 503
+    response.headers["Retry-After"] = str(gate.retry_after)
+    return response
+
+
+def admission_controlled(gate: AdmissionGate):
+    """Run the view only when its endpoint's gate admits the request."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            with gate.slot() as admitted:
+                if not admitted:
+                    return _shed_response(gate)
+                return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
 # Load XGBoost fever prediction model
 FEVER_MODEL_DIR = Path(__file__).parent / "models"
 FEVER_MODEL_PATH = FEVER_MODEL_DIR / "fever_model.pkl"
 FEVER_FEATURE_NAMES_PATH = FEVER_MODEL_DIR / "feature_names.json"
 FEVER_LABEL_ENCODER_PATH = FEVER_MODEL_DIR / "label_encoder.pkl"
+FEVER_REFERENCE_PROFILE_PATH = FEVER_MODEL_DIR / "reference_profile.json"
+FEVER_CASCADE_MODEL_PATH = FEVER_MODEL_DIR / "fever_cascade.pkl"
+FEVER_CASCADE_CONFIG_PATH = FEVER_MODEL_DIR / "cascade.json"
+
+# Cascade inference: a small first-stage model answers confident requests (train_fever_model.py --cascade)
+FEVER_CASCADE = os.getenv("FEVER_CASCADE", "false").lower() in ("1", "true", "yes")
+
+# Per-clinic or per-cohort models live in FEVER_MODEL_DIR/<key>/ with the same files as the default model.
+# Requests select one with the X-Model-Key header (or a "model_key" body field); the default is always loaded.
+DEFAULT_MODEL_KEY = "default"
+MODEL_KEY_HEADER = "X-Model-Key"
+MODEL_KEY_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+# Estimated memory (serialized model size) the loaded models may use before idle ones are evicted
+MODEL_REGISTRY_MEMORY_MB = float(os.getenv("MODEL_REGISTRY_MEMORY_MB", "512"))
+
+# Input-drift monitor (/api/drift): requests buffered between histogram updates, and requests needed for a verdict
+DRIFT_BUFFER_SIZE = int(os.getenv("DRIFT_BUFFER_SIZE", "1024"))
+DRIFT_MIN_SAMPLES = int(os.getenv("DRIFT_MIN_SAMPLES", "100"))
+
+# Prediction audit log: Parquet segments written in the background (see audit_log.py for the trade-offs)
+AUDIT_LOG_ENABLED = os.getenv("AUDIT_LOG_ENABLED", "true").lower() in ("1", "true", "yes")
+AUDIT_LOG_DIR = Path(os.getenv("AUDIT_LOG_DIR", Path(__file__).parent / "audit_log"))
+AUDIT_BUFFER_SIZE = int(os.getenv("AUDIT_BUFFER_SIZE", "10000"))
+AUDIT_FLUSH_INTERVAL_S = float(os.getenv("AUDIT_FLUSH_INTERVAL_S", "1"))
+AUDIT_FLUSH_ROWS = int(os.getenv("AUDIT_FLUSH_ROWS", "1000"))
+AUDIT_SEGMENT_ROWS = int(os.getenv("AUDIT_SEGMENT_ROWS", "100000"))
+AUDIT_SEGMENT_SECONDS = float(os.getenv("AUDIT_SEGMENT_SECONDS", "3600"))
+AUDIT_RETENTION_DAYS = float(os.getenv("AUDIT_RETENTION_DAYS", "30"))
+AUDIT_FSYNC = os.getenv("AUDIT_FSYNC", "false").lower() in ("1", "true", "yes")
+AUDIT_ON_FULL = os.getenv("AUDIT_ON_FULL", "drop").lower()
+
+# Opt-in TreeSHAP key factors (?explain=shap): time allowed before falling back to the rule-based factors
+SHAP_LATENCY_BUDGET_MS = float(os.getenv("SHAP_LATENCY_BUDGET_MS", "25"))
+SHAP_MAX_BATCH = int(os.getenv("SHAP_MAX_BATCH", "64"))
+SHAP_MAX_WAIT_MS = float(os.getenv("SHAP_MAX_WAIT_MS", "2"))
+SHAP_CACHE_SIZE = int(os.getenv("SHAP_CACHE_SIZE", "4096"))
+SHAP_APPROXIMATE = os.getenv("SHAP_APPROXIMATE", "false").lower() in ("1", "true", "yes")
+
+# Records scored per predict_proba call by /api/predict-fever/bulk
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "1000"))
+
+# What-if sweeps (/api/predict-fever/sweep): grid size limit, cached sweeps per model, rounding
+SWEEP_MAX_POINTS = int(os.getenv("SWEEP_MAX_POINTS", "2500"))
+SWEEP_CACHE_SIZE = int(os.getenv("SWEEP_CACHE_SIZE", "1024"))
+SWEEP_PRECISION = int(os.getenv("SWEEP_PRECISION", "4"))
+# Frontend names accepted for swept features, besides the model feature names
+SWEEP_FEATURE_ALIASES = {
+    "temperature": "Temperature",
+    "age": "Age",
+    "bmi": "BMI",
+    "duration": "Fever_Duration",
+    "compliance": "Compliance_Rate",
+}
+
+class FeverModel:
+    """One servable fever model: the classifier, its metadata and its per-model helpers."""
+    
+    def __init__(self, key: str, model: xgb.XGBClassifier, label_encoder: Any, feature_names: list, version: str,
+                 explainer: ContributionExplainer, drift_monitor: Optional[DriftMonitor],
+                 cascade: Optional[ConfidenceCascade] = None):
+        self.key = key
+        self.model = model
+        self.label_encoder = label_encoder
+        self.feature_names = feature_names
+        self.version = version  # Short SHA-256 of fever_model.pkl
+        self.explainer = explainer
+        self.drift_monitor = drift_monitor
+        self.cascade = cascade  # Scores requests instead of model when FEVER_CASCADE is enabled
+        self.sweep_cache = SweepCache(SWEEP_CACHE_SIZE)
+
+
+def _model_directory(key: str) -> Path:
+    if key == DEFAULT_MODEL_KEY:
+        return FEVER_MODEL_DIR
+    if not MODEL_KEY_PATTERN.match(key):
+        raise FileNotFoundError(f"Invalid model key: {key!r}")
+    return FEVER_MODEL_DIR / key
+
+
+def _load_fever_model_files(key: str) -> Tuple[FeverModel, int]:
+    """Load the model stored under key; returns it with its serialized size as the memory estimate."""
+    directory = _model_directory(key)
+    model_path = directory / FEVER_MODEL_PATH.name
+    if not model_path.exists():
+        raise FileNotFoundError(f"No fever model {key!r} at {model_path}")
+    
+    with open(model_path, 'rb') as f:
+        model_bytes = f.read()
+    model = pickle.loads(model_bytes)
+    threading_profile.configure(model)
+    
+    with open(directory / FEVER_LABEL_ENCODER_PATH.name, 'rb') as f:
+        label_encoder = pickle.load(f)
+    
+    with open(directory / FEVER_FEATURE_NAMES_PATH.name, 'r') as f:
+        feature_names = json.load(f)
+    
+    explainer = ContributionExplainer(
+        model.get_booster(), feature_names,
+        max_batch=SHAP_MAX_BATCH, max_wait_ms=SHAP_MAX_WAIT_MS, cache_size=SHAP_CACHE_SIZE,
+        approximate=SHAP_APPROXIMATE
+    )
+    
+    monitor = None
+    reference_path = directory / FEVER_REFERENCE_PROFILE_PATH.name
+    if reference_path.exists():
+        monitor = DriftMonitor.from_file(reference_path, feature_names, label_encoder.classes_,
+                                         buffer_size=DRIFT_BUFFER_SIZE, min_samples=DRIFT_MIN_SAMPLES)
+    else:
+        logger.warning(f"No drift reference profile at {reference_path}; drift is not monitored for {key!r}.")
+    
+    version = hashlib.sha256(model_bytes).hexdigest()[:12]
+    cascade, cascade_bytes = _load_cascade(directory, key, model, version) if FEVER_CASCADE else (None, 0)
+    fever = FeverModel(key, model, label_encoder, feature_names, version, explainer, monitor, cascade)
+    return fever, len(model_bytes) + cascade_bytes
+
+
+def _load_cascade(directory: Path, key: str, model: xgb.XGBClassifier, version: str) -> Tuple[Optional[ConfidenceCascade], int]:
+    """The cascade calibrated for this exact model, or None (with a warning) if there is none."""
+    model_path = directory / FEVER_CASCADE_MODEL_PATH.name
+    config_path = directory / FEVER_CASCADE_CONFIG_PATH.name
+    if not model_path.exists() or not config_path.exists():
+        logger.warning(f"FEVER_CASCADE is set but model {key!r} has no cascade; run train_fever_model.py --cascade.")
+        return None, 0
+    with open(config_path, 'r') as f:
+        config = json.load(f)
+    if config.get("model_version") != version:
+        logger.warning(f"Cascade for {key!r} was calibrated for model {config.get('model_version')}, not {version}; "
+                       "scoring without it. Retrain with --cascade.")
+        return None, 0
+    with open(model_path, 'rb') as f:
+        first_stage_bytes = f.read()
+    first_stage = pickle.loads(first_stage_bytes)
+    threading_profile.configure(first_stage)
+    logger.info(f"Cascade enabled for {key!r}: threshold {config['threshold']:.4f}, "
+                f"held-out exit rate {config['report']['exit_rate']:.1%}")
+    return ConfidenceCascade(first_stage, model, config["threshold"]), len(first_stage_bytes)
+
 
+model_registry = ModelRegistry(_load_fever_model_files, int(MODEL_REGISTRY_MEMORY_MB * 2**20),
+                               pinned=(DEFAULT_MODEL_KEY,))
+
+# The default model, also exposed piecewise for the rest of the module and for score_patients.py
+default_fever_model: Optional[FeverModel] = None
 fever_model: Optional[xgb.XGBClassifier] = None
 fever_label_encoder: Optional[Any] = None
 fever_feature_names: Optional[list] = None
+fever_model_version: Optional[str] = None  # Short SHA-256 of fever_model.pkl
+shap_explainer: Optional[ContributionExplainer] = None
+drift_monitor: Optional[DriftMonitor] = None
+audit_log: Optional[PredictionAuditLog] = None
 
 def load_fever_model():
     """Load XGBoost fever prediction model on startup."""
-    global fever_model, fever_label_encoder, fever_feature_names
+    global default_fever_model, fever_model, fever_label_encoder, fever_feature_names, fever_model_version
+    global shap_explainer, drift_monitor, audit_log
     
     try:
         if not FEVER_MODEL_PATH.exists():
@@ -85,18 +367,31 @@ def load_fever_model():
         
         logger.info(f"Loading fever prediction model from {FEVER_MODEL_PATH}...")
         
-        with open(FEVER_MODEL_PATH, 'rb') as f:
-            fever_model = pickle.load(f)
-        
-        with open(FEVER_LABEL_ENCODER_PATH, 'rb') as f:
-            fever_label_encoder = pickle.load(f)
+        default_fever_model = model_registry.get(DEFAULT_MODEL_KEY)
+        fever_model = default_fever_model.model
+        fever_label_encoder = default_fever_model.label_encoder
+        fever_feature_names = default_fever_model.feature_names
+        fever_model_version = default_fever_model.version
+        shap_explainer = default_fever_model.explainer
+        drift_monitor = default_fever_model.drift_monitor
         
-        with open(FEVER_FEATURE_NAMES_PATH, 'r') as f:
-            fever_feature_names = json.load(f)
+        if AUDIT_LOG_ENABLED:
+            try:
+                audit_log = PredictionAuditLog(
+                    AUDIT_LOG_DIR, fever_feature_names, fever_label_encoder.classes_,
+                    capacity=AUDIT_BUFFER_SIZE, flush_interval=AUDIT_FLUSH_INTERVAL_S, flush_rows=AUDIT_FLUSH_ROWS,
+                    segment_rows=AUDIT_SEGMENT_ROWS, segment_seconds=AUDIT_SEGMENT_SECONDS,
+                    retention_days=AUDIT_RETENTION_DAYS, fsync=AUDIT_FSYNC, on_full=AUDIT_ON_FULL,
+                )
+                atexit.register(audit_log.close)
+            except ImportError:
+                logger.warning("pyarrow is not installed; the prediction audit log is disabled.")
         
         logger.info("✅ Fever prediction model loaded successfully!")
         logger.info(f"   Features: {fever_feature_names}")
         logger.info(f"   Classes: {fever_label_encoder.classes_.tolist()}")
+        logger.info(f"   Version: {fever_model_version}")
+        logger.info(f"   Threads: {threading_profile}")
     except Exception as e:
         logger.error(f"Failed to load fever model: {e}", exc_info=True)
         logger.warning("Fever prediction endpoint will not be available until model is loaded.")
@@ -104,36 +399,36 @@ def load_fever_model():
 # Load model on startup
 load_fever_model()
 
+# Symptom/comorbidity vocabulary, compiled once
+SYMPTOM_VOCABULARY_PATH = Path(os.getenv("SYMPTOM_VOCABULARY_PATH", Path(__file__).parent / "symptom_vocabulary.json"))
+symptom_matcher = SymptomMatcher.from_file(SYMPTOM_VOCABULARY_PATH)
+logger.info("Loaded symptom vocabulary (%d terms) from %s", symptom_matcher.term_count, SYMPTOM_VOCABULARY_PATH)
+
 
 def _build_gemini_prompt(extracted_text: str) -> str:
-    return (
-        "You are a medical text analyzer. Analyze this prescription text and extract medication information.\n\n"
-        "PRESCRIPTION TEXT:\n"
-        f"{extracted_text}\n\n"
-        "TASK:\n"
-        "1. Identify the medication name\n"
-        "2. Classify medication type:\n"
-        "   - Antipyretic (fever reducers: Paracetamol, Ibuprofen, Aspirin)\n"
-        "   - Antibiotic (bacteria killers: Amoxicillin, Azithromycin, etc.)\n"
-        "   - Antiviral (virus fighters: Oseltamivir, Acyclovir, etc.)\n"
-        "   - Other\n"
-        "3. Extract dosage, frequency, duration if present\n\n"
-        "RESPOND ONLY in valid JSON (no markdown, no extra text):\n"
-        "{\n"
-        "    \"medication_name\": \"exact name from prescription\",\n"
-        "    \"medication_type\": \"Antipyretic|Antibiotic|Antiviral|Other\",\n"
-        "    \"dosage\": \"amount and unit or null\",\n"
-        "    \"frequency\": \"times per day or schedule or null\",\n"
-        "    \"duration_days\": \"number of days or null\",\n"
-        "    \"confidence\": \"high|medium|low\",\n"
-        "    \"extracted_text\": \"the raw OCR text\"\n"
-        "}"
+    """Compact extraction prompt; the reply format is enforced by GEMINI_GENERATION_CONFIG."""
+    prompt = (
+        "Extract the prescribed medication from these prescription lines (OCR output, may contain errors).\n"
+        "medication_type: Antipyretic (fever reducers: Paracetamol, Ibuprofen, Aspirin), "
+        "Antibiotic (e.g. Amoxicillin, Azithromycin), Antiviral (e.g. Oseltamivir, Acyclovir) or Other.\n"
+        "Use null for dosage, frequency or duration_days when not stated.\n\n"
+        f"{extracted_text}"
     )
+    if not GEMINI_STRUCTURED_OUTPUT:
+        prompt += (
+            "\n\nRespond only with a JSON object with keys medication_name, medication_type, "
+            "dosage, frequency, duration_days, confidence (high|medium|low)."
+        )
+    return prompt
 
 
-def _parse_gemini_response(response: Any) -> Dict[str, Any]:
-    """Safely extract JSON payload from Gemini response."""
-    raw_text = getattr(response, "text", "")
+def _gemini_text(response: Any) -> str:
+    """Text of a Gemini response (or of one streamed chunk); empty if it has none."""
+    try:
+        raw_text = getattr(response, "text", "")
+    except ValueError:
+        # .text raises when the response or chunk carries no text parts
+        raw_text = ""
 
     if not raw_text and hasattr(response, "candidates"):
         # Fall back to candidates structure if text is not populated
@@ -146,7 +441,11 @@ def _parse_gemini_response(response: Any) -> Dict[str, Any]:
                     break
             if raw_text:
                 break
+    return raw_text or ""
+
 
+def _parse_gemini_json(raw_text: str) -> Dict[str, Any]:
+    """Parse the JSON object in Gemini's reply text."""
     if not raw_text:
         raise ValueError("Empty response from Gemini model")
 
@@ -163,7 +462,108 @@ def _parse_gemini_response(response: Any) -> Dict[str, Any]:
         raise ValueError("Failed to parse Gemini response as JSON") from exc
 
 
+def _parse_gemini_response(response: Any) -> Dict[str, Any]:
+    """Safely extract JSON payload from Gemini response."""
+    return _parse_gemini_json(_gemini_text(response))
+
+
+def _run_ocr(image_stream: Any) -> str:
+    """OCR text of an uploaded prescription image."""
+    image = Image.open(image_stream)
+    image = image.convert("RGB")  # Normalize to avoid mode-related OCR issues
+
+    logger.info("Running OCR on uploaded image")
+    extracted_text = pytesseract.image_to_string(image)
+    logger.info("Extracted text length: %d", len(extracted_text or ""))
+    return extracted_text
+
+
+def _gemini_prompt(extracted_text: str) -> str:
+    """Filter the OCR text down to medication lines and build the extraction prompt."""
+    prompt_text = filter_medication_lines(extracted_text, max_chars=GEMINI_MAX_PROMPT_TEXT_CHARS)
+    logger.info("Prompt text after filtering: %d of %d chars", len(prompt_text), len(extracted_text))
+    return _build_gemini_prompt(prompt_text)
+
+
+def _record_gemini_call(extracted_text: str, prompt: str, response: Any, seconds: float):
+    usage = getattr(response, "usage_metadata", None)
+    _record_extraction(
+        calls=1,
+        ocr_chars=len(extracted_text),
+        prompt_chars=len(prompt),
+        prompt_tokens=getattr(usage, "prompt_token_count", 0) or 0,
+        output_tokens=getattr(usage, "candidates_token_count", 0) or 0,
+        gemini_seconds=seconds,
+    )
+
+
+def _gemini_attempt(extracted_text: str, prompt: str) -> Callable[[str], Dict[str, Any]]:
+    """One Gemini call on a given model, parsed; an unparseable reply raises ValueError."""
+    def attempt(model_name: str) -> Dict[str, Any]:
+        model = genai.GenerativeModel(model_name, generation_config=GEMINI_GENERATION_CONFIG)
+        start = time.perf_counter()
+        response = model.generate_content(prompt, request_options={"timeout": GEMINI_REQUEST_TIMEOUT_S})
+        _record_gemini_call(extracted_text, prompt, response, time.perf_counter() - start)
+        try:
+            return _parse_gemini_response(response)
+        except ValueError:
+            _record_extraction(parse_failures=1)
+            raise
+    return attempt
+
+
+def _stream_gemini(prompt: str) -> Any:
+    """Start a streamed Gemini reply, failing over to the fallback model if the quota is exhausted."""
+    request_options = {"timeout": GEMINI_REQUEST_TIMEOUT_S}
+    model = genai.GenerativeModel(MODEL_NAME, generation_config=GEMINI_GENERATION_CONFIG)
+    try:
+        # Errors surface here: the first chunk is fetched before generate_content returns
+        return model.generate_content(prompt, stream=True, request_options=request_options)
+    except google_exceptions.ResourceExhausted:
+        if not (GEMINI_FAILOVER_ON_QUOTA and gemini_hedging.fallback_model):
+            raise
+        logger.warning("Gemini quota exceeded on %s, streaming from %s", MODEL_NAME, gemini_hedging.fallback_model)
+        gemini_hedging.count("failovers")
+        model = genai.GenerativeModel(gemini_hedging.fallback_model, generation_config=GEMINI_GENERATION_CONFIG)
+        return model.generate_content(prompt, stream=True, request_options=request_options)
+
+
+def _extraction_result(medication_data: Dict[str, Any], extracted_text: str) -> Dict[str, Any]:
+    medication_data["extracted_text"] = extracted_text
+    return {
+        "success": True,
+        "medication_data": medication_data,
+        "extracted_text": extracted_text,
+    }
+
+
+def _extraction_error(exc: Exception) -> Tuple[Dict[str, Any], int]:
+    """Error body and status for an exception raised during extraction."""
+    if isinstance(exc, pytesseract.TesseractNotFoundError):
+        logger.exception("Tesseract executable not found")
+        return {"error": "Tesseract OCR is not installed or not found in PATH."}, 500
+    if isinstance(exc, google_exceptions.ResourceExhausted):
+        logger.exception("Gemini quota exceeded")
+        if GEMINI_FAILOVER_ON_QUOTA and gemini_hedging.fallback_model:
+            return {"error": "Gemini quota exceeded on both the primary and the fallback model. Please wait a moment."}, 429
+        return {
+            "error": "Gemini quota exceeded. Please wait a moment or switch to a lighter model such as models/gemini-flash-lite-latest."
+        }, 429
+    if isinstance(exc, google_exceptions.GoogleAPIError):
+        logger.exception("Gemini API error")
+        return {"error": f"Gemini API error: {exc}"}, 502
+    if isinstance(exc, ValueError):
+        logger.exception("Validation error during extraction")
+        return {"error": str(exc)}, 500
+    logger.exception("Unexpected error during extraction")
+    return {"error": str(exc)}, 500
+
+
+NO_OCR_TEXT_ERROR = "Could not extract text from image. Please use a clearer photo."
+
+
 @app.route("/api/extract-medication", methods=["POST"])
+@admission_controlled(admission_gates["extract-medication"])
 def extract_medication():
     if request.method != "POST":
         return jsonify({"error": "Method not allowed"}), 405
@@ -175,60 +575,104 @@ def extract_medication():
         return jsonify({"error": "GEMINI_API_KEY is not configured"}), 500
 
     try:
-        image_file = request.files["image"]
-        image = Image.open(image_file.stream)
-        image = image.convert("RGB")  # Normalize to avoid mode-related OCR issues
-
-        logger.info("Running OCR on uploaded image")
-        extracted_text = pytesseract.image_to_string(image)
+        extracted_text = _run_ocr(request.files["image"].stream)
 
         if not extracted_text or not extracted_text.strip():
-            return jsonify({"error": "Could not extract text from image. Please use a clearer photo."}), 400
-
-        logger.info("Extracted text length: %d", len(extracted_text))
+            return jsonify({"error": NO_OCR_TEXT_ERROR}), 400
 
+        prompt = _gemini_prompt(extracted_text)
         logger.info("Calling Gemini model: %s", MODEL_NAME)
-        model = genai.GenerativeModel(MODEL_NAME)
-        prompt = _build_gemini_prompt(extracted_text)
-        response = model.generate_content(prompt)
-
-        medication_data = _parse_gemini_response(response)
-
-        if "extracted_text" not in medication_data or not medication_data["extracted_text"]:
-            medication_data["extracted_text"] = extracted_text
-
-        return (
-            jsonify(
-                {
-                    "success": True,
-                    "medication_data": medication_data,
-                    "extracted_text": extracted_text,
-                }
-            ),
-            200,
-        )
-    except pytesseract.TesseractNotFoundError:
-        logger.exception("Tesseract executable not found")
-        return jsonify({"error": "Tesseract OCR is not installed or not found in PATH."}), 500
-    except google_exceptions.ResourceExhausted:
-        logger.exception("Gemini quota exceeded")
-        return (
-            jsonify(
-                {
-                    "error": "Gemini quota exceeded. Please wait a moment or switch to a lighter model such as models/gemini-flash-lite-latest."
-                }
-            ),
-            429,
-        )
-    except google_exceptions.GoogleAPIError as exc:
-        logger.exception("Gemini API error")
-        return jsonify({"error": f"Gemini API error: {exc}"}), 502
-    except ValueError as exc:
-        logger.exception("Validation error during extraction")
-        return jsonify({"error": str(exc)}), 500
+        medication_data, model_name = gemini_hedging.call(_gemini_attempt(extracted_text, prompt))
+        if model_name != MODEL_NAME:
+            logger.info("Medication extracted by %s", model_name)
+
+        return jsonify(_extraction_result(medication_data, extracted_text)), 200
     except Exception as exc:
-        logger.exception("Unexpected error during extraction")
-        return jsonify({"error": str(exc)}), 500
+        body, status = _extraction_error(exc)
+        return jsonify(body), status
+
+
+@app.route("/api/extract-medication/stream", methods=["POST"])
+def extract_medication_stream():
+    """
+    Server-sent events variant of /api/extract-medication.
+
+    Events, in order: `ocr` with the OCR text as soon as Tesseract finishes,
+    `field` ({"field", "value"}) for each field of the Gemini reply as soon as
+    it is complete, then `result` with the same payload as the non-streaming
+    endpoint. A failure after the stream has started ends it with an `error`
+    event ({"error", "status"}, status being what the non-streaming endpoint
+    would have returned).
+    """
+    if "image" not in request.files:
+        return jsonify({"error": "No image provided"}), 400
+
+    if not GEMINI_API_KEY:
+        return jsonify({"error": "GEMINI_API_KEY is not configured"}), 500
+
+    gate = admission_gates["extract-medication"]
+    if not gate.acquire():
+        return _shed_response(gate)
+    try:
+        # The upload is closed once this view returns, before the stream is consumed
+        image_bytes = request.files["image"].read()
+    except BaseException:
+        gate.release()
+        raise
+
+    def generate():
+        try:
+            yield _sse_event("status", {"stage": "ocr"})
+            extracted_text = _run_ocr(io.BytesIO(image_bytes))
+            if not extracted_text or not extracted_text.strip():
+                yield _sse_event("error", {"error": NO_OCR_TEXT_ERROR, "status": 400})
+                return
+            yield _sse_event("ocr", {"extracted_text": extracted_text})
+
+            prompt = _gemini_prompt(extracted_text)
+            logger.info("Streaming from Gemini model: %s", MODEL_NAME)
+            yield _sse_event("status", {"stage": "gemini"})
+            start = time.perf_counter()
+            response = _stream_gemini(prompt)
+            parser = IncrementalObjectParser()
+            chunks = []
+            for chunk in response:
+                text = _gemini_text(chunk)
+                chunks.append(text)
+                for field, value in parser.feed(text):
+                    yield _sse_event("field", {"field": field, "value": value})
+            _record_gemini_call(extracted_text, prompt, response, time.perf_counter() - start)
+
+            try:
+                medication_data = _parse_gemini_json("".join(chunks))
+            except ValueError:
+                _record_extraction(parse_failures=1)
+                raise
+            yield _sse_event("result", _extraction_result(medication_data, extracted_text))
+        except Exception as exc:
+            body, status = _extraction_error(exc)
+            yield _sse_event("error", {**body, "status": status})
+
+    return _stream_holding_slot(gate, generate(), SSE_MIMETYPE, {
+        "Cache-Control": "no-cache",
+        # Stop reverse proxies (nginx) from buffering the events
+        "X-Accel-Buffering": "no",
+    })
+
+
+def _stream_holding_slot(gate: AdmissionGate, body: Iterator[bytes], mimetype: str, headers: Dict[str, str]):
+    """Streamed response that releases the caller's admission slot when closed (or now, if it cannot be built)."""
+    try:
+        response = app.response_class(stream_with_context(body), status=200, mimetype=mimetype, headers=headers)
+        response.call_on_close(gate.release)
+    except BaseException:
+        gate.release()
+        raise
+    return response
+
+
+def _sse_event(event: str, data: Dict[str, Any]) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + dumps(data) + b"\n\n"
 
 
 def _normalize_patient_data(patient_data: Dict[str, Any]) -> Dict[str, float]:
@@ -254,13 +698,13 @@ def _normalize_patient_data(patient_data: Dict[str, Any]) -> Dict[str, float]:
         bmi = 22.0 + (age - 30) * 0.1  # Rough estimate
     bmi = float(bmi)
     
-    # Symptoms: convert array to binary flags
+    # Symptoms: convert array to binary flags using the symptom vocabulary
     symptoms = patient_data.get("symptoms", [])
     if isinstance(symptoms, list):
-        symptoms_lower = [s.lower() if isinstance(s, str) else str(s).lower() for s in symptoms]
-        headache = 1 if any("headache" in s for s in symptoms_lower) else patient_data.get("Headache", 0)
-        body_ache = 1 if any("body" in s or "ache" in s or "pain" in s for s in symptoms_lower) else patient_data.get("Body_Ache", 0)
-        fatigue = 1 if any("fatigue" in s or "tired" in s or "weak" in s for s in symptoms_lower) else patient_data.get("Fatigue", 0)
+        flags = symptom_matcher.symptom_flags(symptoms)
+        headache = 1 if flags["Headache"] else patient_data.get("Headache", 0)
+        body_ache = 1 if flags["Body_Ache"] else patient_data.get("Body_Ache", 0)
+        fatigue = 1 if flags["Fatigue"] else patient_data.get("Fatigue", 0)
     else:
         headache = int(patient_data.get("Headache", 0))
         body_ache = int(patient_data.get("Body_Ache", 0))
@@ -268,7 +712,7 @@ def _normalize_patient_data(patient_data: Dict[str, Any]) -> Dict[str, float]:
     
     # Chronic conditions
     comorbidities = patient_data.get("comorbidities", [])
-    chronic_conditions = 1 if (isinstance(comorbidities, list) and len(comorbidities) > 0) else int(patient_data.get("Chronic_Conditions", 0))
+    chronic_conditions = 1 if (isinstance(comorbidities, list) and symptom_matcher.has_chronic_condition(comorbidities)) else int(patient_data.get("Chronic_Conditions", 0))
     
     return {
         "Temperature": temperature,
@@ -284,6 +728,7 @@ def _normalize_patient_data(patient_data: Dict[str, Any]) -> Dict[str, float]:
 
 
 @app.route("/api/predict-fever", methods=["POST"])
+@admission_controlled(admission_gates["predict-fever"])
 def predict_fever():
     """
     Predict fever recovery decision using XGBoost model.
@@ -313,6 +758,17 @@ def predict_fever():
         "Fatigue": 0,
         "Chronic_Conditions": 0
     }
+    
+    Optional query parameter `fields` (e.g. ?fields=decision,probabilities) limits
+    the response to those fields. Send `Accept: application/msgpack` to receive
+    MessagePack instead of JSON.
+    
+    `?explain=shap` derives key_factors from the model's TreeSHAP contributions
+    (adding `feature_contributions` and `key_factors_source`), falling back to
+    the rule-based factors if they are not ready within SHAP_LATENCY_BUDGET_MS.
+    
+    The X-Model-Key header (or a `model_key` body field) selects a per-clinic or
+    per-cohort model from FEVER_MODEL_DIR/<key>/; the default model is used otherwise.
     """
     if request.method != "POST":
         return jsonify({"error": "Method not allowed"}), 405
@@ -324,10 +780,26 @@ def predict_fever():
         }), 503
     
     try:
+        fields = _parse_field_mask(request.args.get("fields"))
+    except ValueError as e:
+        return jsonify({"error": str(e), "available_fields": list(PREDICTION_FIELDS)}), 400
+    mimetype = request.accept_mimetypes.best_match(response_builder.mimetypes, default=JSON_MIMETYPE)
+    explain = request.args.get("explain", "rules")
+    if explain not in ("rules", "shap"):
+        return jsonify({"error": "explain must be 'rules' or 'shap'"}), 400
+    
+    try:
+        start = time.perf_counter()
         data = request.get_json()
         if not data:
             return jsonify({"error": "Request body is required"}), 400
         
+        model_key = request.headers.get(MODEL_KEY_HEADER) or data.get("model_key") or DEFAULT_MODEL_KEY
+        try:
+            fever = model_registry.get(model_key)
+        except FileNotFoundError:
+            return jsonify({"error": f"Unknown model: {model_key}"}), 404
+        
         # Handle both formats: nested patientData or direct format
         if "patientData" in data:
             patient_data = data["patientData"]
@@ -339,66 +811,38 @@ def predict_fever():
         
         logger.info(f"Predicting with features: {normalized_data}")
         
-        # Create DataFrame with correct feature order
-        feature_df = pd.DataFrame([normalized_data], columns=fever_feature_names)
-        
-        # Predict
-        prediction_encoded = fever_model.predict(feature_df)[0]
-        prediction = fever_label_encoder.inverse_transform([prediction_encoded])[0]
-        
-        # Get probabilities
-        probabilities = fever_model.predict_proba(feature_df)[0]
-        prob_dict = {
-            label: float(prob) 
-            for label, prob in zip(fever_label_encoder.classes_, probabilities)
-        }
-        
-        # Get confidence (max probability)
-        confidence = float(max(probabilities))
-        
-        # Calculate recovery probability based on decision
-        # For LIKELY_SAFE_TO_STOP: use that probability
-        # For CONTINUE: use probability of LIKELY_SAFE_TO_STOP (recovery potential)
-        # For CONSULT_DOCTOR: use complement of CONSULT_DOCTOR probability (1 - consult_prob)
-        if prediction == "LIKELY_SAFE_TO_STOP":
-            recovery_probability = float(prob_dict.get("LIKELY_SAFE_TO_STOP", 0.0))
-        elif prediction == "CONTINUE":
-            # Recovery potential = probability of safe to stop
-            recovery_probability = float(prob_dict.get("LIKELY_SAFE_TO_STOP", 0.0))
-        else:  # CONSULT_DOCTOR
-            # Recovery probability = 1 - probability of consulting doctor
-            # This shows the chance of NOT needing to consult (i.e., recovery potential)
-            consult_prob = float(prob_dict.get("CONSULT_DOCTOR", 0.0))
-            recovery_probability = 1.0 - consult_prob
+        # Predict: the decision is the most probable class, so one predict_proba call covers both
+        probabilities, decisions = _score_features([normalized_data], fever)
+        prediction = decisions[0]
+        if fever.drift_monitor is not None:
+            fever.drift_monitor.observe(normalized_data, probabilities[0])
+        prediction_encoded = int(np.argmax(probabilities[0]))
         
-        # Determine risk assessment based on prediction and features
-        risk_assessment = "MEDIUM"
-        if prediction == "CONSULT_DOCTOR":
-            risk_assessment = "HIGH"
-        elif prediction == "LIKELY_SAFE_TO_STOP":
-            risk_assessment = "LOW"
+        # Build response: static per-decision fields are pre-encoded by the response builder,
+        # and fields outside the requested mask are never computed
+        response = _prediction_fields(normalized_data, prediction, probabilities[0], fever)
+        confidence = response["confidence"]
         
-        # Generate explanation
-        explanation = _generate_explanation(prediction, normalized_data, prob_dict, confidence)
-        
-        # Build response
-        response = {
-            "decision": prediction,
-            "recovery_probability": recovery_probability,
-            "confidence": confidence,
-            "explanation": explanation,
-            "key_factors": _get_key_factors(normalized_data, prediction),
-            "risk_assessment": risk_assessment,
-            "next_steps": _get_next_steps(prediction),
-            "warning_signs": _get_warning_signs(normalized_data),
-            "doctor_note": "This is an AI-assisted prediction. Always consult a healthcare professional for medical decisions.",
-            "probabilities": prob_dict,
-            "input_features": normalized_data
-        }
+        if explain == "shap" and (fields is None or not fields.isdisjoint(("key_factors", "feature_contributions", "key_factors_source"))):
+            contributions = fever.explainer.explain(normalized_data, prediction_encoded, SHAP_LATENCY_BUDGET_MS)
+            if contributions is not None:
+                response["key_factors"] = _format_contributions(contributions, normalized_data, prediction)
+                response["feature_contributions"] = [
+                    {"feature": name, "value": normalized_data[name], "contribution": contribution}
+                    for name, _value, contribution in contributions
+                ]
+                response["key_factors_source"] = "model"
+            else:
+                response["feature_contributions"] = None
+                response["key_factors_source"] = "rules"
+        body = response_builder.render(prediction, response, normalized_data, fields=fields, mimetype=mimetype)
         
         logger.info(f"Prediction: {prediction} (confidence: {confidence:.2%})")
+        if audit_log is not None:
+            audit_log.record(normalized_data, probabilities[0], prediction, confidence, fever.version,
+                             (time.perf_counter() - start) * 1000)
         
-        return jsonify(response), 200
+        return app.response_class(body, status=200, mimetype=mimetype, headers=_model_headers(fever))
         
     except KeyError as e:
         logger.exception("Missing required field in request")
@@ -411,106 +855,667 @@ def predict_fever():
         return jsonify({"error": str(e)}), 500
 
 
-def _generate_explanation(prediction: str, features: Dict[str, float], probabilities: Dict[str, float], confidence: float) -> str:
-    """Generate human-readable explanation for the prediction."""
-    temp = features["Temperature"]
-    duration = features["Fever_Duration"]
-    compliance = features["Compliance_Rate"]
+@app.route("/api/predict-fever/bulk", methods=["POST"])
+def predict_fever_bulk():
+    """
+    Score many patients in one streamed request.
     
-    if prediction == "CONTINUE":
-        return f"Based on your temperature of {temp}°C, {duration} days of fever, and {compliance}% medication compliance, it's recommended to continue your current treatment. Monitor symptoms closely."
-    elif prediction == "CONSULT_DOCTOR":
-        return f"Given your temperature of {temp}°C, {duration} days of fever, and {compliance}% compliance, it's advisable to consult a healthcare professional for further evaluation."
-    else:  # LIKELY_SAFE_TO_STOP
-        return f"With a temperature of {temp}°C, {duration} days of fever, and {compliance}% compliance, it may be safe to consider stopping medication. However, always consult your doctor before making changes."
-
-
-def _get_key_factors(features: Dict[str, float], prediction: str) -> list:
-    """Extract key factors influencing the decision."""
-    factors = []
+    The body is NDJSON (one patient object per line, in either format accepted by
+    /api/predict-fever) or CSV with a header row when Content-Type is text/csv.
+    In CSV, `symptoms` and `comorbidities` are `;`-separated lists and empty cells
+    use the defaults. The body is read incrementally and scored BULK_CHUNK_SIZE
+    records at a time, and results stream back as NDJSON in input order, so
+    memory stays bounded and results arrive before the upload finishes.
+    
+    Each output line carries `row` (0-based record index) and `id` when the
+    input record had one. A record that cannot be scored yields a line with
+    `row` and `error` instead (including lines that are not valid UTF-8); the
+    rest of the stream is unaffected. If scoring itself fails part-way, the
+    stream ends with a line carrying only `error`.
+    `?fields=` selects prediction fields as for /api/predict-fever, and the
+    X-Model-Key header or `?model_key=` selects the model.
+    """
+    if fever_model is None or fever_label_encoder is None or fever_feature_names is None:
+        return jsonify({
+            "error": "Fever prediction model not loaded",
+            "details": "Run train_fever_model.py to train and save the model first."
+        }), 503
     
-    temp = features["Temperature"]
-    if temp > 38.5:
-        factors.append(f"Elevated temperature ({temp}°C)")
-    elif temp < 37.5:
-        factors.append(f"Normal temperature ({temp}°C)")
+    try:
+        fields = _parse_field_mask(request.args.get("fields"))
+    except ValueError as e:
+        return jsonify({"error": str(e), "available_fields": list(PREDICTION_FIELDS)}), 400
+    if fields is not None:
+        fields = fields | {"row", "id"}
+    model_key = request.headers.get(MODEL_KEY_HEADER) or request.args.get("model_key") or DEFAULT_MODEL_KEY
+    try:
+        fever = model_registry.get(model_key)
+    except FileNotFoundError:
+        return jsonify({"error": f"Unknown model: {model_key}"}), 404
     
-    duration = features["Fever_Duration"]
-    if duration > 7:
-        factors.append(f"Prolonged fever duration ({duration} days)")
+    # The slot is held until the streamed response is closed, not just until this view returns
+    gate = admission_gates["predict-fever-bulk"]
+    if not gate.acquire():
+        return _shed_response(gate)
     
-    compliance = features["Compliance_Rate"]
-    if compliance < 60:
-        factors.append(f"Low medication compliance ({compliance}%)")
-    elif compliance > 90:
-        factors.append(f"Excellent medication compliance ({compliance}%)")
+    try:
+        if request.mimetype == "text/csv":
+            # Undecodable bytes become U+FFFD, which _iter_csv_records reports as a per-row error
+            records = _iter_csv_records(io.TextIOWrapper(request.stream, encoding="utf-8", errors="replace", newline=""))
+        else:
+            records = _iter_ndjson_records(request.stream)
+    except BaseException:
+        gate.release()
+        raise
     
-    if features["Chronic_Conditions"]:
-        factors.append("Presence of chronic conditions")
+    def generate():
+        # The 200 status has been sent by the time anything here fails, so end with an error line instead
+        try:
+            chunk = []
+            for record in records:
+                chunk.append(record)
+                if len(chunk) >= BULK_CHUNK_SIZE:
+                    yield _score_bulk_chunk(chunk, fields, fever)
+                    chunk = []
+            if chunk:
+                yield _score_bulk_chunk(chunk, fields, fever)
+        except Exception as e:
+            logger.exception("Bulk scoring failed mid-stream")
+            yield dumps({"error": f"Bulk scoring stopped: {e}"}) + b"\n"
+    
+    return _stream_holding_slot(gate, generate(), NDJSON_MIMETYPE, _model_headers(fever))
+
+
+def _iter_ndjson_records(stream: Any) -> Iterator[Tuple[int, Any]]:
+    """Yield (row, record) per non-blank NDJSON line; undecodable or unparseable lines yield the exception."""
+    row = 0
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            # UnicodeDecodeError is a ValueError; json.loads decodes UTF-8 bytes strictly
+            record = json.loads(line)
+        except ValueError as e:
+            record = e
+        yield row, record
+        row += 1
+
+
+def _iter_csv_records(text: io.TextIOBase) -> Iterator[Tuple[int, Any]]:
+    """Yield (row, record) per CSV row, splitting list columns and dropping empty cells."""
+    for row, values in enumerate(csv.DictReader(text)):
+        if any("\ufffd" in value for value in values.values() if isinstance(value, str)):
+            yield row, ValueError("row is not valid UTF-8")
+            continue
+        yield row, _tabular_record(values)
+
+
+def _tabular_record(values: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Prepare a CSV/Parquet row for _normalize_patient_data.
+    
+    Empty and missing cells are dropped so the defaults apply, and `symptoms` /
+    `comorbidities` given as `;`-separated text become lists.
+    """
+    record = {
+        key: value for key, value in values.items()
+        if key and value is not None and value != "" and not (isinstance(value, float) and value != value)
+    }
+    for key in ("symptoms", "comorbidities"):
+        if isinstance(record.get(key), str):
+            record[key] = [item.strip() for item in record[key].split(";") if item.strip()]
+    return record
+
+
+def _score_bulk_chunk(chunk: List[Tuple[int, Any]], fields: Optional[frozenset], fever: Optional[FeverModel] = None) -> bytes:
+    """Normalize and score one chunk with a single predict_proba call; returns NDJSON lines."""
+    lines: List[Optional[bytes]] = [None] * len(chunk)
+    scored = []
+    for position, (row, record) in enumerate(chunk):
+        try:
+            if isinstance(record, Exception):
+                raise record
+            if not isinstance(record, dict):
+                raise ValueError("each record must be a JSON object")
+            patient_data = record.get("patientData", record)
+            scored.append((position, row, record.get("id"), _normalize_patient_data(patient_data)))
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            lines[position] = dumps({"row": row, "error": f"Invalid input: {e}"})
     
-    symptom_count = features["Headache"] + features["Body_Ache"] + features["Fatigue"]
-    if symptom_count > 2:
-        factors.append(f"Multiple symptoms present ({symptom_count})")
+    if scored:
+        rows = [features for _position, _row, _id, features in scored]
+        probabilities, decisions = _score_features(rows, fever)
+        batch_fields = _batch_prediction_fields(rows, decisions, probabilities, fields, fever)
+        for (position, row, record_id, features), prediction, prediction_fields in zip(scored, decisions, batch_fields):
+            response = {"row": row} if record_id is None else {"row": row, "id": record_id}
+            response.update(prediction_fields)
+            lines[position] = response_builder.render(prediction, response, features, fields=fields)
+    return b"\n".join(lines) + b"\n"
+
+
+@app.route("/api/predict-fever/sweep", methods=["POST"])
+@admission_controlled(admission_gates["predict-fever"])
+def predict_fever_sweep():
+    """
+    What-if sweep: how the decision and recovery probability change as one or two features vary.
+
+    Expected input format:
+    {
+        "patientData": {...},   # as for /api/predict-fever (or the direct format)
+        "sweep": [
+            {"feature": "compliance", "start": 40, "stop": 100, "step": 5},
+            {"feature": "temperature", "start": 37.0, "stop": 40.0, "step": 0.5}
+        ]
+    }
+
+    `feature` is a model feature name or temperature, age, bmi, duration or
+    compliance. The patient is normalized once and every grid point is a copy of
+    it with the swept features replaced, so e.g. sweeping age does not change an
+    estimated BMI. The grid (at most SWEEP_MAX_POINTS points) is scored with one
+    predict_proba call. The response holds `decision` (indices into `classes`),
+    `probabilities` and `recovery_probability` as nested lists indexed like
+    `axes`, plus the decision `boundaries`. Results are cached per model, base
+    patient and sweep (X-Sweep-Cache: hit/miss). Sweeps are not recorded in the
+    drift monitor or the audit log.
+    """
+    if fever_model is None or fever_label_encoder is None or fever_feature_names is None:
+        return jsonify({
+            "error": "Fever prediction model not loaded",
+            "details": "Run train_fever_model.py to train and save the model first."
+        }), 503
+
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({"error": "Request body is required"}), 400
+
+        model_key = request.headers.get(MODEL_KEY_HEADER) or data.get("model_key") or DEFAULT_MODEL_KEY
+        try:
+            fever = model_registry.get(model_key)
+        except FileNotFoundError:
+            return jsonify({"error": f"Unknown model: {model_key}"}), 404
+
+        axes = parse_axes(data.get("sweep"), fever.feature_names, SWEEP_FEATURE_ALIASES,
+                          max_points=SWEEP_MAX_POINTS)
+        base = _normalize_patient_data(data.get("patientData", data))
+        headers = _model_headers(fever)
+
+        cache_key = SweepCache.key(base, axes, fever.feature_names)
+        body = fever.sweep_cache.get(cache_key)
+        if body is not None:
+            return app.response_class(body, status=200, mimetype=JSON_MIMETYPE,
+                                      headers={**headers, "X-Sweep-Cache": "hit"})
+
+        grid = build_grid(base, axes, fever.feature_names)
+        probabilities = _predict_proba(pd.DataFrame(grid, columns=fever.feature_names), fever)
+        classes = fever.label_encoder.classes_
+        decisions = fever.label_encoder.inverse_transform(np.argmax(probabilities, axis=1))
+        recovery = _recovery_probabilities(decisions, probabilities, classes)
+        result = summarize(axes, classes, probabilities, {"recovery_probability": recovery}, SWEEP_PRECISION)
+        body = dumps({"base": base, **result})
+        fever.sweep_cache.put(cache_key, body)
+
+        return app.response_class(body, status=200, mimetype=JSON_MIMETYPE,
+                                  headers={**headers, "X-Sweep-Cache": "miss"})
+
+    except (AttributeError, KeyError, TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid input: {e}"}), 400
+    except Exception as e:
+        logger.exception("Unexpected error during sweep")
+        return jsonify({"error": str(e)}), 500
+
+
+def _score_features(rows: List[Dict[str, float]], fever: Optional[FeverModel] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Score normalized rows with one predict_proba call: (probabilities, decision labels)."""
+    fever = fever or default_fever_model
+    probabilities = _predict_proba(pd.DataFrame(rows, columns=fever.feature_names), fever)
+    decisions = fever.label_encoder.inverse_transform(np.argmax(probabilities, axis=1))
+    return probabilities, decisions
+
+
+def _predict_proba(feature_df: pd.DataFrame, fever: FeverModel) -> np.ndarray:
+    return (fever.cascade or fever.model).predict_proba(feature_df)
+
+
+def _recovery_probability(prediction: str, prob_dict: Dict[str, float]) -> float:
+    """Recovery probability shown to the patient (see RECOVERY_PROBABILITY_SOURCES)."""
+    label, complement = RECOVERY_PROBABILITY_SOURCES.get(prediction, RECOVERY_PROBABILITY_DEFAULT)
+    probability = float(prob_dict.get(label, 0.0))
+    return 1.0 - probability if complement else probability
+
+
+def _recovery_probabilities(decisions: np.ndarray, probabilities: np.ndarray, classes: Sequence[str]) -> np.ndarray:
+    """Vectorized _recovery_probability for a batch of decisions and probability rows."""
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+    column_of = {str(label): j for j, label in enumerate(classes)}
+    decisions = np.asarray(decisions)
+    known = np.isin(decisions, list(RECOVERY_PROBABILITY_SOURCES))
+    sources = [(~known, RECOVERY_PROBABILITY_DEFAULT)]
+    sources += [(decisions == decision, source) for decision, source in RECOVERY_PROBABILITY_SOURCES.items()]
+    result = np.zeros(len(decisions))
+    for mask, (label, complement) in sources:
+        j = column_of.get(label)
+        probability = probabilities[:, j] if j is not None else np.zeros(len(decisions))
+        result = np.where(mask, 1.0 - probability if complement else probability, result)
+    return result
+
+
+def _prediction_fields(features: Dict[str, float], prediction: str, probabilities: np.ndarray,
+                       fever: Optional[FeverModel] = None) -> Dict[str, Any]:
+    """Per-prediction response fields; list fields are lazy so a field mask can skip them."""
+    fever = fever or default_fever_model
+    prob_dict = {
+        label: float(prob)
+        for label, prob in zip(fever.label_encoder.classes_, probabilities)
+    }
+    return {
+        "decision": prediction,
+        "recovery_probability": _recovery_probability(prediction, prob_dict),
+        "confidence": float(max(probabilities)),
+        "key_factors": lambda: _get_key_factors(features, prediction),
+        "warning_signs": lambda: _get_warning_signs(features),
+        "probabilities": prob_dict,
+        "input_features": features
+    }
+
+
+def _batch_prediction_fields(rows: List[Dict[str, float]], decisions: np.ndarray, probabilities: np.ndarray,
+                             fields: Optional[frozenset] = None, fever: Optional[FeverModel] = None) -> List[Dict[str, Any]]:
+    """
+    _prediction_fields for a scored batch, with the rules evaluated as one vectorized pass.
     
-    return factors if factors else ["Standard recovery parameters"]
+    Fields outside the mask are not computed.
+    """
+    fever = fever or default_fever_model
+    wanted = (lambda name: True) if fields is None else fields.__contains__
+    classes = fever.label_encoder.classes_
+    columns: Dict[str, List[Any]] = {"decision": list(decisions)}
+    if wanted("recovery_probability"):
+        columns["recovery_probability"] = _recovery_probabilities(decisions, probabilities, classes).tolist()
+    if wanted("confidence"):
+        columns["confidence"] = np.max(probabilities, axis=1).tolist()
+    if wanted("key_factors") or wanted("warning_signs"):
+        # Both rule sets read the same features, so extract them once
+        rule_columns = feature_columns(rows, fever.feature_names)
+        if wanted("key_factors"):
+            columns["key_factors"] = KEY_FACTOR_RULES.evaluate(rows, decisions, rule_columns)
+        if wanted("warning_signs"):
+            columns["warning_signs"] = WARNING_SIGN_RULES.evaluate(rows, decisions, rule_columns)
+    if wanted("probabilities"):
+        columns["probabilities"] = [dict(zip(classes, probs)) for probs in probabilities.tolist()]
+    if wanted("input_features"):
+        columns["input_features"] = rows
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*columns.values())]
+
+
+def _model_headers(fever: FeverModel) -> Dict[str, str]:
+    return {MODEL_KEY_HEADER: fever.key, "X-Model-Version": fever.version}
+
+
+def _parse_field_mask(raw: Optional[str]) -> Optional[frozenset]:
+    """Parse the `fields` query parameter into a set of response fields (None = all)."""
+    if raw is None or not raw.strip():
+        return None
+    fields = frozenset(name.strip() for name in raw.split(",") if name.strip())
+    unknown = fields.difference(PREDICTION_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown response fields: {', '.join(sorted(unknown))}")
+    return fields
+
+
+def _generate_explanation(prediction: str, features: Dict[str, float], probabilities: Dict[str, float], confidence: float) -> str:
+    """Generate human-readable explanation for the prediction."""
+    template = EXPLANATION_TEMPLATES.get(prediction, EXPLANATION_TEMPLATES["LIKELY_SAFE_TO_STOP"])
+    return template.format(**features)
+
+
+def _get_key_factors(features: Dict[str, float], prediction: str) -> list:
+    """Extract key factors influencing the decision."""
+    return KEY_FACTOR_RULES.evaluate_one(features, prediction)
+
+
+def _format_contributions(contributions: list, features: Dict[str, float], prediction: str) -> list:
+    """Turn TreeSHAP contributions into key factor sentences."""
+    factors = []
+    for name, _value, contribution in contributions:
+        value = features[name]
+        if name in FLAG_DESCRIPTIONS:
+            description = FLAG_DESCRIPTIONS[name][1 if value else 0]
+        else:
+            description = FEATURE_DESCRIPTIONS.get(name, name + " ({value})").format(value=value)
+        direction = "supports" if contribution > 0 else "weighs against"
+        factors.append(f"{description} {direction} {prediction}")
+    return factors
 
 
 def _get_next_steps(prediction: str) -> list:
     """Get recommended next steps based on prediction."""
-    if prediction == "CONTINUE":
-        return [
-            "Continue taking medication as prescribed",
-            "Monitor temperature twice daily",
-            "Maintain good hydration",
-            "Get adequate rest",
-            "Contact doctor if symptoms worsen"
-        ]
-    elif prediction == "CONSULT_DOCTOR":
-        return [
-            "Schedule an appointment with your healthcare provider",
-            "Continue medication until doctor's visit",
-            "Monitor symptoms closely",
-            "Seek immediate care if symptoms worsen",
-            "Prepare a list of symptoms and medication history"
-        ]
-    else:  # LIKELY_SAFE_TO_STOP
-        return [
-            "Consult your doctor before stopping medication",
-            "Gradually reduce medication if approved by doctor",
-            "Continue monitoring temperature",
-            "Watch for symptom recurrence",
-            "Maintain healthy lifestyle habits"
-        ]
+    return NEXT_STEP_RULES.evaluate_one({}, prediction)
 
 
 def _get_warning_signs(features: Dict[str, float]) -> list:
     """Get warning signs to watch for."""
-    warnings = []
-    
-    if features["Temperature"] > 39.0:
-        warnings.append("High fever (>39°C) - seek medical attention if persistent")
-    
-    if features["Fever_Duration"] > 7:
-        warnings.append("Fever lasting more than 7 days - consult doctor")
-    
-    if features["Compliance_Rate"] < 60:
-        warnings.append("Low medication compliance may affect recovery")
+    return WARNING_SIGN_RULES.evaluate_one(features)
+
+
+# Static response content, pre-encoded once per decision by the response builder
+FEVER_DECISIONS = ("CONTINUE", "CONSULT_DOCTOR", "LIKELY_SAFE_TO_STOP")
+
+PREDICTION_FIELDS = (
+    "decision",
+    "recovery_probability",
+    "confidence",
+    "explanation",
+    "key_factors",
+    "risk_assessment",
+    "next_steps",
+    "warning_signs",
+    "doctor_note",
+    "probabilities",
+    "input_features",
+    "feature_contributions",
+    "key_factors_source",
+)
+
+# Wording for model-driven key factors
+FEATURE_DESCRIPTIONS = {
+    "Temperature": "Temperature of {value}°C",
+    "Age": "Age {value}",
+    "BMI": "BMI {value}",
+    "Fever_Duration": "{value} days of fever",
+    "Compliance_Rate": "{value}% medication compliance",
+}
+
+FLAG_DESCRIPTIONS = {
+    "Headache": ("No headache", "Headache"),
+    "Body_Ache": ("No body ache", "Body ache"),
+    "Fatigue": ("No fatigue", "Fatigue"),
+    "Chronic_Conditions": ("No chronic conditions", "Chronic conditions"),
+}
+
+DOCTOR_NOTE = "This is an AI-assisted prediction. Always consult a healthcare professional for medical decisions."
+
+RISK_ASSESSMENTS = {
+    "CONTINUE": "MEDIUM",
+    "CONSULT_DOCTOR": "HIGH",
+    "LIKELY_SAFE_TO_STOP": "LOW",
+}
+
+# Recovery probability per decision: (class whose probability is used, whether it is complemented).
+# LIKELY_SAFE_TO_STOP and CONTINUE show the probability of LIKELY_SAFE_TO_STOP (recovery potential);
+# CONSULT_DOCTOR, and any other decision, the chance of NOT needing to consult.
+RECOVERY_PROBABILITY_SOURCES = {
+    "LIKELY_SAFE_TO_STOP": ("LIKELY_SAFE_TO_STOP", False),
+    "CONTINUE": ("LIKELY_SAFE_TO_STOP", False),
+}
+RECOVERY_PROBABILITY_DEFAULT = ("CONSULT_DOCTOR", True)
+
+# Rule-based response lists, evaluated per patient or as vectorized masks over a batch (rules_engine.py)
+KEY_FACTOR_RULES = RuleSet(
+    [
+        Rule("Elevated temperature ({Temperature}°C)", "Temperature", ">", 38.5),
+        Rule("Normal temperature ({Temperature}°C)", "Temperature", "<", 37.5),
+        Rule("Prolonged fever duration ({Fever_Duration} days)", "Fever_Duration", ">", 7),
+        Rule("Low medication compliance ({Compliance_Rate}%)", "Compliance_Rate", "<", 60),
+        Rule("Excellent medication compliance ({Compliance_Rate}%)", "Compliance_Rate", ">", 90),
+        Rule("Presence of chronic conditions", "Chronic_Conditions", "!=", 0),
+        Rule("Multiple symptoms present ({symptom_count})", "symptom_count", ">", 2),
+    ],
+    default=["Standard recovery parameters"],
+    derived={"symptom_count": ("Headache", "Body_Ache", "Fatigue")},
+)
+
+WARNING_SIGN_RULES = RuleSet(
+    [
+        Rule("High fever (>39°C) - seek medical attention if persistent", "Temperature", ">", 39.0),
+        Rule("Fever lasting more than 7 days - consult doctor", "Fever_Duration", ">", 7),
+        Rule("Low medication compliance may affect recovery", "Compliance_Rate", "<", 60),
+        Rule("Chronic conditions may complicate recovery - monitor closely", "Chronic_Conditions", "!=", 0),
+    ],
+    default=["Monitor for any new or worsening symptoms"],
+)
+
+NEXT_STEP_RULES = RuleSet(
+    [Rule(step, decisions=("CONTINUE",)) for step in (
+        "Continue taking medication as prescribed",
+        "Monitor temperature twice daily",
+        "Maintain good hydration",
+        "Get adequate rest",
+        "Contact doctor if symptoms worsen",
+    )]
+    + [Rule(step, decisions=("CONSULT_DOCTOR",)) for step in (
+        "Schedule an appointment with your healthcare provider",
+        "Continue medication until doctor's visit",
+        "Monitor symptoms closely",
+        "Seek immediate care if symptoms worsen",
+        "Prepare a list of symptoms and medication history",
+    )]
+    + [Rule(step, decisions=("LIKELY_SAFE_TO_STOP",)) for step in (
+        "Consult your doctor before stopping medication",
+        "Gradually reduce medication if approved by doctor",
+        "Continue monitoring temperature",
+        "Watch for symptom recurrence",
+        "Maintain healthy lifestyle habits",
+    )]
+)
+
+EXPLANATION_TEMPLATES = {
+    "CONTINUE": "Based on your temperature of {Temperature}°C, {Fever_Duration} days of fever, and {Compliance_Rate}% medication compliance, it's recommended to continue your current treatment. Monitor symptoms closely.",
+    "CONSULT_DOCTOR": "Given your temperature of {Temperature}°C, {Fever_Duration} days of fever, and {Compliance_Rate}% compliance, it's advisable to consult a healthcare professional for further evaluation.",
+    "LIKELY_SAFE_TO_STOP": "With a temperature of {Temperature}°C, {Fever_Duration} days of fever, and {Compliance_Rate}% compliance, it may be safe to consider stopping medication. However, always consult your doctor before making changes.",
+}
+
+response_builder = PredictionResponseBuilder(
+    static_fields={
+        decision: {
+            "risk_assessment": RISK_ASSESSMENTS[decision],
+            "next_steps": _get_next_steps(decision),
+            "doctor_note": DOCTOR_NOTE,
+        }
+        for decision in FEVER_DECISIONS
+    },
+    explanation_templates=EXPLANATION_TEMPLATES,
+)
+
+
+WARMUP_PATIENT = {
+    "temperature": 38.5,
+    "age": 30,
+    "duration": 3,
+    "compliance": 85,
+    "symptoms": ["Headache", "Body ache"],
+    "comorbidities": [],
+}
+
+# Batch sizes scored during warmup: single predictions, SHAP batches and bulk chunks by default
+WARMUP_BATCH_SIZES = [
+    int(size) for size in os.getenv("WARMUP_BATCH_SIZES", f"1,{SHAP_MAX_BATCH},{BULK_CHUNK_SIZE}").split(",") if size.strip()
+]
+# Exercise Tesseract during warmup; readiness only depends on it when WARMUP_REQUIRE_OCR is set
+WARMUP_OCR = os.getenv("WARMUP_OCR", "true").lower() in ("1", "true", "yes")
+WARMUP_REQUIRE_OCR = os.getenv("WARMUP_REQUIRE_OCR", "false").lower() in ("1", "true", "yes")
+
+warmup_state: Dict[str, Any] = {"status": "pending", "timings_ms": {}, "ocr": None, "error": None}
+_warmup_lock = threading.Lock()
+
+
+def warm_up() -> Dict[str, Any]:
+    """
+    Warm up this process and record whether it is ready to serve.
     
-    if features["Chronic_Conditions"]:
-        warnings.append("Chronic conditions may complicate recovery - monitor closely")
+    Scores a synthetic batch of each size in WARMUP_BATCH_SIZES through the full
+    normalization/prediction/encoding path, computes SHAP contributions once, and
+    runs Tesseract on a small rendered image. The result (per-step timings in
+    ms) is kept in warmup_state and reported by /api/health/ready.
     
-    return warnings if warnings else ["Monitor for any new or worsening symptoms"]
+    Called in each serving process before it takes traffic (see gunicorn.conf.py),
+    or by the first readiness probe otherwise. It is not run at import time:
+    forking after XGBoost has started its OpenMP thread pool is unsafe, so the
+    pre-fork master must not predict. Runs once per process.
+    """
+    with _warmup_lock:
+        if warmup_state["status"] != "pending":
+            return warmup_state
+        timings: Dict[str, float] = {}
+        try:
+            if fever_model is None:
+                raise RuntimeError("Fever model not loaded")
+            
+            start = time.perf_counter()
+            features = _normalize_patient_data(WARMUP_PATIENT)
+            probabilities, decisions = _score_features([features])
+            response_builder.render(decisions[0], _prediction_fields(features, decisions[0], probabilities[0]), features)
+            timings["first_prediction"] = (time.perf_counter() - start) * 1000
+            
+            rng = np.random.default_rng(0)
+            for size in WARMUP_BATCH_SIZES:
+                rows = [dict(features, Temperature=float(t)) for t in rng.uniform(36.0, 40.5, size).round(1)]
+                start = time.perf_counter()
+                probabilities, _decisions = _score_features(rows)
+                timings[f"batch_{size}"] = (time.perf_counter() - start) * 1000
+                if probabilities.shape != (size, len(fever_label_encoder.classes_)) or not np.allclose(probabilities.sum(axis=1), 1.0, atol=1e-4):
+                    raise RuntimeError(f"Unexpected probabilities for a batch of {size}")
+            
+            if shap_explainer is not None:
+                start = time.perf_counter()
+                shap_explainer.contributions([[features[name] for name in fever_feature_names]])
+                timings["shap"] = (time.perf_counter() - start) * 1000
+            
+            if WARMUP_OCR:
+                warmup_state["ocr"] = _warm_up_ocr(timings)
+                if WARMUP_REQUIRE_OCR and warmup_state["ocr"] != "ok":
+                    raise RuntimeError(f"OCR warmup failed: {warmup_state['ocr']}")
+            
+            warmup_state["status"] = "ready"
+        except Exception as e:
+            logger.exception("Warmup failed")
+            warmup_state["status"] = "failed"
+            warmup_state["error"] = str(e)
+        warmup_state["timings_ms"] = {step: round(ms, 2) for step, ms in timings.items()}
+        return warmup_state
+
+
+def _warm_up_ocr(timings: Dict[str, float]) -> str:
+    """Run Tesseract once on a rendered line of text; returns "ok" or the reason it failed."""
+    image = Image.new("RGB", (320, 48), "white")
+    ImageDraw.Draw(image).text((8, 16), "Paracetamol 500 mg twice daily", fill="black")
+    start = time.perf_counter()
+    try:
+        pytesseract.image_to_string(image)
+    except pytesseract.TesseractNotFoundError:
+        return "tesseract not found"
+    except Exception as e:
+        return f"error: {e}"
+    finally:
+        timings["ocr"] = (time.perf_counter() - start) * 1000
+    return "ok"
 
 
 @app.get("/api/health")
 def health_check():
-    """Health check endpoint."""
+    """Health check endpoint (kept for existing clients; see /api/health/live and /api/health/ready)."""
     status = {
-        "status": "healthy",
-        "fever_model_loaded": fever_model is not None
+        "status": "healthy" if fever_model is not None else "degraded",
+        "fever_model_loaded": fever_model is not None,
+        "ready": warmup_state["status"] == "ready",
     }
     return jsonify(status), 200
 
 
+@app.get("/api/health/live")
+def liveness():
+    """Liveness: the process is up and answering requests."""
+    return jsonify({"status": "alive"}), 200
+
+
+@app.get("/api/health/ready")
+def readiness():
+    """
+    Readiness: the model is loaded and warmup passed.
+    
+    Returns 503 until then. If nothing warmed this process up yet (e.g. under the
+    development server), the first probe runs the warmup.
+    """
+    state = warm_up()
+    body = {
+        "status": state["status"],
+        "model_version": fever_model_version,
+        "warmup_timings_ms": state["timings_ms"],
+        "ocr": state["ocr"],
+    }
+    if state["error"]:
+        body["error"] = state["error"]
+    return jsonify(body), 200 if state["status"] == "ready" else 503
+
+
+@app.get("/api/extract-medication/stats")
+def extraction_stats_endpoint():
+    """Gemini prompt size, latency, parse-failure rate and hedging counters for this process."""
+    with _extraction_stats_lock:
+        stats = dict(extraction_stats)
+    calls = stats["calls"] or 1
+    stats.update({
+        "avg_ocr_chars": stats["ocr_chars"] / calls,
+        "avg_prompt_chars": stats["prompt_chars"] / calls,
+        "avg_prompt_tokens": stats["prompt_tokens"] / calls,
+        "avg_gemini_ms": stats["gemini_seconds"] / calls * 1000,
+        "parse_failure_rate": stats["parse_failures"] / calls,
+        "structured_output": GEMINI_STRUCTURED_OUTPUT,
+        "hedging": gemini_hedging.stats,
+    })
+    return jsonify(stats), 200
+
+
+@app.get("/api/drift")
+def drift_report():
+    """Live input and prediction drift against the training reference profile, for this process."""
+    model_key = request.headers.get(MODEL_KEY_HEADER) or request.args.get("model_key") or DEFAULT_MODEL_KEY
+    fever = model_registry.peek(model_key)
+    if fever is None:
+        return jsonify({"error": f"Model not loaded: {model_key}"}), 503 if model_key == DEFAULT_MODEL_KEY else 404
+    if fever.drift_monitor is None:
+        return jsonify({
+            "error": "Drift monitor not available",
+            "details": "Run train_fever_model.py (or drift_monitor.py build) to create the reference profile.",
+        }), 503
+    return jsonify({"model_key": fever.key, "model_version": fever.version, **fever.drift_monitor.report()}), 200
+
+
+@app.get("/api/models")
+def model_registry_stats():
+    """Models available on disk, and per-model loads, load times, hits, evictions, cascade exits and sweep cache hits for this process."""
+    available = [DEFAULT_MODEL_KEY] if FEVER_MODEL_PATH.exists() else []
+    if FEVER_MODEL_DIR.is_dir():
+        available += sorted(
+            path.name for path in FEVER_MODEL_DIR.iterdir()
+            if MODEL_KEY_PATTERN.match(path.name) and (path / FEVER_MODEL_PATH.name).exists()
+        )
+    stats = model_registry.stats
+    for key in stats["loaded"]:
+        fever = model_registry.peek(key)
+        if fever is None:
+            continue
+        if fever.cascade is not None:
+            stats["models"][key]["cascade"] = fever.cascade.stats
+        stats["models"][key]["sweep_cache"] = fever.sweep_cache.stats
+    return jsonify({"available": available, **stats}), 200
+
+
+@app.get("/api/audit")
+def audit_stats():
+    """Prediction audit log buffer, write and segment counts for this process."""
+    if audit_log is None:
+        return jsonify({"enabled": False}), 200
+    return jsonify({"enabled": True, **audit_log.stats}), 200
+
+
+@app.get("/api/admission")
+def admission_stats():
+    """Per-endpoint concurrency, queue occupancy and shed counts for this process."""
+    return jsonify({name: gate.stats for name, gate in admission_gates.items()}), 200
+
+
 if __name__ == "__main__":
+    warm_up()
     app.run(debug=os.getenv("FLASK_ENV") == "development", port=int(os.getenv("PORT", 5000)))
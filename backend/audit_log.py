@@ -0,0 +1,232 @@
+"""
+Asynchronous, append-only audit log of fever predictions.
+
+Every /api/predict-fever call records its normalized inputs, class
+probabilities, decision, model version and latency. record() only appends to
+an in-memory ring buffer; a background thread drains the buffer in batches and
+appends each batch as a row group to the current Parquet segment. Segments are
+rotated by size and age and deleted after the retention period.
+
+A segment is written as <name>.parquet.partial and renamed to <name>.parquet
+when it is closed, so readers only ever see complete files. The columns match
+the training schema (FEATURE_NAMES), so a directory of segments can be passed
+straight to `train_fever_model.py --warm-start` once a label column has been
+added (or with `--label-column decision` to read the served decisions).
+
+Durability and latency are traded off with:
+
+- flush_interval / flush_rows: how long records may sit in memory
+- segment_rows / segment_seconds: how much is in the open (unreadable) segment
+- fsync: fsync each segment when it is closed
+- on_full: "drop" (never delay a request; count the loss) or "block" (wait for
+  the writer, up to block_timeout seconds)
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = ".parquet"
+PARTIAL_SUFFIX = ".parquet.partial"
+ON_FULL_POLICIES = ("drop", "block")
+
+
+class PredictionAuditLog:
+    """Buffered prediction records written to rotating Parquet segments by a background thread."""
+
+    def __init__(
+        self,
+        directory: Path,
+        feature_names: Sequence[str],
+        class_names: Sequence[str],
+        capacity: int = 10_000,
+        flush_interval: float = 1.0,
+        flush_rows: int = 1000,
+        segment_rows: int = 100_000,
+        segment_seconds: float = 3600.0,
+        retention_days: float = 30.0,
+        fsync: bool = False,
+        on_full: str = "drop",
+        block_timeout: float = 0.05,
+    ):
+        if on_full not in ON_FULL_POLICIES:
+            raise ValueError(f"Unknown on_full policy {on_full!r} (expected one of {', '.join(ON_FULL_POLICIES)})")
+        import pyarrow as pa
+
+        self.directory = Path(directory)
+        self.feature_names = list(feature_names)
+        self.class_names = [str(name) for name in class_names]
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.flush_rows = flush_rows
+        self.segment_rows = segment_rows
+        self.segment_seconds = segment_seconds
+        self.retention_days = retention_days
+        self.fsync = fsync
+        self.on_full = on_full
+        self.block_timeout = block_timeout
+        self.schema = pa.schema(
+            [("timestamp", pa.timestamp("ms", tz="UTC")), ("model_version", pa.string())]
+            + [(name, pa.float64()) for name in self.feature_names]
+            + [("decision", pa.string()), ("confidence", pa.float64())]
+            + [(f"probability_{name}", pa.float64()) for name in self.class_names]
+            + [("latency_ms", pa.float64())]
+        )
+
+        self._buffer: List[tuple] = []
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._writer = None
+        self._segment_path: Optional[Path] = None
+        self._segment_rows = 0
+        self._segment_opened = 0.0
+        self._sequence = 0
+        self._counts = {"recorded": 0, "written": 0, "dropped": 0, "write_errors": 0, "segments_closed": 0,
+                        "segments_deleted": 0}
+
+    def record(
+        self,
+        features: Dict[str, float],
+        probabilities: Sequence[float],
+        decision: str,
+        confidence: float,
+        model_version: Optional[str],
+        latency_ms: float,
+    ):
+        """Queue one prediction; the values are converted and written by the background thread."""
+        entry = (time.time(), model_version, features, probabilities, decision, confidence, latency_ms)
+        with self._condition:
+            if self._closed:
+                return
+            if self._thread is None:
+                self._start()
+            if len(self._buffer) >= self.capacity:
+                if self.on_full == "block":
+                    self._condition.wait_for(lambda: len(self._buffer) < self.capacity, self.block_timeout)
+                if len(self._buffer) >= self.capacity:
+                    self._counts["dropped"] += 1
+                    return
+            self._buffer.append(entry)
+            self._counts["recorded"] += 1
+            if len(self._buffer) >= self.flush_rows:
+                self._condition.notify_all()
+
+    def _start(self):
+        # Started on first use so that pre-forked server workers each run their own writer
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._closed or len(self._buffer) >= self.flush_rows, self.flush_interval
+                )
+                batch, self._buffer = self._buffer, []
+                closing = self._closed
+                self._condition.notify_all()
+            if batch:
+                self._write(batch)
+            if self._writer is not None and (closing or self._segment_due()):
+                self._close_segment()
+            if closing:
+                return
+
+    def _segment_due(self) -> bool:
+        return (self._segment_rows >= self.segment_rows
+                or time.monotonic() - self._segment_opened >= self.segment_seconds)
+
+    def _write(self, batch: List[tuple]):
+        import pyarrow as pa
+
+        try:
+            timestamps, versions, features, probabilities, decisions, confidences, latencies = zip(*batch)
+            columns = [
+                pa.array([int(ts * 1000) for ts in timestamps], pa.timestamp("ms", tz="UTC")),
+                pa.array(versions, pa.string()),
+            ]
+            columns += [pa.array([float(row[name]) for row in features], pa.float64()) for name in self.feature_names]
+            columns += [pa.array(decisions, pa.string()), pa.array(confidences, pa.float64())]
+            columns += [pa.array([float(row[i]) for row in probabilities], pa.float64())
+                        for i in range(len(self.class_names))]
+            columns.append(pa.array(latencies, pa.float64()))
+            table = pa.Table.from_arrays(columns, schema=self.schema)
+
+            if self._writer is None:
+                self._open_segment()
+            self._writer.write_table(table)
+            self._segment_rows += len(batch)
+            self._counts["written"] += len(batch)
+        except Exception:
+            logger.exception("Failed to write %d audit record(s)", len(batch))
+            self._counts["write_errors"] += len(batch)
+
+    def _open_segment(self):
+        import pyarrow.parquet as pq
+
+        self._sequence += 1
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        name = f"audit-{stamp}-{os.getpid()}-{self._sequence:04d}"
+        self._segment_path = self.directory / (name + PARTIAL_SUFFIX)
+        self._writer = pq.ParquetWriter(self._segment_path, self.schema)
+        self._segment_rows = 0
+        self._segment_opened = time.monotonic()
+
+    def _close_segment(self):
+        try:
+            self._writer.close()
+            if self.fsync:
+                with open(self._segment_path, "rb") as f:
+                    os.fsync(f.fileno())
+            final_path = self._segment_path.with_name(self._segment_path.name[:-len(PARTIAL_SUFFIX)] + SEGMENT_SUFFIX)
+            os.replace(self._segment_path, final_path)
+            self._counts["segments_closed"] += 1
+            logger.info("Closed audit segment %s (%d records)", final_path.name, self._segment_rows)
+        except Exception:
+            logger.exception("Failed to close audit segment %s", self._segment_path)
+        finally:
+            self._writer = None
+            self._segment_path = None
+        self._apply_retention()
+
+    def _apply_retention(self):
+        cutoff = time.time() - self.retention_days * 86400
+        for path in self.directory.glob("audit-*" + SEGMENT_SUFFIX):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    self._counts["segments_deleted"] += 1
+            except FileNotFoundError:
+                pass  # removed by another worker
+
+    def close(self, timeout: float = 10.0):
+        """Write everything buffered, close the open segment and stop the writer."""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            counts = dict(self._counts)
+            buffered = len(self._buffer)
+        return {
+            "directory": str(self.directory),
+            "capacity": self.capacity,
+            "buffered": buffered,
+            "open_segment_rows": self._segment_rows if self._writer is not None else 0,
+            "on_full": self.on_full,
+            **counts,
+        }
@@ -0,0 +1,169 @@
+"""
+Compare memory and throughput of the pre-fork gunicorn setup with independently
+started development servers.
+
+    python benchmark_server.py --workers 4 --seconds 20
+
+"independent" starts N `python app.py` processes, one per port, each loading
+its own copy of the model and libraries. "prefork" starts one gunicorn master
+with N workers (gunicorn.conf.py). Each setup is driven with concurrent
+/api/predict-fever requests. The script then reports the RSS of every serving
+process and the PSS total (shared pages split between the processes that
+share them, i.e. the real memory cost), plus the throughput and latency of
+the setup. Linux only (reads /proc).
+"""
+
+import argparse
+import http.client
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+
+BACKEND_DIR = Path(__file__).parent
+PAYLOAD = json.dumps({"patientData": {
+    "temperature": 38.9, "age": 42, "duration": 4, "compliance": 75,
+    "symptoms": ["Headache", "Fatigue"], "comorbidities": [],
+}}).encode()
+
+
+def _memory_kb(pid: int) -> Dict[str, int]:
+    """RSS, PSS and private (unshared) memory of one process, in kB."""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ("Rss:", "Pss:", "Private_Clean:", "Private_Dirty:"):
+                values[parts[0].rstrip(":")] = int(parts[1])
+    return {"rss": values["Rss"], "pss": values["Pss"], "private": values["Private_Clean"] + values["Private_Dirty"]}
+
+
+def _children(pid: int) -> List[int]:
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+
+def _wait_healthy(port: int, timeout: float = 120.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/api/health")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Server on port {port} did not become healthy")
+
+
+def _drive(ports: List[int], seconds: float, concurrency: int) -> Dict[str, float]:
+    """Send predictions from `concurrency` threads, round-robin over ports, for `seconds`."""
+    latencies: List[float] = []
+    errors = [0]
+    lock = threading.Lock()
+    stop = time.perf_counter() + seconds
+
+    def client(index: int):
+        port = ports[index % len(ports)]
+        local, failed = [], 0
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                conn.request("POST", "/api/predict-fever", body=PAYLOAD, headers={"Content-Type": "application/json"})
+                response = conn.getresponse()
+                response.read()
+                conn.close()
+                if response.status != 200:
+                    failed += 1
+                    continue
+            except OSError:
+                failed += 1
+                continue
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    latencies.sort()
+    count = len(latencies)
+    return {
+        "requests_per_second": count / seconds,
+        "p50_ms": latencies[count // 2] * 1000 if count else float("nan"),
+        "p99_ms": latencies[int(count * 0.99)] * 1000 if count else float("nan"),
+        "errors": errors[0],
+    }
+
+
+def _report(name: str, pids: List[int], load: Dict[str, float]):
+    memory = {pid: _memory_kb(pid) for pid in pids}
+    print(f"\n{name}")
+    for pid, m in memory.items():
+        print(f"  pid {pid:>7}: RSS {m['rss'] / 1024:7.1f} MB   PSS {m['pss'] / 1024:7.1f} MB   private {m['private'] / 1024:7.1f} MB")
+    print(f"  total PSS {sum(m['pss'] for m in memory.values()) / 1024:.1f} MB, "
+          f"sum of RSS {sum(m['rss'] for m in memory.values()) / 1024:.1f} MB")
+    print(f"  {load['requests_per_second']:.0f} req/s, p50 {load['p50_ms']:.1f} ms, p99 {load['p99_ms']:.1f} ms, "
+          f"{load['errors']:.0f} errors")
+
+
+def run_independent(workers: int, base_port: int, seconds: float, concurrency: int):
+    env = dict(os.environ, FLASK_ENV="production")
+    procs = []
+    try:
+        for i in range(workers):
+            procs.append(subprocess.Popen(
+                [sys.executable, "app.py"], cwd=BACKEND_DIR, env=dict(env, PORT=str(base_port + i)),
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            ))
+        ports = [base_port + i for i in range(workers)]
+        for port in ports:
+            _wait_healthy(port)
+        load = _drive(ports, seconds, concurrency)
+        _report(f"independent: {workers} x python app.py", [p.pid for p in procs], load)
+    finally:
+        for p in procs:
+            p.terminate()
+            p.wait()
+
+
+def run_prefork(workers: int, port: int, seconds: float, concurrency: int):
+    env = dict(os.environ, PORT=str(port), WEB_CONCURRENCY=str(workers), GUNICORN_MAX_REQUESTS="0")
+    master = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:app"], cwd=BACKEND_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        _wait_healthy(port)
+        load = _drive([port], seconds, concurrency)
+        _report(f"prefork: gunicorn master + {workers} workers", [master.pid] + _children(master.pid), load)
+    finally:
+        master.send_signal(signal.SIGTERM)
+        master.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seconds", type=float, default=20.0, help="Load duration per setup")
+    parser.add_argument("--concurrency", type=int, default=None, help="Client threads (default: 2 per worker)")
+    parser.add_argument("--port", type=int, default=5100)
+    args = parser.parse_args()
+    concurrency = args.concurrency or args.workers * 2
+
+    run_independent(args.workers, args.port, args.seconds, concurrency)
+    run_prefork(args.workers, args.port + args.workers, args.seconds, concurrency)
+
+
+if __name__ == "__main__":
+    main()
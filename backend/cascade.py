@@ -0,0 +1,102 @@
+"""
+Two-stage cascade inference for the fever model.
+
+Most requests are clear-cut, so a small first-stage model (a few shallow
+trees) scores every request first. When its top class probability reaches
+the calibrated threshold its answer is used ("early exit"); otherwise the
+request is scored by the full model. train_fever_model.py --cascade trains
+the first stage on the full model's decisions, picks the lowest threshold at
+which the first stage still agrees with the full model on at least
+min_agreement of the requests it answers, and reports the exit rate,
+agreement and latency saved on held-out data.
+
+The first stage is scored with the booster's inplace_predict on a NumPy
+array, which skips the per-call DataFrame handling of predict_proba that
+otherwise dominates single-row latency. Exited requests return the first
+stage's probabilities, so their confidence and probability fields come from
+the small model.
+"""
+
+import threading
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+
+def calibrate_threshold(first_stage_proba: np.ndarray, full_decisions: np.ndarray, min_agreement: float) -> Optional[float]:
+    """
+    Lowest first-stage confidence threshold at which exits agree with the full model often enough.
+
+    Agreement is measured over the rows that would exit (confidence >= threshold).
+    Returns None when no threshold reaches min_agreement.
+    """
+    confidence = first_stage_proba.max(axis=1)
+    agrees = first_stage_proba.argmax(axis=1) == full_decisions
+    order = np.argsort(-confidence, kind="stable")
+    confidence, agrees = confidence[order], agrees[order]
+    exits = np.arange(1, len(confidence) + 1)
+    agreement = np.cumsum(agrees) / exits
+    # Rows with equal confidence exit together, so only the last of each run is a valid cut
+    last_of_run = np.append(confidence[1:] != confidence[:-1], True)
+    valid = np.flatnonzero(last_of_run & (agreement >= min_agreement))
+    if not len(valid):
+        return None
+    return float(confidence[valid[-1]])
+
+
+def evaluate_cascade(first_stage_proba: np.ndarray, full_proba: np.ndarray, threshold: float,
+                     labels: Optional[np.ndarray] = None) -> Dict[str, Any]:
+    """Exit rate and agreement of the cascade's decisions with the full model's (and accuracy, given labels)."""
+    exited = first_stage_proba.max(axis=1) >= threshold
+    first_decisions = first_stage_proba.argmax(axis=1)
+    full_decisions = full_proba.argmax(axis=1)
+    cascade_decisions = np.where(exited, first_decisions, full_decisions)
+    report = {
+        "rows": int(len(exited)),
+        "threshold": float(threshold),
+        "exit_rate": float(exited.mean()),
+        "exit_agreement": float((first_decisions == full_decisions)[exited].mean()) if exited.any() else None,
+        "agreement": float((cascade_decisions == full_decisions).mean()),
+    }
+    if labels is not None:
+        report["accuracy"] = float((cascade_decisions == labels).mean())
+        report["full_accuracy"] = float((full_decisions == labels).mean())
+    return report
+
+
+class ConfidenceCascade:
+    """predict_proba from first_stage where its top probability reaches threshold, else from full_model."""
+
+    def __init__(self, first_stage: Any, full_model: Any, threshold: float):
+        self.first_stage = first_stage
+        self.full_model = full_model
+        self.threshold = threshold
+        self.feature_names = list(first_stage.get_booster().feature_names or [])
+        self._lock = threading.Lock()
+        self._counts = {"rows": 0, "exited": 0}
+
+    def predict_proba(self, X: pd.DataFrame) -> np.ndarray:
+        columns = X if not self.feature_names or list(X.columns) == self.feature_names else X[self.feature_names]
+        probabilities = np.asarray(self.first_stage.get_booster().inplace_predict(columns.to_numpy(np.float32)))
+        exited = probabilities.max(axis=1) >= self.threshold
+        n_exited = int(exited.sum())
+        if n_exited == 0:
+            probabilities = self.full_model.predict_proba(X)
+        elif n_exited < len(X):
+            uncertain = np.flatnonzero(~exited)
+            probabilities[uncertain] = self.full_model.predict_proba(X.iloc[uncertain])
+        with self._lock:
+            self._counts["rows"] += len(X)
+            self._counts["exited"] += n_exited
+        return probabilities
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._counts)
+        return {
+            "threshold": self.threshold,
+            **counts,
+            "exit_rate": counts["exited"] / counts["rows"] if counts["rows"] else 0.0,
+        }
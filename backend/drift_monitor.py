@@ -0,0 +1,250 @@
+"""
+Streaming input-drift monitor for the fever model.
+
+The model was trained on synthetic data with fixed ranges (see
+generate_synthetic_data in train_fever_model.py). At training time
+build_reference_profile bins every feature, and every predicted class
+probability, into a small fixed histogram and saves it as
+models/reference_profile.json. Feature bins are training-set deciles; binary
+and other low-cardinality features get one bin per value.
+
+At serving time DriftMonitor.observe only appends the request's values to a
+bounded buffer. Every buffer_size requests, or when a report is requested, the
+buffer is folded into the same histograms with vectorized numpy. Memory is
+therefore constant and the cost is about a microsecond per request, amortized.
+report() compares the live histograms with the reference:
+
+- psi: population stability index. Below 0.1 is stable, 0.1-0.25 is a
+  moderate shift and above 0.25 is significant.
+- below_range / above_range: values outside the min/max seen in training.
+
+    python drift_monitor.py build    # profile for the deployed model
+"""
+
+import json
+import math
+import operator
+import threading
+from itertools import chain
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+PROFILE_VERSION = 1
+FEATURE_BINS = 10
+PROBABILITY_EDGES = [round(0.1 * i, 1) for i in range(1, 10)]
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+# Keeps empty bins from making the PSI infinite
+_PSI_EPSILON = 1e-4
+
+
+def _feature_edges(values: np.ndarray, bins: int) -> List[float]:
+    """Interior bin edges: midpoints between values for low-cardinality features, deciles otherwise."""
+    unique = np.unique(values)
+    if len(unique) <= bins:
+        return [float(edge) for edge in (unique[:-1] + unique[1:]) / 2]
+    quantiles = np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1])
+    return [float(edge) for edge in np.unique(quantiles)]
+
+
+def _histogram(values: np.ndarray, edges: Sequence[float]) -> np.ndarray:
+    # Bin i holds edges[i-1] <= value < edges[i]; the outer bins are open-ended
+    return np.bincount(np.searchsorted(edges, values, side="right"), minlength=len(edges) + 1)
+
+
+def build_reference_profile(
+    features: np.ndarray,
+    feature_names: Sequence[str],
+    probabilities: np.ndarray,
+    class_names: Sequence[str],
+    bins: int = FEATURE_BINS,
+) -> Dict[str, Any]:
+    """Histogram profile of training features (n x features) and predicted probabilities (n x classes)."""
+    features = np.asarray(features, dtype=np.float64)
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+    profile: Dict[str, Any] = {"version": PROFILE_VERSION, "rows": int(len(features)), "features": {}, "probabilities": {}}
+    for i, name in enumerate(feature_names):
+        column = features[:, i]
+        edges = _feature_edges(column, bins)
+        profile["features"][name] = {
+            "edges": edges,
+            "counts": _histogram(column, edges).tolist(),
+            "min": float(column.min()),
+            "max": float(column.max()),
+        }
+    for i, name in enumerate(class_names):
+        profile["probabilities"][str(name)] = {
+            "edges": PROBABILITY_EDGES,
+            "counts": _histogram(probabilities[:, i], PROBABILITY_EDGES).tolist(),
+        }
+    return profile
+
+
+def save_reference_profile(profile: Dict[str, Any], path: Path):
+    with open(path, "w") as f:
+        json.dump(profile, f, indent=2)
+
+
+def population_stability_index(expected: Sequence[float], actual: Sequence[float]) -> float:
+    """PSI between two histograms over the same bins (counts or fractions)."""
+    expected_total = float(sum(expected)) or 1.0
+    actual_total = float(sum(actual)) or 1.0
+    psi = 0.0
+    for e, a in zip(expected, actual):
+        e = max(e / expected_total, _PSI_EPSILON)
+        a = max(a / actual_total, _PSI_EPSILON)
+        psi += (a - e) * math.log(a / e)
+    return psi
+
+
+def _psi_status(psi: float) -> str:
+    if psi >= PSI_SIGNIFICANT:
+        return "significant"
+    if psi >= PSI_MODERATE:
+        return "moderate"
+    return "stable"
+
+
+class DriftMonitor:
+    """Live histograms of normalized features and predicted probabilities, compared to a reference profile."""
+
+    def __init__(
+        self,
+        profile: Dict[str, Any],
+        feature_names: Sequence[str],
+        class_names: Sequence[str],
+        buffer_size: int = 1024,
+        min_samples: int = 100,
+    ):
+        missing = [name for name in feature_names if name not in profile["features"]]
+        missing += [str(name) for name in class_names if str(name) not in profile["probabilities"]]
+        if missing:
+            raise ValueError(f"Reference profile has no histogram for: {missing}")
+        self.feature_names = list(feature_names)
+        self.class_names = [str(name) for name in class_names]
+        self.reference_rows = profile["rows"]
+        self.buffer_size = buffer_size
+        self.min_samples = min_samples
+
+        references = [profile["features"][name] for name in self.feature_names]
+        references += [profile["probabilities"][name] for name in self.class_names]
+        self._edges = [np.asarray(ref["edges"], dtype=np.float64) for ref in references]
+        self._reference_counts = [ref["counts"] for ref in references]
+        self._ranges = [(ref["min"], ref["max"]) for ref in references[:len(self.feature_names)]]
+        self._feature_values = operator.itemgetter(*self.feature_names)
+        self._low = np.array([low for low, _high in self._ranges])
+        self._high = np.array([high for _low, high in self._ranges])
+
+        columns = len(references)
+        self._counts = [np.zeros(len(edges) + 1, dtype=np.int64) for edges in self._edges]
+        self._below = np.zeros(len(self.feature_names), dtype=np.int64)
+        self._above = np.zeros(len(self.feature_names), dtype=np.int64)
+        self._observed_min = np.full(columns, np.inf)
+        self._observed_max = np.full(columns, -np.inf)
+        self._observed = 0
+        self._pending: List[Any] = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path: Path, feature_names: Sequence[str], class_names: Sequence[str], **kwargs) -> "DriftMonitor":
+        with open(path, "r") as f:
+            profile = json.load(f)
+        return cls(profile, feature_names, class_names, **kwargs)
+
+    def observe(self, features: Dict[str, float], probabilities: Sequence[float]):
+        """Record one scored request: its normalized features and predicted class probabilities."""
+        with self._lock:
+            self._pending.append((features, probabilities))
+            if len(self._pending) >= self.buffer_size:
+                self._fold()
+
+    def _fold(self):
+        """Add the buffered observations to the histograms (caller holds the lock)."""
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        feature_rows, probability_rows = zip(*pending)
+        rows, columns = len(pending), len(self.feature_names)
+        feature_block = np.fromiter(chain.from_iterable(map(self._feature_values, feature_rows)),
+                                    np.float64, rows * columns).reshape(rows, columns)
+        probability_block = np.concatenate(probability_rows).astype(np.float64).reshape(rows, -1)
+        block = np.hstack([feature_block, probability_block])
+        for j, edges in enumerate(self._edges):
+            self._counts[j] += _histogram(block[:, j], edges)
+        self._below += (feature_block < self._low).sum(axis=0)
+        self._above += (feature_block > self._high).sum(axis=0)
+        self._observed_min = np.minimum(self._observed_min, block.min(axis=0))
+        self._observed_max = np.maximum(self._observed_max, block.max(axis=0))
+        self._observed += len(block)
+
+    def report(self) -> Dict[str, Any]:
+        """Drift scores and out-of-range counts since this process started."""
+        with self._lock:
+            self._fold()
+            counts = [c.copy() for c in self._counts]
+            below, above = self._below.copy(), self._above.copy()
+            observed_min, observed_max = self._observed_min.copy(), self._observed_max.copy()
+            observed = self._observed
+
+        enough = observed >= self.min_samples
+
+        def column_report(j: int) -> Dict[str, Any]:
+            psi = population_stability_index(self._reference_counts[j], counts[j])
+            return {
+                "psi": round(psi, 4) if observed else None,
+                "status": _psi_status(psi) if enough else "insufficient_data",
+                "observed_range": [float(observed_min[j]), float(observed_max[j])] if observed else None,
+            }
+
+        features = {}
+        for j, name in enumerate(self.feature_names):
+            entry = column_report(j)
+            entry.update({
+                "reference_range": list(self._ranges[j]),
+                "below_range": int(below[j]),
+                "above_range": int(above[j]),
+                "out_of_range_rate": (int(below[j]) + int(above[j])) / observed if observed else 0.0,
+            })
+            features[name] = entry
+        offset = len(self.feature_names)
+        probabilities = {name: column_report(offset + j) for j, name in enumerate(self.class_names)}
+        columns = {**features, **{f"probability_{name}": value for name, value in probabilities.items()}}
+        return {
+            "observed": observed,
+            "reference_rows": self.reference_rows,
+            "min_samples": self.min_samples,
+            "drifted": [name for name, value in columns.items() if value["status"] == "significant"],
+            "features": features,
+            "probabilities": probabilities,
+        }
+
+
+def main(argv: Optional[List[str]] = None):
+    import argparse
+    import pickle
+
+    import train_fever_model as training
+
+    parser = argparse.ArgumentParser(description="Reference profiles for the fever model's drift monitor.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Profile the deployed model on its synthetic training distribution")
+    build.add_argument("--samples", type=int, default=5000, help="Synthetic samples to profile")
+    build.add_argument("--seed", type=int, default=42, help="Seed for synthetic data generation")
+    build.add_argument("--output", type=Path, default=training.REFERENCE_PROFILE_PATH)
+    args = parser.parse_args(argv)
+
+    with open(training.MODEL_PATH, "rb") as f:
+        model = pickle.load(f)
+    with open(training.LABEL_ENCODER_PATH, "rb") as f:
+        label_encoder = pickle.load(f)
+    X, _y = training.generate_synthetic_data(n_samples=args.samples, seed=args.seed)
+    profile = build_reference_profile(X.to_numpy(), training.FEATURE_NAMES, model.predict_proba(X),
+                                      label_encoder.classes_)
+    save_reference_profile(profile, args.output)
+    print(f"Reference profile of {profile['rows']} rows written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Production pre-fork server configuration.
+
+    gunicorn -c gunicorn.conf.py app:app
+
+The master process imports app.py once (preload_app), which loads the model,
+the label encoder, the symptom vocabulary and the numpy/pandas/XGBoost
+libraries. Workers are then forked from it and share those pages
+copy-on-write instead of each loading their own copy. gc.freeze() in the
+master moves everything loaded so far out of the garbage collector's reach,
+so collections in the workers do not touch (and thereby copy) shared objects.
+
+Workers are recycled after GUNICORN_MAX_REQUESTS requests (with jitter so they
+do not all restart together) and get GUNICORN_GRACEFUL_TIMEOUT seconds to
+finish in-flight requests on restart or shutdown. Each new worker runs
+app.warm_up() before it accepts traffic.
+"""
+
+import gc
+import os
+
+import threading_profiles
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = threading_profiles.server_workers()
+# app.py divides the CPUs between this many workers when it sizes their XGBoost thread pools
+os.environ["WEB_CONCURRENCY"] = str(workers)
+# Threads per worker. app.py refuses to start unless the extraction and bulk admission gates leave
+# some of these free for fever predictions
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+os.environ["GUNICORN_THREADS"] = str(threads)
+
+preload_app = True
+
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "100"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+# OCR + Gemini extraction can take a while
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG")  # e.g. "-" for stdout
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+
+def when_ready(server):
+    # Runs in the master after the app is preloaded and before any worker is forked
+    gc.collect()
+    gc.freeze()
+    server.log.info("Preloaded app frozen for copy-on-write sharing (%d objects)", gc.get_freeze_count())
+
+
+def post_fork(server, worker):
+    # XGBoost's thread pool must be started after the fork, so warm-up happens per worker
+    import app
+
+    state = app.warm_up()
+    server.log.info("Worker %s warmup %s: %s", worker.pid, state["status"], state["timings_ms"])
+
+
+def worker_exit(server, worker):
+    # Flush buffered audit records and close the open segment before the worker goes away
+    import app
+
+    if app.audit_log is not None:
+        app.audit_log.close()
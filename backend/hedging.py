@@ -0,0 +1,186 @@
+"""
+Hedged requests with failover for a slow, occasionally overloaded remote model.
+
+A call starts on the primary model. If no valid result has arrived after the
+hedge delay (the configured latency percentile of recent primary calls), a
+second attempt is sent to the hedge model (the same model or a lighter one)
+and whichever valid result arrives first is used. An attempt that fails with
+one of the failover exceptions (e.g. quota exhaustion) starts an attempt on the
+fallback model straight away.
+
+Attempts run on a small thread pool. The losing attempt is cancelled if it has
+not started yet; a call already in flight cannot be aborted by the synchronous
+client, so its result is discarded (bound it with a request timeout).
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+
+HEDGE_MODES = ("off", "same", "fallback")
+
+
+class LatencyTracker:
+    """Sliding window of recent latencies with percentile lookup."""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """The q-th percentile (0-100) in seconds, or None without samples."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, max(0, int(round(q / 100 * len(samples))) - 1))
+        return samples[index]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+class HedgingPolicy:
+    """Runs an attempt function against primary, hedge and fallback models."""
+
+    def __init__(
+        self,
+        primary_model: str,
+        fallback_model: Optional[str] = None,
+        mode: str = "fallback",
+        percentile: float = 95.0,
+        min_samples: int = 20,
+        initial_delay: float = 10.0,
+        min_delay: float = 1.0,
+        failover_on: Tuple[Type[BaseException], ...] = (),
+        max_workers: int = 8,
+    ):
+        if mode not in HEDGE_MODES:
+            raise ValueError(f"Unknown hedge mode {mode!r} (expected one of {', '.join(HEDGE_MODES)})")
+        self.primary_model = primary_model
+        self.fallback_model = fallback_model or None
+        self.mode = mode if mode != "fallback" or self.fallback_model else "off"
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.failover_on = failover_on
+        self.max_workers = max_workers
+        self.latency = LatencyTracker()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._counts = {"calls": 0, "hedges": 0, "hedge_wins": 0, "failovers": 0, "failover_wins": 0}
+
+    @property
+    def hedge_model(self) -> Optional[str]:
+        if self.mode == "same":
+            return self.primary_model
+        if self.mode == "fallback":
+            return self.fallback_model
+        return None
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait for the primary before hedging."""
+        if len(self.latency) < self.min_samples:
+            return self.initial_delay
+        return max(self.min_delay, self.latency.percentile(self.percentile))
+
+    def count(self, name: str, value: int = 1):
+        with self._lock:
+            self._counts[name] += value
+
+    def call(self, attempt: Callable[[str], Any]) -> Tuple[Any, str]:
+        """
+        Return (result, model) from the first attempt that succeeds.
+
+        attempt(model) must raise for an invalid result. If every attempt
+        fails, the first error is raised.
+        """
+        self.count("calls")
+        start = time.monotonic()
+        hedge_at = start + self.hedge_delay() if self.hedge_model else None
+        pending: Dict[Future, Tuple[str, str]] = {}
+        tried = set()
+        errors = []
+
+        def submit(model: str, role: str):
+            tried.add(model)
+            pending[self._submit(attempt, model)] = (model, role)
+
+        submit(self.primary_model, "primary")
+        try:
+            while pending:
+                timeout = max(0.0, hedge_at - time.monotonic()) if hedge_at is not None else None
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    hedge_at = None
+                    self.count("hedges")
+                    submit(self.hedge_model, "hedge")
+                    continue
+                for future in done:
+                    model, role = pending.pop(future)
+                    error = future.exception()
+                    if error is None:
+                        if role == "hedge":
+                            self.count("hedge_wins")
+                        elif role == "failover":
+                            self.count("failover_wins")
+                        return future.result(), model
+                    errors.append(error)
+                    if (
+                        isinstance(error, self.failover_on)
+                        and self.fallback_model
+                        and self.fallback_model not in tried
+                    ):
+                        hedge_at = None
+                        self.count("failovers")
+                        submit(self.fallback_model, "failover")
+            raise errors[0]
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def _submit(self, attempt: Callable[[str], Any], model: str) -> Future:
+        return self._pool().submit(self._timed, attempt, model)
+
+    def _timed(self, attempt: Callable[[str], Any], model: str) -> Any:
+        start = time.monotonic()
+        result = attempt(model)
+        if model == self.primary_model:
+            # Includes attempts that lost a race, so the percentile tracks the model, not the winners
+            self.latency.record(time.monotonic() - start)
+        return result
+
+    def _pool(self) -> ThreadPoolExecutor:
+        # Created on first use so that pre-forked server workers each start their own threads
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="hedge")
+            return self._executor
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._counts)
+        calls = counts["calls"] or 1
+        return {
+            "mode": self.mode,
+            "primary_model": self.primary_model,
+            "fallback_model": self.fallback_model,
+            **counts,
+            "hedge_rate": counts["hedges"] / calls,
+            "hedge_win_rate": counts["hedge_wins"] / counts["hedges"] if counts["hedges"] else 0.0,
+            "hedge_delay_ms": self.hedge_delay() * 1000,
+            "latency_samples": len(self.latency),
+            "latency_ms": {f"p{q}": _ms(self.latency.percentile(q)) for q in (50, 95, 99)},
+        }
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return seconds * 1000 if seconds is not None else None
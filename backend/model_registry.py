@@ -0,0 +1,123 @@
+"""
+Registry of lazily loaded models under a memory budget.
+
+Clinics and age cohorts can have their own fever models. A request names a
+model by key and the registry returns it, loading it on first use. Loaded
+models are kept in least-recently-used order. When the estimated memory of the
+loaded models exceeds the budget, the least recently used ones are evicted
+(pinned models, such as the default, never are). Requests already holding an
+evicted model finish with it; it is freed once they are done.
+
+Each key has its own load lock, so concurrent first requests for the same
+model wait for a single load while other keys load in parallel.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """LRU cache of models keyed by name, loaded on demand by loader(key) -> (model, size_bytes)."""
+
+    def __init__(
+        self,
+        loader: Callable[[str], Tuple[Any, int]],
+        memory_budget_bytes: int,
+        pinned: Iterable[str] = (),
+    ):
+        self._loader = loader
+        self.memory_budget_bytes = memory_budget_bytes
+        self.pinned = frozenset(pinned)
+        self._models: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def _model_stats(self, key: str) -> Dict[str, Any]:
+        return self._stats.setdefault(key, {"hits": 0, "loads": 0, "load_ms": None, "evictions": 0,
+                                            "size_bytes": 0, "last_used": None})
+
+    def get(self, key: str) -> Any:
+        """The model for key, loading it if needed. Errors from the loader are raised unchanged."""
+        with self._lock:
+            model = self._hit(key)
+            if model is not None:
+                return model
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            # Another request may have loaded it while this one waited
+            with self._lock:
+                model = self._hit(key)
+                if model is not None:
+                    return model
+
+            start = time.perf_counter()
+            try:
+                model, size_bytes = self._loader(key)
+            except BaseException:
+                # Keys come from clients, so a key that fails to load must not leave a lock behind
+                with self._lock:
+                    if self._load_locks.get(key) is load_lock:
+                        del self._load_locks[key]
+                raise
+            load_ms = (time.perf_counter() - start) * 1000
+
+            with self._lock:
+                self._models[key] = (model, size_bytes)
+                stats = self._model_stats(key)
+                stats.update(loads=stats["loads"] + 1, load_ms=load_ms, size_bytes=size_bytes, last_used=time.time())
+                self._evict(keep=key)
+            logger.info("Loaded model %r in %.1f ms (%.1f MB)", key, load_ms, size_bytes / 2**20)
+            return model
+
+    def _hit(self, key: str) -> Optional[Any]:
+        """The loaded model for key, counted as a hit (caller holds the lock)."""
+        entry = self._models.get(key)
+        if entry is None:
+            return None
+        self._models.move_to_end(key)
+        stats = self._model_stats(key)
+        stats["hits"] += 1
+        stats["last_used"] = time.time()
+        return entry[0]
+
+    def peek(self, key: str) -> Optional[Any]:
+        """The model for key if it is loaded, without loading it or changing its LRU position."""
+        with self._lock:
+            entry = self._models.get(key)
+            return entry[0] if entry is not None else None
+
+    def _evict(self, keep: str):
+        """Drop least recently used models until under budget (caller holds the lock)."""
+        used = sum(size for _model, size in self._models.values())
+        for key in list(self._models):
+            if used <= self.memory_budget_bytes:
+                return
+            if key == keep or key in self.pinned:
+                continue
+            _model, size = self._models.pop(key)
+            used -= size
+            self._stats[key]["evictions"] += 1
+            logger.info("Evicted model %r (%.1f MB) to stay within the memory budget", key, size / 2**20)
+        if used > self.memory_budget_bytes:
+            logger.warning("Loaded models use %.1f MB, over the %.1f MB budget, with nothing left to evict",
+                           used / 2**20, self.memory_budget_bytes / 2**20)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            loaded = {key: size for key, (_model, size) in self._models.items()}
+            models = {key: dict(stats, loaded=key in loaded, pinned=key in self.pinned)
+                      for key, stats in self._stats.items()}
+        return {
+            "memory_budget_mb": self.memory_budget_bytes / 2**20,
+            "memory_used_mb": sum(loaded.values()) / 2**20,
+            "loaded": list(loaded),
+            "models": models,
+        }
@@ -0,0 +1,134 @@
+"""
+OCR pre-filter for prescription extraction.
+
+OCR of a prescription photo returns the whole page: clinic letterhead,
+addresses, phone numbers, patient details, signatures and noise. Only a few
+lines name the medication, its dosage and its schedule. filter_medication_lines
+keeps those lines (drug names and drug-like tokens, dosage forms and units,
+frequency and duration patterns), so the Gemini prompt carries a fraction of
+the text. If no line names a known drug the whole text is kept, capped at
+max_chars, so a prescription the patterns miss still reaches the model.
+"""
+
+import re
+from typing import List, Tuple
+
+# Well-known fever/infection medications and brands, including common OCR-friendly spellings
+KNOWN_DRUGS = (
+    "paracetamol", "acetaminophen", "ibuprofen", "aspirin", "dolo", "crocin", "calpol", "tylenol", "advil",
+    "combiflam", "mefenamic", "meftal", "nimesulide", "diclofenac", "naproxen",
+    "amoxicillin", "amoxyclav", "augmentin", "azithromycin", "azithral", "clarithromycin", "cefixime",
+    "ciprofloxacin", "levofloxacin", "ofloxacin", "doxycycline", "metronidazole", "cotrimoxazole",
+    "oseltamivir", "tamiflu", "acyclovir", "valacyclovir", "favipiravir", "remdesivir",
+    "cetirizine", "levocetirizine", "montelukast", "ondansetron", "domperidone", "pantoprazole",
+    "omeprazole", "ranitidine", "ors", "zinc", "vitamin",
+)
+
+_DRUG_NAME = re.compile(
+    r"\b(?:" + "|".join(KNOWN_DRUGS) + r")\w*"
+    # Common generic-name stems
+    r"|\b\w{3,}(?:cillin|mycin|micin|cycline|floxacin|azole|ciclovir|cyclovir|vir|profen|cetamol|olol|pril"
+    r"|sartan|statin|prazole|tidine|zine|cef\w*)\b"
+    r"|\bcef\w{3,}",
+    re.IGNORECASE,
+)
+_DOSAGE_FORM = re.compile(
+    r"\b(?:tab|tabs|tablet|tablets|cap|caps|capsule|capsules|syp|syr|syrup|susp|suspension|inj|injection"
+    r"|drops?|ointment|cream|sachet)\b\.?",
+    re.IGNORECASE,
+)
+_DOSAGE = re.compile(
+    r"\brx\b|\d+(?:\.\d+)?\s*(?:mg|mcg|µg|ug|g|gm|ml|iu|units?|%)\b",
+    re.IGNORECASE,
+)
+_FREQUENCY = re.compile(
+    r"\b(?:od|bd|bid|tds|tid|qid|qds|hs|sos|prn|stat|q\d+h"
+    r"|once|twice|thrice|daily|nightly|morning|night|bedtime"
+    r"|every\s+\d+\s*(?:h|hr|hrs|hours?)"
+    r"|(?:before|after)\s+(?:food|meals?|breakfast|lunch|dinner)"
+    r"|(?:x|for)\s*\d+\s*(?:days?|d|weeks?|wks?))\b"
+    r"|\b[01½]\s*-\s*[01½]\s*-\s*[01½]\b",
+    re.IGNORECASE,
+)
+_WHITESPACE = re.compile(r"[ \t]+")
+
+
+def _classify(line: str) -> Tuple[bool, bool]:
+    """(names a drug or dosage form, carries dosage/frequency details)."""
+    drug = bool(_DRUG_NAME.search(line) or _DOSAGE_FORM.search(line))
+    detail = bool(_DOSAGE.search(line) or _FREQUENCY.search(line))
+    return drug, detail
+
+
+def filter_medication_lines(text: str, max_chars: int = 2000) -> str:
+    """
+    Keep the medication-relevant lines of OCR text, in their original order.
+
+    A line is kept if it names a drug, a dosage form/unit, or a frequency or
+    duration. The line after a drug name or dosage form is kept too, since the
+    name, dosage and schedule are often written beneath it ("Tab." on a line of
+    its own). If no line names a known drug, the whole text is returned.
+    """
+    lines: List[str] = [_WHITESPACE.sub(" ", line).strip() for line in text.splitlines()]
+    lines = [line for line in lines if line]
+    keep = [False] * len(lines)
+    for i, line in enumerate(lines):
+        drug, detail = _classify(line)
+        if drug or detail:
+            keep[i] = True
+        if drug and i + 1 < len(lines):
+            keep[i + 1] = True
+
+    kept = [line for line, k in zip(lines, keep) if k]
+    if not any(_DRUG_NAME.search(line) for line in kept):
+        return "\n".join(lines)[:max_chars]
+    return "\n".join(kept)[:max_chars]
+
+
+SAMPLE_PRESCRIPTIONS = [
+    """CITY CARE MULTISPECIALITY CLINIC
+Dr. A. Sharma MBBS, MD (General Medicine)
+Reg. No. 45873 | Ph: +91 98450 12345
+12, MG Road, Bengaluru - 560001
+www.citycareclinic.in   Timings: 9 AM - 1 PM, 5 PM - 9 PM
+Date: 12/03/2024
+Name: Ramesh Kumar   Age/Sex: 34/M   Wt: 70 kg
+C/O fever x 3 days, body ache, headache
+O/E Temp 101.2 F, BP 120/80, PR 92/min
+Rx
+1. Tab. Dolo 650 mg  1-0-1 after food x 5 days
+2. Tab. Cetirizine 10 mg  0-0-1 x 3 days
+Adv: plenty of oral fluids, rest
+Review after 3 days or SOS
+Dr. A. Sharma
+(Signature)
+Not valid for medico-legal purposes""",
+    """SUNRISE HOSPITAL
+Department of Pediatrics
+OPD Ticket No 88213
+Patient: Baby Ananya  Age 6 yrs
+Diagnosis: Acute febrile illness
+Syp Calpol 250mg/5ml
+5 ml every 6 hours if temp > 100 F
+Syp Azithral 200 mg/5ml
+5 ml once daily for 3 days
+Follow up in OPD on Monday
+Hospital helpline 1800 425 1111""",
+    """Dr. Priya Menon
+Family Physician
+Green Park Clinic, Kochi
+Pt: Joseph 52 yrs
+Known DM, HTN
+Amoxicillin 500
+TDS for 5 days
+Paracetamol 500 mg SOS
+Get CBC, Dengue NS1 done
+Next visit: 20/04""",
+]
+
+
+if __name__ == "__main__":
+    for text in SAMPLE_PRESCRIPTIONS:
+        filtered = filter_medication_lines(text)
+        print(f"{len(text):5d} chars -> {len(filtered):4d} chars ({len(filtered) / len(text):.0%})")
+        print("    " + filtered.replace("\n", "\n    "))
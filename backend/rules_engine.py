@@ -0,0 +1,202 @@
+"""
+Declarative rules for the rule-based parts of a fever prediction response.
+
+Key factors, warning signs and next steps are lists of sentences chosen by
+simple thresholds on the normalized features and by the decision. Each rule
+states its condition (`feature op threshold`, or none), the decisions it
+applies to and its message, which may be a str.format template over the
+features. A RuleSet is compiled once and evaluated either for one patient
+(plain Python comparisons, for single predictions) or for a whole batch as
+NumPy masks (for bulk scoring), so the cost of a batch is one vectorized pass
+per rule plus building the output lists. Both paths use the same operators
+and give the same output.
+"""
+
+import operator
+import string
+from functools import partial, reduce
+from itertools import chain, repeat
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+
+class Rule(NamedTuple):
+    """Emit message when `feature op threshold` holds (always if feature is None) for one of decisions (None = any)."""
+
+    message: str
+    feature: Optional[str] = None
+    op: str = ">"
+    threshold: float = 0.0
+    decisions: Optional[Tuple[str, ...]] = None
+
+
+class RuleSet:
+    """
+    Ordered rules producing a list of messages per patient.
+
+    derived maps extra feature names to the features they sum, e.g. a symptom
+    count. default is returned when no rule fires.
+    """
+
+    def __init__(
+        self,
+        rules: Sequence[Rule],
+        default: Sequence[str] = (),
+        derived: Optional[Dict[str, Tuple[str, ...]]] = None,
+    ):
+        self.rules = list(rules)
+        self.default = list(default)
+        self.derived = dict(derived or {})
+        self._derived_getters = {name: operator.itemgetter(*parts) for name, parts in self.derived.items()}
+        for rule in self.rules:
+            if rule.op not in OPERATORS:
+                raise ValueError(f"Unknown operator {rule.op!r} in rule {rule.message!r}")
+        base = []
+        for rule in self.rules:
+            for name in self.derived.get(rule.feature, (rule.feature,)):
+                if name is not None and name not in base:
+                    base.append(name)
+        self._base_features = base
+        # Per rule: the message itself when it has no template fields, else None
+        self._static = [
+            None if _template_fields(rule.message) else rule.message.format_map({})
+            for rule in self.rules
+        ]
+        self._compiled = [
+            (self._value_getter(rule.feature), OPERATORS[rule.op], rule.threshold, rule.decisions,
+             self._renderer(rule.message) if static is None else None, static)
+            for rule, static in zip(self.rules, self._static)
+        ]
+        self._templates = [
+            None if static is not None else _ColumnTemplate(rule.message) for rule, static in zip(self.rules, self._static)
+        ]
+
+    def _derive(self, row: Dict[str, Any], name: str) -> Any:
+        # Summed in Python so the value (and its int/float type) matches hand-written arithmetic
+        parts = self._derived_getters[name](row)
+        return reduce(operator.add, parts) if isinstance(parts, tuple) else parts
+
+    def _value_getter(self, name: Optional[str]) -> Optional[Callable[[Dict[str, Any]], Any]]:
+        if name is None:
+            return None
+        if name in self.derived:
+            return partial(self._derive, name=name)
+        return operator.itemgetter(name)
+
+    def _renderer(self, message: str) -> Callable[[Dict[str, Any]], str]:
+        derived = [field for field in _template_fields(message) if field in self.derived]
+        if not derived:
+            return message.format_map
+        return lambda row: message.format_map({**row, **{name: self._derive(row, name) for name in derived}})
+
+    def evaluate_one(self, row: Dict[str, Any], decision: Optional[str] = None) -> List[str]:
+        """Messages for one patient's normalized features."""
+        messages = []
+        for value_of, test, threshold, decisions, render, static in self._compiled:
+            if decisions is not None and decision not in decisions:
+                continue
+            if value_of is not None and not test(value_of(row), threshold):
+                continue
+            messages.append(static if static is not None else render(row))
+        return messages or list(self.default)
+
+    def evaluate(
+        self,
+        rows: Sequence[Dict[str, Any]],
+        decisions: Optional[Sequence[str]] = None,
+        columns: Optional[Dict[str, np.ndarray]] = None,
+    ) -> List[List[str]]:
+        """
+        Messages for a batch of normalized feature rows, evaluated as one mask per rule.
+
+        columns may hold the feature columns already extracted with feature_columns(),
+        so several rule sets can share one extraction.
+        """
+        n = len(rows)
+        if not n:
+            return []
+        columns = self._columns(rows, columns)
+        decision_array = np.asarray(decisions) if decisions is not None else None
+        results: List[List[str]] = [[] for _ in range(n)]
+        fired = np.zeros(n, dtype=bool)
+        for rule, static, template in zip(self.rules, self._static, self._templates):
+            mask = np.ones(n, dtype=bool)
+            if rule.feature is not None:
+                mask &= OPERATORS[rule.op](columns[rule.feature], rule.threshold)
+            if rule.decisions is not None:
+                mask &= np.isin(decision_array, rule.decisions) if decision_array is not None else False
+            hits = np.flatnonzero(mask).tolist()
+            if not hits:
+                continue
+            fired |= mask
+            if static is not None:
+                for i in hits:
+                    results[i].append(static)
+            else:
+                for i, message in zip(hits, template.render([rows[i] for i in hits], self)):
+                    results[i].append(message)
+        for i in np.flatnonzero(~fired).tolist():
+            results[i] = list(self.default)
+        return results
+
+    def _columns(self, rows: Sequence[Dict[str, Any]], columns: Optional[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+        """float64 column per base and derived feature used by the rules."""
+        columns = dict(columns or {})
+        missing = [name for name in self._base_features if name not in columns]
+        if missing:
+            columns.update(feature_columns(rows, missing))
+        for name, parts in self.derived.items():
+            if name not in columns and all(part in columns for part in parts):
+                columns[name] = reduce(operator.add, (columns[part] for part in parts))
+        return columns
+
+
+class _ColumnTemplate:
+    """A str.format message rendered for many rows at once, one field column at a time."""
+
+    def __init__(self, message: str):
+        self.message = message
+        # (literal, field, spec, conversion) as parsed by string.Formatter
+        self._parts = list(string.Formatter().parse(message))
+
+    def render(self, rows: List[Dict[str, Any]], rule_set: RuleSet) -> List[str]:
+        pieces = []
+        for literal, field, spec, conversion in self._parts:
+            if literal:
+                pieces.append(repeat(literal))
+            if field is None:
+                continue
+            if field in rule_set.derived:
+                values = [rule_set._derive(row, field) for row in rows]
+            else:
+                values = list(map(operator.itemgetter(field), rows))
+            if conversion:
+                values = map({"r": repr, "s": str, "a": ascii}[conversion], values)
+            # format(value, "") is str(value) for numbers and strings
+            pieces.append(map(str, values) if not spec else [format(value, spec) for value in values])
+        return ["".join(texts) for texts in zip(*pieces)] if len(pieces) > 1 else list(pieces[0])
+
+
+def _template_fields(message: str) -> List[str]:
+    return [field for _literal, field, _spec, _conversion in string.Formatter().parse(message) if field is not None]
+
+
+def feature_columns(rows: Sequence[Dict[str, Any]], names: Sequence[str]) -> Dict[str, np.ndarray]:
+    """float64 column per named feature of a batch of rows, extracted in one pass."""
+    getter = operator.itemgetter(*names)
+    if len(names) == 1:
+        block = np.fromiter(map(getter, rows), np.float64, len(rows)).reshape(-1, 1)
+    else:
+        block = np.fromiter(chain.from_iterable(map(getter, rows)), np.float64,
+                            len(rows) * len(names)).reshape(len(rows), len(names))
+    return {name: block[:, j] for j, name in enumerate(names)}
@@ -0,0 +1,213 @@
+"""
+Offline Batch Scoring for the Fever Recovery Model
+==================================================
+
+Scores a CSV or Parquet file of patients without going through HTTP, using the
+serving pipeline from app.py: the same normalization (_normalize_patient_data),
+the same decision and recovery_probability logic, and the same risk levels.
+
+Input columns are those accepted by /api/predict-fever, in either the frontend
+format (temperature, age, duration, compliance, symptoms, comorbidities) or the
+model format (Temperature, Age, BMI, ...). In CSV, symptoms and comorbidities
+are `;`-separated. An `id` column is carried through to the output.
+
+The input is read in chunks and the chunks are scored in parallel worker
+processes. Output rows are written in input order, one chunk at a time, so
+memory stays bounded by (workers x 2) chunks.
+
+Usage:
+    python score_patients.py patients.parquet scores.parquet --workers 8
+"""
+
+import argparse
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import threading_profiles
+
+# Workers are forked from this process, so cap the BLAS/OpenMP pools before numpy is imported here
+threading_profiles.serving_profile().apply_env()
+
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Imported in the worker processes only; see _init_worker
+serving = None
+# Prediction fields written to the output besides the class probabilities
+OUTPUT_FIELDS = frozenset({"confidence", "recovery_probability"})
+
+
+def iter_record_chunks(path: Path, chunk_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """Yield lists of at most chunk_size raw records from a CSV or Parquet file."""
+    if path.suffix == ".parquet":
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pylist()
+    elif path.suffix == ".csv":
+        # Read cells as text, exactly as /api/predict-fever/bulk receives them
+        for frame in pd.read_csv(path, chunksize=chunk_size, dtype=str, keep_default_na=False):
+            yield frame.to_dict("records")
+    else:
+        raise ValueError(f"Unsupported input format: {path.suffix} (expected .csv or .parquet)")
+
+
+def _init_worker(threads: int):
+    """Load the serving module (and with it the model) once per worker process."""
+    global serving
+    logging.getLogger("app").setLevel(logging.WARNING)
+    import app as serving_module
+    if serving_module.fever_model is None:
+        raise RuntimeError("Fever model not loaded. Run train_fever_model.py first.")
+    # Parallelism comes from the worker processes, so each one overrides the serving thread count
+    serving_module.threading_profiles.configure_model(serving_module.fever_model, threads)
+    cascade = serving_module.default_fever_model.cascade
+    if cascade is not None:
+        serving_module.threading_profiles.configure_model(cascade.first_stage, threads)
+    serving = serving_module
+
+
+def _score_chunk(task: Tuple[int, List[Dict[str, Any]]]) -> pd.DataFrame:
+    """Score one chunk of raw records; rows that cannot be scored get an error instead."""
+    first_row, records = task
+    classes = [str(label) for label in serving.fever_label_encoder.classes_]
+    has_id = any("id" in record for record in records)
+
+    rows = []
+    scored = []
+    for offset, values in enumerate(records):
+        record = serving._tabular_record(values)
+        row = {"row": first_row + offset}
+        if has_id:
+            row["id"] = record.get("id")
+        row.update(dict.fromkeys(["decision", "confidence", "recovery_probability", "risk_assessment"]))
+        row.update({f"probability_{label}": None for label in classes})
+        row["error"] = None
+        try:
+            scored.append((row, serving._normalize_patient_data(record)))
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            row["error"] = f"Invalid input: {e}"
+        rows.append(row)
+
+    if scored:
+        rows_features = [features for _row, features in scored]
+        probabilities, decisions = serving._score_features(rows_features)
+        batch_fields = serving._batch_prediction_fields(rows_features, decisions, probabilities, OUTPUT_FIELDS)
+        for (row, _features), prediction, probs, fields in zip(scored, decisions, probabilities, batch_fields):
+            row["decision"] = str(prediction)
+            row["confidence"] = fields["confidence"]
+            row["recovery_probability"] = fields["recovery_probability"]
+            row["risk_assessment"] = serving.RISK_ASSESSMENTS[prediction]
+            for label, prob in zip(classes, probs):
+                row[f"probability_{label}"] = float(prob)
+
+    frame = pd.DataFrame(rows)
+    text_columns = ["decision", "risk_assessment", "error"] + (["id"] if has_id else [])
+    float_columns = ["confidence", "recovery_probability"] + [f"probability_{label}" for label in classes]
+    return frame.astype({**{c: "string" for c in text_columns}, **{c: "float64" for c in float_columns}})
+
+
+class _OrderedWriter:
+    """Append result chunks to a CSV or Parquet file."""
+
+    def __init__(self, path: Path):
+        if path.suffix not in (".csv", ".parquet"):
+            raise ValueError(f"Unsupported output format: {path.suffix} (expected .csv or .parquet)")
+        self.path = path
+        self.rows = 0
+        self._parquet_writer = None
+        self._schema = None
+
+    def write(self, frame: pd.DataFrame):
+        if self.path.suffix == ".csv":
+            frame.to_csv(self.path, mode="w" if self.rows == 0 else "a", header=self.rows == 0, index=False)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._parquet_writer is None:
+                self._schema = table.schema
+                self._parquet_writer = pq.ParquetWriter(self.path, self._schema)
+            self._parquet_writer.write_table(table.cast(self._schema))
+        self.rows += len(frame)
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+
+def score_file(
+    input_path: Path,
+    output_path: Path,
+    workers: Optional[int] = None,
+    chunk_size: int = 50_000,
+    threads_per_worker: int = 1,
+) -> int:
+    """
+    Score input_path into output_path and return the number of rows written.
+
+    Up to 2 chunks per worker are in flight; finished chunks are held back
+    until every earlier chunk has been written, so the output keeps input order.
+    """
+    workers = workers or os.cpu_count() or 1
+    input_path, output_path = Path(input_path), Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    writer = _OrderedWriter(output_path)
+
+    logger.info(f"Scoring {input_path} -> {output_path} with {workers} worker(s), {chunk_size} rows per chunk")
+    start = time.perf_counter()
+    chunks = iter_record_chunks(input_path, chunk_size)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(threads_per_worker,)) as pool:
+            in_flight = {}
+            finished: Dict[int, pd.DataFrame] = {}
+            next_index = next_to_write = first_row = 0
+            exhausted = False
+            while not exhausted or in_flight:
+                while not exhausted and len(in_flight) < workers * 2:
+                    records = next(chunks, None)
+                    if records is None:
+                        exhausted = True
+                        break
+                    in_flight[pool.submit(_score_chunk, (first_row, records))] = next_index
+                    next_index += 1
+                    first_row += len(records)
+                if not in_flight:
+                    break
+                done, _pending = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    finished[in_flight.pop(future)] = future.result()
+                while next_to_write in finished:
+                    writer.write(finished.pop(next_to_write))
+                    next_to_write += 1
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    logger.info(f"Scored {writer.rows} rows in {elapsed:.1f}s ({writer.rows / max(elapsed, 1e-9):.0f} rows/s)")
+    return writer.rows
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Score a CSV/Parquet file of patients with the fever recovery model.")
+    parser.add_argument("input", type=Path, help="Input .csv or .parquet file")
+    parser.add_argument("output", type=Path, help="Output .csv or .parquet file")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=50_000, help="Rows read and scored per chunk")
+    parser.add_argument("--threads-per-worker", type=int, default=1, help="XGBoost threads in each worker")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    score_file(args.input, args.output, workers=args.workers, chunk_size=args.chunk_size,
+               threads_per_worker=args.threads_per_worker)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+What-if sensitivity sweeps for the fever model.
+
+A sweep starts from one patient's normalized features and varies one or two
+of them over a range (start, stop and step, stop included). build_grid expands
+every combination into one feature matrix, so a whole sweep is scored with a
+single predict_proba call instead of one request per slider position.
+summarize turns the scored grid into a compact result. It holds the swept
+values, the decision (as an index into classes) and the class probabilities as
+nested lists shaped like the grid, and the decision boundaries: the pairs of
+neighbouring grid points along each axis where the decision changes.
+
+SweepCache keeps recent results keyed by the base patient and the sweep, so a
+UI that asks for the same sweep again (every slider drag re-renders it) is
+answered without scoring.
+"""
+
+import math
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class SweepAxis(NamedTuple):
+    """One swept feature: values start, start + step, ... up to and including stop."""
+
+    feature: str
+    start: float
+    stop: float
+    step: float
+
+    @property
+    def count(self) -> int:
+        return int(math.floor((self.stop - self.start) / self.step + 1e-9)) + 1
+
+    @property
+    def values(self) -> np.ndarray:
+        # Rounded so that e.g. 37 + 3 * 0.1 is 37.3, not 37.300000000000004
+        return np.round(self.start + self.step * np.arange(self.count), 10)
+
+
+def parse_axes(
+    specs: Any,
+    feature_names: Sequence[str],
+    aliases: Optional[Dict[str, str]] = None,
+    max_axes: int = 2,
+    max_points: int = 2500,
+) -> List[SweepAxis]:
+    """
+    Sweep axes from a request's `sweep` value: one {feature, start, stop, step} object or a list of them.
+
+    feature may be a model feature name or one of aliases. Raises ValueError for
+    anything that cannot be swept.
+    """
+    if isinstance(specs, dict):
+        specs = [specs]
+    if not isinstance(specs, list) or not 1 <= len(specs) <= max_axes:
+        raise ValueError(f"sweep must be 1 to {max_axes} objects with feature, start, stop and step")
+    aliases = aliases or {}
+    axes = []
+    for spec in specs:
+        if not isinstance(spec, dict):
+            raise ValueError("each sweep entry must be an object with feature, start, stop and step")
+        name = spec.get("feature")
+        feature = name if name in feature_names else aliases.get(name)
+        if feature is None:
+            raise ValueError(f"Cannot sweep {name!r}; use one of {', '.join([*aliases, *feature_names])}")
+        if any(axis.feature == feature for axis in axes):
+            raise ValueError(f"{feature} is swept more than once")
+        try:
+            start, stop, step = (float(spec[key]) for key in ("start", "stop", "step"))
+        except KeyError as e:
+            raise ValueError(f"sweep of {feature} is missing {e}") from None
+        except (TypeError, ValueError):
+            raise ValueError(f"start, stop and step of {feature} must be numbers") from None
+        if not all(map(math.isfinite, (start, stop, step))) or step <= 0 or stop < start:
+            raise ValueError(f"sweep of {feature} needs finite start <= stop and step > 0")
+        if (stop - start) / step >= max_points:
+            raise ValueError(f"sweep of {feature} has more than {max_points} points")
+        axes.append(SweepAxis(feature, start, stop, step))
+    points = math.prod(axis.count for axis in axes)
+    if points > max_points:
+        raise ValueError(f"sweep has {points} points; at most {max_points} are allowed")
+    return axes
+
+
+def build_grid(base: Dict[str, float], axes: Sequence[SweepAxis], feature_names: Sequence[str]) -> np.ndarray:
+    """Feature matrix (points x features) of base with the swept features set to every grid point, first axis slowest."""
+    row = np.array([base[name] for name in feature_names], dtype=np.float64)
+    mesh = np.meshgrid(*[axis.values for axis in axes], indexing="ij")
+    grid = np.tile(row, (mesh[0].size, 1))
+    for axis, values in zip(axes, mesh):
+        grid[:, list(feature_names).index(axis.feature)] = values.ravel()
+    return grid
+
+
+def decision_boundaries(codes: np.ndarray, axes: Sequence[SweepAxis], classes: Sequence[str]) -> List[Dict[str, Any]]:
+    """Where the decision changes between neighbouring grid points, along each axis."""
+    boundaries = []
+    for k, axis in enumerate(axes):
+        values = axis.values
+        others = [other for j, other in enumerate(axes) if j != k]
+        # Move axis k last so every index is (positions on the other axes..., position on axis k)
+        along = np.moveaxis(codes, k, -1)
+        before, after = along[..., :-1], along[..., 1:]
+        for index in np.argwhere(before != after).tolist():
+            *fixed, i = index
+            boundary = {
+                "feature": axis.feature,
+                "between": [float(values[i]), float(values[i + 1])],
+                "from": str(classes[before[tuple(index)]]),
+                "to": str(classes[after[tuple(index)]]),
+            }
+            if others:
+                boundary["at"] = {other.feature: float(other.values[j]) for other, j in zip(others, fixed)}
+            boundaries.append(boundary)
+    return boundaries
+
+
+def summarize(
+    axes: Sequence[SweepAxis],
+    classes: Sequence[str],
+    probabilities: np.ndarray,
+    extra: Optional[Dict[str, np.ndarray]] = None,
+    precision: int = 4,
+) -> Dict[str, Any]:
+    """
+    Compact sweep result from the grid's class probabilities (points x classes, in build_grid order).
+
+    extra holds further per-point values (e.g. recovery probability) to return shaped like the grid.
+    """
+    shape = [axis.count for axis in axes]
+    codes = np.argmax(probabilities, axis=1).reshape(shape)
+    result = {
+        "axes": [{"feature": axis.feature, "values": axis.values.tolist()} for axis in axes],
+        "classes": [str(label) for label in classes],
+        "decision": codes.tolist(),
+        "probabilities": _rounded(probabilities, precision).reshape(shape + [len(classes)]).tolist(),
+    }
+    for name, values in (extra or {}).items():
+        result[name] = _rounded(values, precision).reshape(shape).tolist()
+    result["boundaries"] = decision_boundaries(codes, axes, classes)
+    return result
+
+
+def _rounded(values: np.ndarray, precision: int) -> np.ndarray:
+    # predict_proba returns float32, whose rounded values still print with ~16 digits as Python floats
+    return np.round(np.asarray(values, dtype=np.float64), precision)
+
+
+class SweepCache:
+    """LRU cache of encoded sweep results keyed by (base patient, axes)."""
+
+    def __init__(self, size: int = 1024):
+        self.size = size
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def key(base: Dict[str, float], axes: Sequence[SweepAxis], feature_names: Sequence[str]) -> Tuple:
+        return tuple(float(base[name]) for name in feature_names), tuple(axes)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self._counts["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counts["hits"] += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        if self.size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._counts)
+            entries = len(self._entries)
+        lookups = counts["hits"] + counts["misses"]
+        return {"size": self.size, "entries": entries, **counts,
+                "hit_rate": counts["hits"] / lookups if lookups else 0.0}
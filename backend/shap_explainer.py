@@ -0,0 +1,199 @@
+"""
+Model-driven key factors from XGBoost TreeSHAP contributions.
+
+ContributionExplainer computes per-feature contributions with the booster's
+pred_contribs output (or the cheaper Saabas approximation when
+approximate=True). Concurrent requests are queued and scored together by a
+background thread, because one pred_contribs call over a batch costs far
+less than one call per row. Results are cached per normalized input. Callers
+give a latency budget, and explain() returns None when the answer would not
+arrive in time, so the caller can fall back to the rule-based factors.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+logger = logging.getLogger(__name__)
+
+# (feature name, feature value, contribution to the explained class's margin)
+Contribution = Tuple[str, float, float]
+
+# Seconds the batching thread waits for work before exiting
+WORKER_IDLE_SECONDS = 60.0
+
+
+class ContributionExplainer:
+    """Batched, cached TreeSHAP contributions for single-row requests."""
+
+    def __init__(
+        self,
+        booster: xgb.Booster,
+        feature_names: Sequence[str],
+        max_batch: int = 64,
+        max_wait_ms: float = 2.0,
+        cache_size: int = 4096,
+        approximate: bool = False,
+    ):
+        self._booster = booster
+        self.approximate = approximate
+        self.feature_names = list(feature_names)
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.cache_size = cache_size
+
+        self._cache: "OrderedDict[Tuple[float, ...], np.ndarray]" = OrderedDict()
+        self._pending: List[Tuple[Tuple[float, ...], Future]] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._worker: Optional[threading.Thread] = None
+
+        # Exponentially weighted cost of one batch, used to predict queue wait
+        self._batch_seconds = 0.0
+        self._counts = {"requests": 0, "cache_hits": 0, "batches": 0, "rows": 0, "fallbacks": 0}
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="shap-explainer", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            with self._wakeup:
+                while not self._pending:
+                    # Exit when idle so an explainer that is no longer referenced can be freed;
+                    # explain() starts a new worker when needed
+                    if not self._wakeup.wait(WORKER_IDLE_SECONDS) and not self._pending:
+                        self._worker = None
+                        return
+            # Give concurrent requests a moment to join the batch
+            if self.max_wait:
+                time.sleep(self.max_wait)
+            with self._lock:
+                batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            try:
+                contributions = self.contributions([key for key, _future in batch])
+            except Exception as exc:
+                for _key, future in batch:
+                    future.set_exception(exc)
+                continue
+            with self._lock:
+                for (key, future), row in zip(batch, contributions):
+                    self._remember(key, row)
+                    future.set_result(row)
+
+    def _remember(self, key: Tuple[float, ...], row: np.ndarray):
+        self._cache[key] = row
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def contributions(self, rows: Sequence[Sequence[float]]) -> np.ndarray:
+        """pred_contribs for a batch: shape (rows, classes, features + bias)."""
+        start = time.perf_counter()
+        frame = pd.DataFrame(list(rows), columns=self.feature_names)
+        contribs = self._booster.predict(xgb.DMatrix(frame), pred_contribs=True, approx_contribs=self.approximate)
+        if contribs.ndim == 2:  # binary/single-output models
+            contribs = contribs[:, np.newaxis, :]
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._batch_seconds = elapsed if not self._batch_seconds else 0.8 * self._batch_seconds + 0.2 * elapsed
+            self._counts["batches"] += 1
+            self._counts["rows"] += len(rows)
+        return contribs
+
+    def explain(
+        self,
+        features: Dict[str, float],
+        class_index: int,
+        budget_ms: float,
+        top_k: int = 3,
+    ) -> Optional[List[Contribution]]:
+        """
+        Top contributing features for class_index, largest absolute contribution first.
+
+        Returns None if the contributions are not available within budget_ms.
+        """
+        key = tuple(float(features[name]) for name in self.feature_names)
+        with self._lock:
+            self._counts["requests"] += 1
+            row = self._cache.get(key)
+            if row is not None:
+                self._cache.move_to_end(key)
+                self._counts["cache_hits"] += 1
+            else:
+                # Skip the queue entirely when the expected wait already exceeds the budget
+                batches_ahead = len(self._pending) // self.max_batch + 1
+                if (self.max_wait + batches_ahead * self._batch_seconds) * 1000.0 > budget_ms:
+                    self._counts["fallbacks"] += 1
+                    return None
+                future: Future = Future()
+                self._pending.append((key, future))
+                self._ensure_worker()
+                self._wakeup.notify()
+
+        if row is None:
+            try:
+                row = future.result(timeout=budget_ms / 1000.0)
+            except Exception:
+                # Timed out; the result still lands in the cache for next time
+                with self._lock:
+                    self._counts["fallbacks"] += 1
+                return None
+
+        class_contribs = row[min(class_index, len(row) - 1), :-1]  # drop the bias term
+        order = np.argsort(-np.abs(class_contribs))[:top_k]
+        return [
+            (self.feature_names[i], key[i], float(class_contribs[i]))
+            for i in order
+            if class_contribs[i] != 0
+        ]
+
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+
+def benchmark(model_path: str, batch_sizes: Sequence[int] = (1, 8, 64, 512)):
+    """Print the cost of exact and approximate contributions per row and per batch for a saved model."""
+    import pickle
+
+    with open(model_path, "rb") as f:
+        model = pickle.load(f)
+    booster = model.get_booster()
+    for approximate in (False, True):
+        print("approximate (Saabas)" if approximate else "exact TreeSHAP")
+        _benchmark_explainer(ContributionExplainer(booster, booster.feature_names, approximate=approximate), batch_sizes)
+
+
+def _benchmark_explainer(explainer: ContributionExplainer, batch_sizes: Sequence[int]):
+    rng = np.random.default_rng(0)
+    for size in batch_sizes:
+        rows = np.column_stack([
+            rng.uniform(36.5, 40.0, size), rng.integers(18, 75, size), rng.uniform(18, 32, size),
+            rng.integers(1, 12, size), rng.uniform(40, 100, size),
+            rng.integers(0, 2, size), rng.integers(0, 2, size), rng.integers(0, 2, size), rng.integers(0, 2, size),
+        ])
+        explainer.contributions(rows)  # warm up
+        repeats = max(3, 2000 // size)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            explainer.contributions(rows)
+        seconds = (time.perf_counter() - start) / repeats
+        print(f"batch {size:4d}: {seconds * 1e3:8.3f} ms/batch, {seconds / size * 1e6:8.1f} us/row")
+
+
+if __name__ == "__main__":
+    import sys
+    from pathlib import Path
+
+    benchmark(sys.argv[1] if len(sys.argv) > 1 else str(Path(__file__).parent / "models" / "fever_model.pkl"))
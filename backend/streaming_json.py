@@ -0,0 +1,74 @@
+"""
+Incremental parsing of a JSON object that arrives in chunks.
+
+Used to forward the fields of a streamed Gemini reply as soon as each one is
+complete, rather than after the whole reply has arrived. Only top-level
+members are reported; nested values are reported once they are complete.
+"""
+
+import json
+from typing import Any, List, Tuple
+
+
+class IncrementalObjectParser:
+    """Feed text chunks of one JSON object; get back each top-level (key, value) once complete."""
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._started = False
+        self._done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member_start = 0
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Add a chunk and return the members completed by it, in order."""
+        self._text += chunk
+        members: List[Tuple[str, Any]] = []
+        text = self._text
+        while self._pos < len(text) and not self._done:
+            char = text[self._pos]
+            if not self._started:
+                # Skip anything before the object, e.g. a ```json fence
+                if char == "{":
+                    self._started = True
+                    self._depth = 1
+                    self._member_start = self._pos + 1
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    members.extend(self._member(self._pos))
+                    self._done = True
+            elif char == "," and self._depth == 1:
+                members.extend(self._member(self._pos))
+                self._member_start = self._pos + 1
+            self._pos += 1
+        return members
+
+    @property
+    def done(self) -> bool:
+        """True once the closing brace of the object has been seen."""
+        return self._done
+
+    def _member(self, end: int) -> List[Tuple[str, Any]]:
+        member = self._text[self._member_start:end].strip()
+        if not member:
+            return []
+        try:
+            return list(json.loads("{" + member + "}").items())
+        except ValueError:
+            # Malformed member; the final full parse reports the error
+            return []
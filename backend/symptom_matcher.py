@@ -0,0 +1,181 @@
+"""
+Vocabulary-driven symptom and comorbidity matching.
+
+The free-text symptoms and comorbidities sent by the frontend are mapped to
+the model's binary features using symptom_vocabulary.json, which lists
+synonyms, common misspellings and other-language terms for each feature.
+All terms are compiled once into a single trie-shaped regular expression, so
+matching a whole symptom list is one scan regardless of vocabulary size.
+
+A comorbidity term is ignored when it is negated: a negation cue earlier in the
+same clause ("no diabetes", "not diabetic", "without asthma") or right after
+it ("sugar free", "HIV negative"). The cues are listed in the vocabulary too.
+"""
+
+import bisect
+import json
+import re
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+_SEPARATORS = re.compile(r"[\s\-_/]+")
+# A negation cue only reaches back to the start of its clause: "no fever, diabetic" is still diabetic
+_CLAUSE_BREAK = re.compile(r"[,;:.]|(?<!\w)(?:but|however|except)(?!\w)")
+
+
+def normalize_text(text: Any) -> str:
+    """Case-fold, NFKC-normalize and collapse whitespace/hyphens to single spaces."""
+    text = unicodedata.normalize("NFKC", str(text)).casefold()
+    return _SEPARATORS.sub(" ", text).strip()
+
+
+def _trie_pattern(terms: Iterable[str]) -> str:
+    """Build a regex alternation shaped like a trie, so shared prefixes are only tried once."""
+    trie: Dict[str, dict] = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        optional = "" in node
+        if len(branches) == 1 and not optional:
+            return branches[0]
+        group = "(?:" + "|".join(branches) + ")"
+        return group + "?" if optional else group
+
+    return build(trie)
+
+
+class _CompiledVocabulary:
+    """One compiled pattern plus the labels each matched term maps to."""
+
+    def __init__(self, vocabulary: Dict[str, List[str]]):
+        self.labels: Dict[str, Set[str]] = {}
+        for label, terms in vocabulary.items():
+            for term in terms:
+                normalized = normalize_text(term)
+                if normalized:
+                    self.labels.setdefault(normalized, set()).add(label)
+        # Whole words/phrases only, allowing a plural suffix
+        self.pattern = re.compile(r"(?<!\w)(" + _trie_pattern(self.labels) + r")(?:e?s)?(?!\w)")
+
+    def scan(self, items: List[str]) -> List[Tuple[int, Set[str]]]:
+        """Return (item index, labels) for every match across all items in one pass."""
+        return [(index, labels) for index, labels, _start, _end in self.scan_spans(items)]
+
+    def scan_spans(self, items: List[str]) -> List[Tuple[int, Set[str], int, int]]:
+        """Like scan, plus the start and end of each match within its item."""
+        text = "\n".join(items)
+        offsets = []
+        position = 0
+        for item in items:
+            offsets.append(position)
+            position += len(item) + 1
+        spans = []
+        for match in self.pattern.finditer(text):
+            index = bisect.bisect_right(offsets, match.start()) - 1
+            spans.append((index, self.labels[match.group(1)], match.start() - offsets[index], match.end() - offsets[index]))
+        return spans
+
+
+def _cue_pattern(cues: Iterable[str]) -> str:
+    terms = sorted({normalize_text(cue) for cue in cues} - {""}, key=len, reverse=True)
+    return "|".join(map(re.escape, terms)) if terms else r"(?!)"
+
+
+class SymptomMatcher:
+    """Map free-text symptoms and comorbidities to the model's binary features."""
+
+    def __init__(
+        self,
+        symptoms: Dict[str, List[str]],
+        chronic_terms: List[str],
+        none_terms: List[str],
+        unrecognized_comorbidities_are_chronic: bool = True,
+        negation_before: Iterable[str] = (),
+        negation_after: Iterable[str] = (),
+    ):
+        self.features = list(symptoms)
+        self._symptoms = _CompiledVocabulary(symptoms)
+        self._comorbidities = _CompiledVocabulary({"chronic": chronic_terms, "none": none_terms})
+        self.unrecognized_comorbidities_are_chronic = unrecognized_comorbidities_are_chronic
+        self._negation_before = re.compile(r"(?<!\w)(?:" + _cue_pattern(negation_before) + r")(?!\w)")
+        self._negation_after = re.compile(r" ?(?:" + _cue_pattern(negation_after) + r")(?!\w)")
+
+    @classmethod
+    def from_file(cls, path: Path) -> "SymptomMatcher":
+        with open(path, "r", encoding="utf-8") as f:
+            vocabulary = json.load(f)
+        comorbidities = vocabulary.get("comorbidities", {})
+        return cls(
+            symptoms=vocabulary["symptoms"],
+            chronic_terms=comorbidities.get("chronic", []),
+            none_terms=comorbidities.get("none", []),
+            unrecognized_comorbidities_are_chronic=vocabulary.get("unrecognized_comorbidities_are_chronic", True),
+            negation_before=comorbidities.get("negation_before", []),
+            negation_after=comorbidities.get("negation_after", []),
+        )
+
+    @property
+    def term_count(self) -> int:
+        return len(self._symptoms.labels) + len(self._comorbidities.labels)
+
+    def symptom_flags(self, symptoms: Iterable[Any]) -> Dict[str, int]:
+        """Return a 0/1 flag per symptom feature for a list of free-text symptoms."""
+        flags = dict.fromkeys(self.features, 0)
+        items = [normalize_text(s) for s in symptoms]
+        for _index, labels in self._symptoms.scan(items):
+            for label in labels:
+                flags[label] = 1
+        return flags
+
+    def has_chronic_condition(self, comorbidities: Iterable[Any]) -> bool:
+        """
+        True if any comorbidity names a chronic condition.
+
+        Entries that only say "none" (or an equivalent) or only name negated
+        conditions ("no diabetes") are ignored. Entries the vocabulary does not
+        recognize count as chronic unless the vocabulary sets
+        unrecognized_comorbidities_are_chronic to false.
+        """
+        items = [normalize_text(c) for c in comorbidities]
+        items = [item for item in items if item]
+        recognized = set()
+        for index, labels, start, end in self._comorbidities.scan_spans(items):
+            if "chronic" in labels and not self._negated(items[index], start, end):
+                return True
+            recognized.add(index)
+        return self.unrecognized_comorbidities_are_chronic and len(recognized) < len(items)
+
+    def _negated(self, item: str, start: int, end: int) -> bool:
+        clause = _CLAUSE_BREAK.split(item[:start])[-1]
+        return bool(self._negation_before.search(clause) or self._negation_after.match(item, end))
+
+
+if __name__ == "__main__":
+    # Matching cost with the shipped vocabulary and with a synthetic vocabulary of thousands of terms
+    import random
+    import string
+    import timeit
+
+    matcher = SymptomMatcher.from_file(Path(__file__).parent / "symptom_vocabulary.json")
+    symptoms = ["Body ache", "Headache", "Cough", "Sore throat", "Rash", "Nausea", "Vomiting", "Chills", "Fatigue"]
+    print(matcher.symptom_flags(symptoms), matcher.has_chronic_condition(["None"]))
+
+    rng = random.Random(0)
+    big = {
+        feature: ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 14))) for _ in range(2000)]
+        for feature in ("Headache", "Body_Ache", "Fatigue")
+    }
+    big_matcher = SymptomMatcher(big, chronic_terms=[], none_terms=[])
+    long_list = symptoms * 20
+    for name, m in (("shipped", matcher), ("6000 terms", big_matcher)):
+        n = 2000
+        seconds = timeit.timeit(lambda: m.symptom_flags(long_list), number=n)
+        print(f"{name}: {m.term_count} terms, {len(long_list)} symptoms -> {seconds / n * 1e6:.1f} us/call")
@@ -0,0 +1,42 @@
+"""
+Tests for the OCR pre-filter in prescription_filter.py.
+
+Run with `python -m pytest test_prescription_filter.py` or `python test_prescription_filter.py`.
+No server is needed.
+"""
+
+import sys
+
+from prescription_filter import SAMPLE_PRESCRIPTIONS, filter_medication_lines
+
+
+def test_samples_keep_medication_lines():
+    for text, expected in zip(SAMPLE_PRESCRIPTIONS, ("Dolo 650 mg", "Azithral 200 mg", "Amoxicillin 500")):
+        filtered = filter_medication_lines(text)
+        assert expected in filtered, filtered
+        assert len(filtered) < len(text) / 2, filtered
+
+
+def test_dosage_form_on_its_own_line_keeps_the_drug():
+    assert filter_medication_lines("Tab.\nMetformin 500\n1-0-1") == "Tab.\nMetformin 500\n1-0-1"
+    filtered = filter_medication_lines("GREEN PARK CLINIC\nCap\nOmeprazole 20\nOD before breakfast\nPh: 0484 123456")
+    assert filtered == "Cap\nOmeprazole 20\nOD before breakfast", filtered
+
+
+def test_unknown_drug_names_fall_back_to_full_text():
+    text = "CITY CLINIC\nTab. Xylofen 500\n1-0-1 x 5 days\nPh: 98450 12345"
+    assert filter_medication_lines(text) == text
+    assert filter_medication_lines(text, max_chars=11) == "CITY CLINIC"
+
+
+if __name__ == "__main__":
+    failures = 0
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_") and callable(value)]
+    for test in tests:
+        try:
+            test()
+            print(f"PASS {test.__name__}")
+        except AssertionError as e:
+            failures += 1
+            print(f"FAIL {test.__name__}: {e}")
+    sys.exit(1 if failures else 0)
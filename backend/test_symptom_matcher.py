@@ -0,0 +1,65 @@
+"""
+Tests for symptom and comorbidity matching with the shipped vocabulary.
+
+Run with `python -m pytest test_symptom_matcher.py` or `python test_symptom_matcher.py`.
+No server is needed.
+"""
+
+import sys
+from pathlib import Path
+
+from symptom_matcher import SymptomMatcher
+
+matcher = SymptomMatcher.from_file(Path(__file__).parent / "symptom_vocabulary.json")
+
+CHRONIC_CASES = [
+    (["Diabetes"], True),
+    (["Hypertension", "Asthma"], True),
+    (["Other"], True),
+    (["sugar"], True),
+    ([], False),
+    (["None"], False),
+    (["no diabetes"], False),
+    (["not diabetic"], False),
+    (["without hypertension"], False),
+    (["no history of asthma"], False),
+    (["no other conditions"], False),
+    (["sugar-free diet"], False),
+    (["HIV negative"], False),
+    (["BP normal"], False),
+    (["sin diabetes"], False),
+    (["diabetes nahi"], False),
+    # Negation only covers its own clause and entry
+    (["no fever, diabetic"], True),
+    (["not diabetic but asthma"], True),
+    (["diabetes without complications"], True),
+    (["no diabetes", "Hypertension"], True),
+]
+
+
+def test_has_chronic_condition():
+    for comorbidities, expected in CHRONIC_CASES:
+        assert matcher.has_chronic_condition(comorbidities) is expected, comorbidities
+
+
+def test_symptom_flags():
+    assert matcher.symptom_flags(["Headache"]) == {"Headache": 1, "Body_Ache": 0, "Fatigue": 0}
+    assert matcher.symptom_flags(["body aches", "feeling tired"]) == {"Headache": 0, "Body_Ache": 1, "Fatigue": 1}
+    assert matcher.symptom_flags(["aching joints", "aches and pains"])["Body_Ache"] == 1
+
+
+def test_localized_aches_are_not_body_ache():
+    for symptom in ("stomach ache", "ear ache", "tooth ache", "toothache", "aching tooth", "heartache"):
+        assert matcher.symptom_flags([symptom]) == {"Headache": 0, "Body_Ache": 0, "Fatigue": 0}, symptom
+
+
+if __name__ == "__main__":
+    failures = 0
+    for test in (test_has_chronic_condition, test_symptom_flags, test_localized_aches_are_not_body_ache):
+        try:
+            test()
+            print(f"PASS {test.__name__}")
+        except AssertionError as e:
+            failures += 1
+            print(f"FAIL {test.__name__}: {e}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,108 @@
+"""
+Small-data tests for the warm-start and cascade paths in train_fever_model.py.
+
+Run with `python -m pytest test_train_fever_model.py` or `python test_train_fever_model.py`.
+No server is needed, and nothing is written to models/.
+"""
+
+import functools
+import sys
+
+import numpy as np
+
+import train_fever_model as training
+from cascade import ConfidenceCascade
+
+
+@functools.lru_cache(maxsize=None)
+def _base_model():
+    X, y = training.generate_synthetic_data(n_samples=600, seed=1)
+    return training.train_model(X, y, params={"n_estimators": 20})
+
+
+def _delta(keep_labels, n_samples=400, seed=2):
+    X, y = training.generate_synthetic_data(n_samples=n_samples, seed=seed)
+    keep = y.isin(keep_labels).to_numpy()
+    return X[keep].reset_index(drop=True), y[keep].reset_index(drop=True)
+
+
+def _check_warm_started(result, rounds):
+    assert result is not None
+    model, label_encoder = result
+    base, _label_encoder = _base_model()
+    X, _y = training.generate_synthetic_data(n_samples=60, seed=3)
+    assert list(model.classes_) == [0, 1, 2]
+    assert model.predict_proba(X).shape == (len(X), 3)
+    assert model.get_booster().num_boosted_rounds() == base.get_booster().num_boosted_rounds() + rounds
+    assert list(label_encoder.classes_) == sorted(training.DECISION_LABELS)
+
+
+def test_warm_start_with_a_class_missing():
+    X, y = _delta(["CONTINUE", "LIKELY_SAFE_TO_STOP"])
+    result = training.warm_start_model(X, y, rounds=5, force=True, previous=_base_model())
+    _check_warm_started(result, 5)
+
+
+def test_warm_start_with_a_single_class():
+    X, y = _delta(["CONTINUE"])
+    result = training.warm_start_model(X, y, rounds=5, force=True, previous=_base_model())
+    _check_warm_started(result, 5)
+
+
+
+@functools.lru_cache(maxsize=None)
+def _cascade():
+    model, label_encoder = _base_model()
+    X, y = training.generate_synthetic_data(n_samples=600, seed=1)
+    X_transfer, _y = training.generate_synthetic_data(n_samples=1200, seed=4)
+    return training.train_cascade(model, label_encoder, X, y, X_transfer, min_agreement=0.95)
+
+
+def test_cascade_calibrates_a_threshold():
+    result = _cascade()
+    assert result is not None
+    first_stage, report = result
+    assert list(first_stage.classes_) == [0, 1, 2]
+    assert first_stage.get_booster().num_boosted_rounds() == report["n_estimators"]
+    assert 0.0 < report["threshold"] <= 1.0
+    assert 0.0 <= report["exit_rate"] <= 1.0
+    assert report["exit_agreement"] is None or report["exit_agreement"] >= 0.0
+
+
+def test_cascade_scores_exits_and_falls_back():
+    first_stage, _report = _cascade()
+    model, _label_encoder = _base_model()
+    X, _y = training.generate_synthetic_data(n_samples=60, seed=5)
+    X = X[training.FEATURE_NAMES]
+
+    first_proba = first_stage.predict_proba(X)
+    # A threshold in the middle of the first stage's confidences, so some rows exit and some do not
+    threshold = float(np.median(first_proba.max(axis=1)))
+    exited = first_proba.max(axis=1) >= threshold
+    cascade = ConfidenceCascade(first_stage, model, threshold)
+    probabilities = cascade.predict_proba(X)
+    assert probabilities.shape == (len(X), 3)
+    assert np.allclose(probabilities.sum(axis=1), 1.0, atol=1e-5)
+    assert cascade.stats["rows"] == len(X)
+    assert cascade.stats["exited"] == int(exited.sum())
+    assert np.allclose(probabilities[exited], first_proba[exited], atol=1e-6)
+    assert np.allclose(probabilities[~exited], model.predict_proba(X[~exited]), atol=1e-6)
+
+    never = ConfidenceCascade(first_stage, model, 1.1)
+    assert np.allclose(never.predict_proba(X), model.predict_proba(X), atol=1e-6)
+    assert never.stats["exited"] == 0
+    always = ConfidenceCascade(first_stage, model, 0.0)
+    assert np.allclose(always.predict_proba(X), first_proba, atol=1e-6)
+    assert always.stats["exit_rate"] == 1.0
+
+if __name__ == "__main__":
+    failures = 0
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_") and callable(value)]
+    for test in tests:
+        try:
+            test()
+            print(f"PASS {test.__name__}")
+        except AssertionError as e:
+            failures += 1
+            print(f"FAIL {test.__name__}: {e}")
+    sys.exit(1 if failures else 0)
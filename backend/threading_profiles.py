@@ -0,0 +1,202 @@
+"""
+CPU threading profiles for XGBoost and the numeric libraries.
+
+Every serving process used to predict with XGBoost's default thread count
+(all cores), so several workers each handling a single-row request
+oversubscribed the CPU. Training, on the other hand, should use every
+available core. A ThreadingProfile fixes both in one place:
+
+- xgb_threads: nthread for the XGBoost model (set on the loaded model)
+- blas_threads: cap for OpenMP/BLAS pools in numpy, scipy and scikit-learn
+  (environment variables, which only take effect before numpy is imported)
+
+    serving   XGB_INFERENCE_THREADS (default: available CPUs / WEB_CONCURRENCY,
+              which gunicorn.conf.py sets to its worker count)
+              BLAS_THREADS (default: 1)
+    training  XGB_TRAINING_THREADS (default: available CPUs)
+              BLAS_THREADS (default: XGB_TRAINING_THREADS)
+
+This module must not import numpy at module level. To measure the best
+settings on the current machine, run:
+
+    python threading_profiles.py calibrate --workers 4
+"""
+
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+BLAS_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+)
+
+
+def available_cpus() -> int:
+    """CPUs this process may run on (respects affinity/cpusets where the OS reports them)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on Windows/macOS
+        return os.cpu_count() or 1
+
+
+def _env_int(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+def server_workers() -> int:
+    """Worker processes for the pre-fork server: WEB_CONCURRENCY, or one per available CPU."""
+    return _env_int("WEB_CONCURRENCY") or available_cpus()
+
+
+def configure_model(model: Any, threads: int):
+    """Set the thread count of an XGBClassifier and of its booster (used directly for SHAP)."""
+    model.set_params(n_jobs=threads)
+    model.get_booster().set_param({"nthread": threads})
+
+
+class ThreadingProfile:
+    """Thread counts for one kind of process."""
+
+    def __init__(self, name: str, xgb_threads: int, blas_threads: int):
+        self.name = name
+        self.xgb_threads = max(1, xgb_threads)
+        self.blas_threads = max(1, blas_threads)
+
+    def apply_env(self) -> "ThreadingProfile":
+        """Cap the OpenMP/BLAS pools unless already set; call before numpy is imported."""
+        for var in BLAS_ENV_VARS:
+            os.environ.setdefault(var, str(self.blas_threads))
+        return self
+
+    def configure(self, model: Any):
+        configure_model(model, self.xgb_threads)
+
+    def __repr__(self) -> str:
+        return f"ThreadingProfile({self.name!r}, xgb_threads={self.xgb_threads}, blas_threads={self.blas_threads})"
+
+
+def serving_profile() -> ThreadingProfile:
+    """
+    Per-worker inference threads: the CPUs divided between the serving processes.
+
+    Without WEB_CONCURRENCY this is a single server process (python app.py);
+    gunicorn.conf.py exports its worker count before the app is imported.
+    """
+    workers = _env_int("WEB_CONCURRENCY") or 1
+    xgb_threads = _env_int("XGB_INFERENCE_THREADS") or max(1, available_cpus() // workers)
+    return ThreadingProfile("serving", xgb_threads, _env_int("BLAS_THREADS") or 1)
+
+
+def training_profile() -> ThreadingProfile:
+    xgb_threads = _env_int("XGB_TRAINING_THREADS") or available_cpus()
+    return ThreadingProfile("training", xgb_threads, _env_int("BLAS_THREADS") or xgb_threads)
+
+
+def calibrate(
+    model_path: str,
+    thread_counts: Optional[Sequence[int]] = None,
+    batch_sizes: Sequence[int] = (1, 64, 1000),
+    workers: int = 1,
+    repeats: int = 200,
+) -> Dict[str, Any]:
+    """
+    Measure predict_proba latency for each thread count and batch size.
+
+    Returns the median latencies (ms) and the recommended per-worker inference
+    threads: the fastest single-row setting within the CPUs available per
+    worker (fewer threads wins ties within 5%).
+    """
+    import pickle
+    import time
+
+    import numpy as np
+    import pandas as pd
+
+    with open(model_path, "rb") as f:
+        model = pickle.load(f)
+    feature_names = model.get_booster().feature_names
+
+    cpus = available_cpus()
+    if not thread_counts:
+        thread_counts = sorted({1, 2, 4, 8, 16, 32, cpus} & set(range(1, max(cpus, 2) + 1)))
+    rng = np.random.default_rng(0)
+    results: Dict[int, Dict[int, float]] = {}
+    for threads in thread_counts:
+        configure_model(model, threads)
+        results[threads] = {}
+        for size in batch_sizes:
+            frame = pd.DataFrame({
+                "Temperature": rng.uniform(36.5, 40.0, size), "Age": rng.integers(18, 75, size),
+                "BMI": rng.uniform(18, 32, size), "Fever_Duration": rng.integers(1, 12, size),
+                "Compliance_Rate": rng.uniform(40, 100, size), "Headache": rng.integers(0, 2, size),
+                "Body_Ache": rng.integers(0, 2, size), "Fatigue": rng.integers(0, 2, size),
+                "Chronic_Conditions": rng.integers(0, 2, size),
+            })[feature_names]
+            model.predict_proba(frame)  # warm up
+            n = max(5, repeats // max(1, size // 64))
+            samples = []
+            for _ in range(n):
+                start = time.perf_counter()
+                model.predict_proba(frame)
+                samples.append(time.perf_counter() - start)
+            results[threads][size] = float(np.median(samples)) * 1000
+
+    budget = max(1, cpus // max(1, workers))
+    eligible = [t for t in thread_counts if t <= budget] or [min(thread_counts)]
+    single = min(batch_sizes)
+    best = min(results[t][single] for t in eligible)
+    recommended = min(t for t in eligible if results[t][single] <= best * 1.05)
+    return {
+        "cpus": cpus,
+        "workers": workers,
+        "latency_ms": results,
+        "recommended": {
+            "XGB_INFERENCE_THREADS": recommended,
+            "XGB_TRAINING_THREADS": cpus,
+            "BLAS_THREADS": 1,
+        },
+    }
+
+
+def _print_calibration(report: Dict[str, Any]):
+    sizes = list(next(iter(report["latency_ms"].values())))
+    print(f"{report['cpus']} CPU(s) available, {report['workers']} serving worker(s)")
+    print("threads " + "".join(f"{f'batch {size} (ms)':>18}" for size in sizes))
+    for threads, row in report["latency_ms"].items():
+        print(f"{threads:7d} " + "".join(f"{row[size]:18.3f}" for size in sizes))
+    print("\nRecommended settings:")
+    for name, value in report["recommended"].items():
+        print(f"  {name}={value}")
+
+
+def main(argv: Optional[List[str]] = None):
+    import argparse
+    from pathlib import Path
+
+    parser = argparse.ArgumentParser(description="Threading profiles for XGBoost inference and training.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    cal = commands.add_parser("calibrate", help="Measure latency across thread counts and recommend settings")
+    cal.add_argument("--model", default=str(Path(__file__).parent / "models" / "fever_model.pkl"))
+    cal.add_argument("--workers", type=int, default=server_workers(),
+                     help="Serving processes that will share the CPUs (default: as gunicorn.conf.py)")
+    cal.add_argument("--threads", default=None, help="Comma-separated thread counts (default: powers of two up to the CPU count)")
+    cal.add_argument("--batch-sizes", default="1,64,1000", help="Comma-separated batch sizes")
+    args = parser.parse_args(argv)
+
+    # Measure XGBoost alone, without the BLAS pools competing for the same cores
+    ThreadingProfile("calibration", 1, 1).apply_env()
+    report = calibrate(
+        args.model,
+        thread_counts=[int(t) for t in args.threads.split(",")] if args.threads else None,
+        batch_sizes=[int(size) for size in args.batch_sizes.split(",")],
+        workers=args.workers,
+    )
+    _print_calibration(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -21,20 +21,36 @@ Features:
 Target: Decision (CONTINUE, CONSULT_DOCTOR, LIKELY_SAFE_TO_STOP)
 """
 
+import argparse
+import hashlib
 import json
 import logging
 import os
 import pickle
+import random
+import shutil
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import product
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import threading_profiles
+
+# Training uses every available core by default; the BLAS/OpenMP caps must be set before numpy is imported
+THREADING_PROFILE = threading_profiles.training_profile().apply_env()
 
 import numpy as np
 import pandas as pd
 import xgboost as xgb
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
+from sklearn.model_selection import StratifiedKFold, train_test_split
+from sklearn.metrics import accuracy_score, classification_report, confusion_matrix, log_loss
 from sklearn.preprocessing import LabelEncoder
 
+from cascade import ConfidenceCascade, calibrate_threshold, evaluate_cascade
+from drift_monitor import build_reference_profile, save_reference_profile
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -48,6 +64,9 @@ MODEL_DIR.mkdir(exist_ok=True)
 MODEL_PATH = MODEL_DIR / "fever_model.pkl"
 FEATURE_NAMES_PATH = MODEL_DIR / "feature_names.json"
 LABEL_ENCODER_PATH = MODEL_DIR / "label_encoder.pkl"
+REFERENCE_PROFILE_PATH = MODEL_DIR / "reference_profile.json"  # Training distribution for drift_monitor.py
+CASCADE_MODEL_PATH = MODEL_DIR / "fever_cascade.pkl"  # First stage of cascade.py, trained with --cascade
+CASCADE_CONFIG_PATH = MODEL_DIR / "cascade.json"
 
 # Feature names (must match training data)
 FEATURE_NAMES = [
@@ -65,8 +84,182 @@ FEATURE_NAMES = [
 # Decision labels
 DECISION_LABELS = ["CONTINUE", "CONSULT_DOCTOR", "LIKELY_SAFE_TO_STOP"]
 
+# Label column in on-disk datasets
+TARGET_COLUMN = "Decision"
+
+# Validation scenarios (mirrors test_predictions.py)
+SAMPLE_SCENARIOS = [
+    {
+        "name": "SCENARIO 1: Should CONTINUE",
+        "data": {
+            "Temperature": 39.2,
+            "Age": 28,
+            "BMI": 24.5,
+            "Fever_Duration": 3,
+            "Compliance_Rate": 85,
+            "Headache": 1,
+            "Body_Ache": 1,
+            "Fatigue": 1,
+            "Chronic_Conditions": 0
+        },
+        "expected": "CONTINUE"
+    },
+    {
+        "name": "SCENARIO 2: Should CONSULT_DOCTOR",
+        "data": {
+            "Temperature": 38.0,
+            "Age": 35,
+            "BMI": 26.0,  # Default BMI if not provided
+            "Fever_Duration": 4,
+            "Compliance_Rate": 60,
+            "Headache": 1,
+            "Body_Ache": 0,
+            "Fatigue": 0,
+            "Chronic_Conditions": 0
+        },
+        "expected": "CONSULT_DOCTOR"
+    },
+    {
+        "name": "SCENARIO 3: Should LIKELY_SAFE_TO_STOP",
+        "data": {
+            "Temperature": 37.1,
+            "Age": 25,
+            "BMI": 22.0,
+            "Fever_Duration": 7,
+            "Compliance_Rate": 95,
+            "Headache": 0,
+            "Body_Ache": 0,
+            "Fatigue": 0,
+            "Chronic_Conditions": 0
+        },
+        "expected": "LIKELY_SAFE_TO_STOP"
+    }
+]
+
+# XGBoost parameters (optimized for medical classification with class weights)
+MODEL_PARAMS = {
+    'objective': 'multi:softprob',
+    'num_class': len(DECISION_LABELS),
+    'max_depth': 6,
+    'learning_rate': 0.1,
+    'n_estimators': 200,
+    'subsample': 0.8,
+    'colsample_bytree': 0.8,
+    'min_child_weight': 3,
+    'gamma': 0.1,
+    'reg_alpha': 0.1,
+    'reg_lambda': 1.0,
+    'random_state': 42,
+    'eval_metric': 'mlogloss',
+    'scale_pos_weight': 1.0,  # Will use sample_weight instead
+    'n_jobs': THREADING_PROFILE.xgb_threads
+}
+
+
+def _bernoulli(rng: np.random.Generator, p: float, size: int) -> np.ndarray:
+    """Draw 0/1 flags that are 1 with probability p."""
+    return (rng.random(size) < p).astype(np.int64)
+
+
+def _continue_block(rng: np.random.Generator, n: int) -> Dict[str, np.ndarray]:
+    """CONTINUE: High temp, short duration, good compliance, symptoms."""
+    return {
+        "Temperature": rng.uniform(38.5, 39.5, n),  # High fever
+        "Age": rng.integers(18, 65, n),
+        "BMI": rng.uniform(20, 28, n),
+        "Fever_Duration": rng.integers(1, 5, n),  # Short duration
+        "Compliance_Rate": rng.uniform(75, 100, n),  # Good compliance
+        "Headache": _bernoulli(rng, 0.8, n),  # Usually has symptoms
+        "Body_Ache": _bernoulli(rng, 0.7, n),
+        "Fatigue": _bernoulli(rng, 0.8, n),
+        "Chronic_Conditions": np.zeros(n, dtype=np.int64),  # Usually no chronic conditions
+    }
+
+
+def _consult_doctor_block(rng: np.random.Generator, n: int) -> Dict[str, np.ndarray]:
+    """CONSULT_DOCTOR: low compliance (40%), long duration (42%) or chronic conditions (18%)."""
+    low_compliance = rng.random(n) < 0.4
+    long_duration = ~low_compliance & (rng.random(n) < 0.7)
+    chronic = ~low_compliance & ~long_duration
+
+    # Low compliance case
+    temperature = rng.uniform(37.5, 39.0, n)
+    compliance_rate = rng.uniform(40, 65, n)
+    fever_duration = rng.integers(2, 8, n)
+
+    # Long duration case
+    temperature[long_duration] = rng.uniform(37.5, 38.5, n)[long_duration]
+    compliance_rate[long_duration] = rng.uniform(60, 85, n)[long_duration]
+    fever_duration[long_duration] = rng.integers(5, 12, n)[long_duration]
+
+    # Chronic conditions case: older, heavier, symptoms a coin flip
+    compliance_rate[chronic] = rng.uniform(50, 90, n)[chronic]
+    fever_duration[chronic] = rng.integers(2, 10, n)[chronic]
+
+    age = np.where(chronic, rng.integers(35, 75, n), rng.integers(18, 70, n))
+    bmi = np.where(chronic, rng.uniform(22, 32, n), rng.uniform(20, 30, n))
+    chronic_conditions = np.where(chronic, 1, _bernoulli(rng, 0.3, n))
+
+    return {
+        "Temperature": temperature,
+        "Age": age,
+        "BMI": bmi,
+        "Fever_Duration": fever_duration,
+        "Compliance_Rate": compliance_rate,
+        "Headache": np.where(chronic, _bernoulli(rng, 0.5, n), _bernoulli(rng, 0.7, n)),
+        "Body_Ache": np.where(chronic, _bernoulli(rng, 0.5, n), _bernoulli(rng, 0.6, n)),
+        "Fatigue": np.where(chronic, _bernoulli(rng, 0.5, n), _bernoulli(rng, 0.7, n)),
+        "Chronic_Conditions": chronic_conditions,
+    }
+
+
+def _likely_safe_to_stop_block(rng: np.random.Generator, n: int) -> Dict[str, np.ndarray]:
+    """LIKELY_SAFE_TO_STOP: Low temp, long duration, excellent compliance, minimal symptoms."""
+    symptom_prob = 0.2  # Low probability of symptoms (recovering)
+    return {
+        "Temperature": rng.uniform(36.5, 37.5, n),  # Low/normal temp
+        "Age": rng.integers(18, 50, n),
+        "BMI": rng.uniform(20, 26, n),
+        "Fever_Duration": rng.integers(6, 12, n),  # Long duration (recovering)
+        "Compliance_Rate": rng.uniform(90, 100, n),  # Excellent compliance
+        "Headache": _bernoulli(rng, symptom_prob, n),
+        "Body_Ache": _bernoulli(rng, symptom_prob, n),
+        "Fatigue": _bernoulli(rng, symptom_prob, n),
+        "Chronic_Conditions": np.zeros(n, dtype=np.int64),  # No chronic conditions
+    }
+
+
+CLASS_GENERATORS = {
+    "CONTINUE": _continue_block,
+    "CONSULT_DOCTOR": _consult_doctor_block,
+    "LIKELY_SAFE_TO_STOP": _likely_safe_to_stop_block,
+}
+
+
+def generate_synthetic_chunk(n_samples: int, rng: np.random.Generator) -> Tuple[pd.DataFrame, pd.Series]:
+    """
+    Generate one balanced, shuffled chunk of synthetic samples from rng.
+    
+    Each class's columns are drawn in bulk, then 10% of rows (drawn with
+    replacement) get a random label as noise.
+    """
+    samples_per_class = n_samples // 3
+    blocks = [CLASS_GENERATORS[label](rng, samples_per_class) for label in DECISION_LABELS]
+    columns = {name: np.concatenate([block[name] for block in blocks]) for name in FEATURE_NAMES}
+    labels = np.repeat(np.array(DECISION_LABELS, dtype=object), samples_per_class)
+    
+    # Add some noise/variation (10% of samples with random assignment)
+    noise_count = int(n_samples * 0.1)
+    if len(labels) and noise_count:
+        noise_idx = rng.integers(0, len(labels), noise_count)
+        labels[noise_idx] = rng.choice(np.array(DECISION_LABELS, dtype=object), noise_count)
+    
+    order = rng.permutation(len(labels))
+    df = pd.DataFrame({name: values[order] for name, values in columns.items()}, columns=FEATURE_NAMES)
+    return df, pd.Series(labels[order], name=TARGET_COLUMN)
+
 
-def generate_synthetic_data(n_samples: int = 6000) -> Tuple[pd.DataFrame, pd.Series]:
+def generate_synthetic_data(n_samples: int = 6000, seed: int = 42) -> Tuple[pd.DataFrame, pd.Series]:
     """
     Generate balanced synthetic training data based on medical logic.
     
@@ -74,115 +267,103 @@ def generate_synthetic_data(n_samples: int = 6000) -> Tuple[pd.DataFrame, pd.Ser
     - CONTINUE: High temp (38.5-39.5°C), short duration (1-5 days), good compliance (>75%), symptoms present
     - CONSULT_DOCTOR: Moderate-high temp (>37.5°C), low compliance (<65%), OR long duration (>5 days), OR chronic conditions
     - LIKELY_SAFE_TO_STOP: Low temp (<37.5°C), long duration (>6 days), excellent compliance (>90%), minimal symptoms
+    
+    For datasets that do not fit in memory use write_synthetic_dataset().
     """
-    np.random.seed(42)
-    data = []
-    labels = []
+    logger.info(f"Generating {n_samples} balanced synthetic samples ({n_samples // 3} per class)...")
     
-    # Generate balanced samples per class
-    samples_per_class = n_samples // 3
+    df, y = generate_synthetic_chunk(n_samples, np.random.default_rng(seed))
     
-    logger.info(f"Generating {n_samples} balanced synthetic samples ({samples_per_class} per class)...")
-    
-    # Generate CONTINUE samples
-    for i in range(samples_per_class):
-        # CONTINUE: High temp, short duration, good compliance, symptoms
-        temperature = np.random.uniform(38.5, 39.5)  # High fever
-        fever_duration = np.random.randint(1, 5)  # Short duration
-        compliance_rate = np.random.uniform(75, 100)  # Good compliance
-        age = np.random.randint(18, 65)
-        bmi = np.random.uniform(20, 28)
-        headache = np.random.choice([0, 1], p=[0.2, 0.8])  # Usually has symptoms
-        body_ache = np.random.choice([0, 1], p=[0.3, 0.7])
-        fatigue = np.random.choice([0, 1], p=[0.2, 0.8])
-        chronic_conditions = 0  # Usually no chronic conditions
-        
-        data.append([
-            temperature, age, bmi, fever_duration, compliance_rate,
-            headache, body_ache, fatigue, chronic_conditions
-        ])
-        labels.append("CONTINUE")
-    
-    # Generate CONSULT_DOCTOR samples
-    for i in range(samples_per_class):
-        # CONSULT_DOCTOR: Various risk factors
-        if np.random.random() < 0.4:
-            # Low compliance case
-            temperature = np.random.uniform(37.5, 39.0)
-            compliance_rate = np.random.uniform(40, 65)  # Low compliance
-            fever_duration = np.random.randint(2, 8)
-        elif np.random.random() < 0.7:
-            # Long duration case
-            temperature = np.random.uniform(37.5, 38.5)
-            compliance_rate = np.random.uniform(60, 85)
-            fever_duration = np.random.randint(5, 12)  # Long duration
-        else:
-            # Chronic conditions case
-            temperature = np.random.uniform(37.5, 39.0)
-            compliance_rate = np.random.uniform(50, 90)
-            fever_duration = np.random.randint(2, 10)
-            chronic_conditions = 1
-            age = np.random.randint(35, 75)  # Older with chronic conditions
-            bmi = np.random.uniform(22, 32)
-            data.append([
-                temperature, age, bmi, fever_duration, compliance_rate,
-                np.random.choice([0, 1]), np.random.choice([0, 1]),
-                np.random.choice([0, 1]), chronic_conditions
-            ])
-            labels.append("CONSULT_DOCTOR")
-            continue
-        
-        age = np.random.randint(18, 70)
-        bmi = np.random.uniform(20, 30)
-        chronic_conditions = 0 if np.random.random() > 0.3 else 1
-        
-        data.append([
-            temperature, age, bmi, fever_duration, compliance_rate,
-            np.random.choice([0, 1], p=[0.3, 0.7]),
-            np.random.choice([0, 1], p=[0.4, 0.6]),
-            np.random.choice([0, 1], p=[0.3, 0.7]),
-            chronic_conditions
-        ])
-        labels.append("CONSULT_DOCTOR")
-    
-    # Generate LIKELY_SAFE_TO_STOP samples
-    for i in range(samples_per_class):
-        # LIKELY_SAFE_TO_STOP: Low temp, long duration, excellent compliance, minimal symptoms
-        temperature = np.random.uniform(36.5, 37.5)  # Low/normal temp
-        fever_duration = np.random.randint(6, 12)  # Long duration (recovering)
-        compliance_rate = np.random.uniform(90, 100)  # Excellent compliance
-        age = np.random.randint(18, 50)
-        bmi = np.random.uniform(20, 26)
-        # Minimal symptoms (recovering)
-        symptom_prob = 0.2  # Low probability of symptoms
-        headache = np.random.choice([0, 1], p=[1-symptom_prob, symptom_prob])
-        body_ache = np.random.choice([0, 1], p=[1-symptom_prob, symptom_prob])
-        fatigue = np.random.choice([0, 1], p=[1-symptom_prob, symptom_prob])
-        chronic_conditions = 0  # No chronic conditions
-        
-        data.append([
-            temperature, age, bmi, fever_duration, compliance_rate,
-            headache, body_ache, fatigue, chronic_conditions
-        ])
-        labels.append("LIKELY_SAFE_TO_STOP")
+    logger.info(f"Generated data distribution:\n{y.value_counts()}")
+    return df, y
+
+
+def _write_synthetic_chunk(args: Tuple[Path, int, np.random.SeedSequence, str]) -> Path:
+    """Generate one chunk from its own seed stream and write it (runs in worker processes)."""
+    path, n_samples, seed_seq, fmt = args
+    X, y = generate_synthetic_chunk(n_samples, np.random.default_rng(seed_seq))
+    if fmt == "npy":
+        np.save(path.with_suffix(".features.npy"), X.to_numpy(dtype=np.float32))
+        np.save(path.with_suffix(".labels.npy"), y.to_numpy(dtype=str))
+        return path.with_suffix(".features.npy")
     
-    # Add some noise/variation (10% of samples with random assignment)
-    noise_count = int(n_samples * 0.1)
-    for i in range(noise_count):
-        idx = np.random.randint(0, len(data))
-        # Randomly change label
-        labels[idx] = np.random.choice(DECISION_LABELS)
+    frame = X.assign(**{TARGET_COLUMN: y.to_numpy()})
+    if fmt == "parquet":
+        frame.to_parquet(path.with_suffix(".parquet"), index=False)
+        return path.with_suffix(".parquet")
+    frame.to_csv(path.with_suffix(".csv"), index=False)
+    return path.with_suffix(".csv")
+
+
+def write_synthetic_dataset(
+    output_dir: Path,
+    n_samples: int,
+    chunk_size: int = 300_000,
+    seed: int = 42,
+    workers: Optional[int] = None,
+    fmt: str = "parquet",
+) -> List[Path]:
+    """
+    Stream a synthetic dataset to disk as numbered shards (part-00000.<fmt>, ...).
     
-    df = pd.DataFrame(data, columns=FEATURE_NAMES)
-    y = pd.Series(labels)
+    Every chunk gets an independent child stream of SeedSequence(seed), so the
+    output is reproducible regardless of how many worker processes generate it.
+    Formats: parquet (needs pyarrow), csv, or npy (float32 features + label array).
+    """
+    if fmt not in ("parquet", "csv", "npy"):
+        raise ValueError(f"Unsupported dataset format: {fmt}")
     
-    logger.info(f"Generated data distribution:\n{y.value_counts()}")
-    return df, y
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    
+    n_chunks = max(1, -(-n_samples // chunk_size))
+    seeds = np.random.SeedSequence(seed).spawn(n_chunks)
+    tasks = []
+    for i, seed_seq in enumerate(seeds):
+        rows = min(chunk_size, n_samples - i * chunk_size)
+        tasks.append((output_dir / f"part-{i:05d}", rows, seed_seq, fmt))
+    
+    logger.info(f"Writing {n_samples} synthetic samples to {output_dir} as {n_chunks} {fmt} shard(s)...")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        paths = []
+        for path in pool.map(_write_synthetic_chunk, tasks):
+            logger.info(f"   - {path.name}")
+            paths.append(path)
+    
+    return paths
+
+
+def _class_weights(y_encoded: np.ndarray) -> Dict[int, float]:
+    """Inverse-frequency class weights for balanced training."""
+    class_counts = Counter(y_encoded)
+    total_samples = len(y_encoded)
+    return {int(i): total_samples / (len(class_counts) * count)
+            for i, count in class_counts.items()}
+
+
+def _split_train_test(X: pd.DataFrame, y_encoded: np.ndarray):
+    """The train/test split used by train_model (and reproduced by compress_model)."""
+    return train_test_split(X, y_encoded, test_size=0.2, random_state=42, stratify=y_encoded)
 
 
-def train_model(X: pd.DataFrame, y: pd.Series) -> Tuple[xgb.XGBClassifier, LabelEncoder]:
+def _log_accuracy(accuracy: float):
+    logger.info("\n" + "="*60)
+    logger.info(f"MODEL ACCURACY: {accuracy:.4f} ({accuracy*100:.2f}%)")
+    logger.info("="*60)
+    
+    if accuracy >= 0.90:
+        logger.info("✅ EXCELLENT: Model accuracy >= 90%")
+    elif accuracy >= 0.85:
+        logger.info("✅ GOOD: Model accuracy >= 85%")
+    else:
+        logger.warning("⚠️  Model accuracy < 85%. Consider tuning hyperparameters.")
+
+
+def train_model(X: pd.DataFrame, y: pd.Series, params: Optional[Dict] = None) -> Tuple[xgb.XGBClassifier, LabelEncoder]:
     """
     Train XGBoost classifier with hyperparameter tuning.
+    
+    params overrides entries of MODEL_PARAMS (e.g. the winner of search_hyperparameters).
     """
     logger.info("Training XGBoost model...")
     
@@ -191,39 +372,18 @@ def train_model(X: pd.DataFrame, y: pd.Series) -> Tuple[xgb.XGBClassifier, Label
     y_encoded = label_encoder.fit_transform(y)
     
     # Split data
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y_encoded, test_size=0.2, random_state=42, stratify=y_encoded
-    )
+    X_train, X_test, y_train, y_test = _split_train_test(X, y_encoded)
     
     logger.info(f"Training set: {len(X_train)} samples")
     logger.info(f"Test set: {len(X_test)} samples")
     
     # Calculate class weights for balanced training
-    from collections import Counter
-    class_counts = Counter(y_encoded)
-    total_samples = len(y_encoded)
-    class_weights = {i: total_samples / (len(class_counts) * count) 
-                     for i, count in class_counts.items()}
+    class_weights = _class_weights(y_encoded)
     
     logger.info(f"Class weights: {class_weights}")
     
     # XGBoost parameters (optimized for medical classification with class weights)
-    params = {
-        'objective': 'multi:softprob',
-        'num_class': len(DECISION_LABELS),
-        'max_depth': 6,
-        'learning_rate': 0.1,
-        'n_estimators': 200,
-        'subsample': 0.8,
-        'colsample_bytree': 0.8,
-        'min_child_weight': 3,
-        'gamma': 0.1,
-        'reg_alpha': 0.1,
-        'reg_lambda': 1.0,
-        'random_state': 42,
-        'eval_metric': 'mlogloss',
-        'scale_pos_weight': 1.0  # Will use sample_weight instead
-    }
+    params = {**MODEL_PARAMS, **(params or {})}
     
     # Calculate sample weights for balanced training
     sample_weights_train = np.array([class_weights[y] for y in y_train])
@@ -242,16 +402,7 @@ def train_model(X: pd.DataFrame, y: pd.Series) -> Tuple[xgb.XGBClassifier, Label
     y_pred = model.predict(X_test)
     accuracy = accuracy_score(y_test, y_pred)
     
-    logger.info("\n" + "="*60)
-    logger.info(f"MODEL ACCURACY: {accuracy:.4f} ({accuracy*100:.2f}%)")
-    logger.info("="*60)
-    
-    if accuracy >= 0.90:
-        logger.info("✅ EXCELLENT: Model accuracy >= 90%")
-    elif accuracy >= 0.85:
-        logger.info("✅ GOOD: Model accuracy >= 85%")
-    else:
-        logger.warning("⚠️  Model accuracy < 85%. Consider tuning hyperparameters.")
+    _log_accuracy(accuracy)
     
     # Classification report
     logger.info("\nClassification Report:")
@@ -270,9 +421,766 @@ def train_model(X: pd.DataFrame, y: pd.Series) -> Tuple[xgb.XGBClassifier, Label
     return model, label_encoder
 
 
-def save_model(model: xgb.XGBClassifier, label_encoder: LabelEncoder):
+# Default search space for --search (override with --search-space FILE.json)
+DEFAULT_SEARCH_SPACE = {
+    "max_depth": [2, 3, 4, 6],
+    "learning_rate": [0.05, 0.1, 0.3],
+    "n_estimators": [400],
+    "min_child_weight": [1, 3],
+    "subsample": [0.8, 1.0],
+    "colsample_bytree": [0.8, 1.0],
+}
+
+SEARCH_LEADERBOARD_PATH = MODEL_DIR / "search_leaderboard.csv"
+
+# Worker-process state for search trials, set once per process by _init_search_worker
+_search_data: Dict[str, object] = {}
+
+
+def _init_search_worker(X: pd.DataFrame, y: np.ndarray, weights: np.ndarray):
+    _search_data.update(X=X, y=y, weights=weights)
+
+
+def _measure_latency(model: xgb.XGBClassifier, X: pd.DataFrame, repeats: int = 200, batch_rows: int = 1000) -> Tuple[float, float]:
+    """Median single-row latency (ms) and per-row latency within a batch (us), called the way the API does."""
+    row = X.iloc[:1]
+    batch = X.iloc[:batch_rows]
+    model.predict_proba(row)  # warm up
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.predict_proba(row)
+        timings.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    for _ in range(5):
+        model.predict_proba(batch)
+    batch_seconds = (time.perf_counter() - start) / 5
+    return float(np.median(timings) * 1e3), float(batch_seconds / len(batch) * 1e6)
+
+
+def _run_search_trial(args: Tuple[int, Dict, List[Tuple[np.ndarray, np.ndarray]], float, int, int]) -> Dict:
+    """Cross-validate one parameter set (runs in worker processes)."""
+    trial_id, trial_params, folds, deadline, n_jobs, early_stopping_rounds = args
+    X, y, weights = _search_data["X"], _search_data["y"], _search_data["weights"]
+    params = {**MODEL_PARAMS, **trial_params, "tree_method": "hist", "n_jobs": n_jobs,
+              "early_stopping_rounds": early_stopping_rounds}
+    params.pop("scale_pos_weight", None)  # Balancing comes from the per-row weights
+    
+    result = {"trial": trial_id, "params": json.dumps(trial_params, sort_keys=True), "status": "ok"}
+    accuracies, losses, best_rounds = [], [], []
+    start = time.perf_counter()
+    model = None
+    for train_idx, valid_idx in folds:
+        if time.time() > deadline:
+            result["status"] = "timeout"
+            break
+        model = xgb.XGBClassifier(**params)
+        model.fit(
+            X.iloc[train_idx], y[train_idx],
+            sample_weight=weights[train_idx],
+            eval_set=[(X.iloc[valid_idx], y[valid_idx])],
+            verbose=False
+        )
+        proba = model.predict_proba(X.iloc[valid_idx])
+        accuracies.append(accuracy_score(y[valid_idx], proba.argmax(axis=1)))
+        losses.append(log_loss(y[valid_idx], proba, labels=np.arange(proba.shape[1])))
+        best_rounds.append(model.best_iteration + 1)
+    
+    result["folds"] = len(accuracies)
+    result["fit_seconds"] = time.perf_counter() - start
+    if not accuracies:
+        return result
+    result["cv_accuracy"] = float(np.mean(accuracies))
+    result["cv_accuracy_std"] = float(np.std(accuracies))
+    result["cv_logloss"] = float(np.mean(losses))
+    result["n_estimators"] = int(round(np.mean(best_rounds)))
+    
+    # Latency of the early-stopped model as it would be served
+    model.set_params(n_jobs=1)
+    model.get_booster().set_param({"nthread": 1})
+    result["row_latency_ms"], result["batch_latency_us_per_row"] = _measure_latency(model, X)
+    return result
+
+
+def _search_candidates(space: Dict[str, List], max_trials: Optional[int], seed: int) -> List[Dict]:
+    """Expand the search space into a grid, sampled down to max_trials if needed."""
+    names = sorted(space)
+    grid = [dict(zip(names, values)) for values in product(*(space[name] for name in names))]
+    if max_trials and len(grid) > max_trials:
+        grid = random.Random(seed).sample(grid, max_trials)
+    return grid
+
+
+def search_hyperparameters(
+    X: pd.DataFrame,
+    y: pd.Series,
+    space: Optional[Dict[str, List]] = None,
+    n_folds: int = 5,
+    workers: Optional[int] = None,
+    cpus: Optional[int] = None,
+    time_budget: Optional[float] = None,
+    max_trials: Optional[int] = None,
+    early_stopping_rounds: int = 20,
+    leaderboard_path: Path = SEARCH_LEADERBOARD_PATH,
+    seed: int = 42,
+) -> Dict:
+    """
+    Cross-validate candidate parameter sets in a process pool and return the best one.
+    
+    Every trial uses the hist tree method with early stopping on each validation
+    fold, so weak configurations stop adding trees early. The cpus budget is
+    split between worker processes, and once time_budget seconds have passed
+    no new trials start and running trials stop after their current fold.
+    A leaderboard of CV accuracy against single-row and batch inference
+    latency is written to leaderboard_path. Latency is measured single-threaded
+    inside the busy worker pool, so use it to compare candidates rather than as
+    an absolute serving figure.
+    
+    The returned params include n_estimators set to the mean early-stopping round.
+    """
+    space = space or DEFAULT_SEARCH_SPACE
+    candidates = _search_candidates(space, max_trials, seed)
+    cpus = cpus or os.cpu_count() or 1
+    workers = max(1, min(workers or cpus, cpus, len(candidates)))
+    n_jobs = max(1, cpus // workers)
+    deadline = time.time() + time_budget if time_budget else float("inf")
+    
+    label_encoder = LabelEncoder()
+    y_encoded = label_encoder.fit_transform(y)
+    class_weights = _class_weights(y_encoded)
+    weights = np.array([class_weights[label] for label in y_encoded])
+    X_values = X[FEATURE_NAMES].reset_index(drop=True)
+    
+    folds = list(StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=seed).split(X_values, y_encoded))
+    
+    logger.info(f"Searching {len(candidates)} candidate(s) with {n_folds}-fold CV "
+                f"on {workers} worker(s) x {n_jobs} thread(s)...")
+    
+    results = []
+    pending = iter(enumerate(candidates))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_search_worker,
+                             initargs=(X_values, y_encoded, weights)) as pool:
+        running = set()
+        while True:
+            # Keep the pool full until the budget runs out
+            while len(running) < workers and time.time() < deadline:
+                trial = next(pending, None)
+                if trial is None:
+                    break
+                trial_id, trial_params = trial
+                running.add(pool.submit(_run_search_trial, (trial_id, trial_params, folds, deadline,
+                                                            n_jobs, early_stopping_rounds)))
+            if not running:
+                break
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                results.append(result)
+                if "cv_accuracy" in result:
+                    logger.info(f"Trial {result['trial']}: accuracy {result['cv_accuracy']:.4f}, "
+                                f"{result['row_latency_ms']:.3f} ms/row, params {result['params']}")
+    
+    scored = [r for r in results if "cv_accuracy" in r]
+    if not scored:
+        raise RuntimeError("No search trial finished within the time budget")
+    
+    # Trials cut short by the time budget rank after those that finished every fold
+    leaderboard = pd.DataFrame(results)
+    leaderboard["complete"] = leaderboard["folds"] == n_folds
+    leaderboard = leaderboard.sort_values(
+        ["complete", "cv_accuracy", "row_latency_ms"], ascending=[False, False, True], na_position="last"
+    )
+    leaderboard_path = Path(leaderboard_path)
+    leaderboard_path.parent.mkdir(parents=True, exist_ok=True)
+    leaderboard.to_csv(leaderboard_path, index=False)
+    logger.info(f"Leaderboard ({len(scored)}/{len(candidates)} trials scored) written to {leaderboard_path}")
+    logger.info("\n" + leaderboard.head(10).to_string(index=False))
+    
+    best = leaderboard.iloc[0]
+    best_params = json.loads(best["params"])
+    best_params["n_estimators"] = int(best["n_estimators"])
+    best_params["tree_method"] = "hist"
+    logger.info(f"Best parameters: {best_params}")
+    return best_params
+
+
+COMPRESSION_REPORT_PATH = MODEL_DIR / "compression_report.csv"
+
+
+def _as_classifier(booster: xgb.Booster) -> xgb.XGBClassifier:
+    """Wrap a booster in an XGBClassifier so it can be saved and served like a trained model."""
+    model = xgb.XGBClassifier()
+    model.load_model(bytearray(booster.save_raw("json")))
+    return model
+
+
+def _compression_candidates(model: xgb.XGBClassifier, X_train: pd.DataFrame, y_train: np.ndarray,
+                            weights: np.ndarray) -> Dict[str, xgb.XGBClassifier]:
+    """
+    Build smaller models from the full one.
+    
+    - prune_<k>: the first k boosting rounds of the full model
+    - depth<d>_<n>: n rounds of depth-d trees retrained on the labels
+    - distill_d<d>_<n>: the same shapes trained on the full model's class
+      probabilities (each row repeated once per class, weighted by its probability)
+    """
+    candidates = {}
+    booster = model.get_booster()
+    rounds = booster.num_boosted_rounds()
+    for k in (10, 25, 50, 100):
+        if k < rounds:
+            candidates[f"prune_{k}"] = _as_classifier(booster[:k])
+    
+    teacher = model.predict_proba(X_train)
+    n_classes = teacher.shape[1]
+    X_soft = pd.concat([X_train] * n_classes, ignore_index=True)
+    y_soft = np.repeat(np.arange(n_classes), len(X_train))
+    w_soft = teacher.T.reshape(-1)
+    
+    for depth, n_estimators in ((2, 30), (3, 30), (3, 60), (4, 30)):
+        params = {**MODEL_PARAMS, "max_depth": depth, "n_estimators": n_estimators, "tree_method": "hist"}
+        params.pop("scale_pos_weight", None)
+        candidates[f"depth{depth}_{n_estimators}"] = xgb.XGBClassifier(**params).fit(
+            X_train, y_train, sample_weight=weights, verbose=False
+        )
+        candidates[f"distill_d{depth}_{n_estimators}"] = xgb.XGBClassifier(**params).fit(
+            X_soft, y_soft, sample_weight=w_soft, verbose=False
+        )
+    return candidates
+
+
+def compress_model(
+    model: xgb.XGBClassifier,
+    label_encoder: LabelEncoder,
+    X: pd.DataFrame,
+    y: pd.Series,
+    max_accuracy_drop: float = 0.005,
+    max_log_loss_increase: float = 0.02,
+    pick: Optional[str] = None,
+    report_path: Path = COMPRESSION_REPORT_PATH,
+) -> xgb.XGBClassifier:
+    """
+    Compare compact candidates against the full model and return the one to serve.
+    
+    Candidates are scored on the same held-out split train_model uses:
+    accuracy, log-loss, agreement with the full model, agreement on
+    SAMPLE_SCENARIOS, tree count, and single-row and batch latency. Unless
+    pick names a candidate, the one with the fewest trees (then the lowest
+    batch latency) is chosen among those within max_accuracy_drop and
+    max_log_loss_increase of the full model that agree on every scenario.
+    Single-row latency is mostly fixed per-call overhead, so it is reported
+    but not used for the choice. If nothing qualifies the full model is kept.
+    """
+    logger.info("\n" + "="*60)
+    logger.info("MODEL COMPRESSION")
+    logger.info("="*60)
+    
+    y_encoded = label_encoder.transform(y)
+    X_train, X_test, y_train, y_test = _split_train_test(X, y_encoded)
+    class_weights = _class_weights(y_encoded)
+    weights = np.array([class_weights[label] for label in y_train])
+    
+    scenarios_X = pd.DataFrame([scenario["data"] for scenario in SAMPLE_SCENARIOS], columns=FEATURE_NAMES)
+    full_test_pred = model.predict_proba(X_test).argmax(axis=1)
+    full_scenario_pred = model.predict_proba(scenarios_X).argmax(axis=1)
+    
+    candidates = {"full": model, **_compression_candidates(model, X_train, y_train, weights)}
+    rows = []
+    for name, candidate in candidates.items():
+        proba = candidate.predict_proba(X_test)
+        pred = proba.argmax(axis=1)
+        booster = candidate.get_booster()
+        row_ms, batch_us = _measure_latency(candidate, X_test.reset_index(drop=True))
+        rows.append({
+            "candidate": name,
+            "trees": booster.num_boosted_rounds() * proba.shape[1],
+            "accuracy": accuracy_score(y_test, pred),
+            "log_loss": log_loss(y_test, proba, labels=np.arange(proba.shape[1])),
+            "agreement": float(np.mean(pred == full_test_pred)),
+            "scenario_agreement": float(np.mean(
+                candidate.predict_proba(scenarios_X).argmax(axis=1) == full_scenario_pred
+            )),
+            "row_latency_ms": row_ms,
+            "batch_latency_us_per_row": batch_us,
+        })
+    
+    report = pd.DataFrame(rows).sort_values(["trees", "batch_latency_us_per_row"])
+    report_path = Path(report_path)
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    report.to_csv(report_path, index=False)
+    logger.info("\n" + report.to_string(index=False))
+    logger.info(f"Compression report written to {report_path}")
+    
+    if pick:
+        if pick not in candidates:
+            raise ValueError(f"Unknown compression candidate {pick!r}; choose from {sorted(candidates)}")
+        chosen = pick
+    else:
+        full = report[report["candidate"] == "full"].iloc[0]
+        eligible = report[
+            (report["accuracy"] >= full["accuracy"] - max_accuracy_drop)
+            & (report["log_loss"] <= full["log_loss"] + max_log_loss_increase)
+            & (report["scenario_agreement"] == 1.0)
+        ]
+        chosen = eligible.iloc[0]["candidate"] if len(eligible) else "full"
+    
+    logger.info(f"Selected model for serving: {chosen}")
+    return candidates[chosen]
+
+
+def train_cascade(
+    model: xgb.XGBClassifier,
+    label_encoder: LabelEncoder,
+    X: pd.DataFrame,
+    y: pd.Series,
+    X_transfer: pd.DataFrame,
+    min_agreement: float = 0.995,
+    max_depth: int = 2,
+    n_estimators: int = 10,
+    calibration_fraction: float = 0.25,
+) -> Optional[Tuple[xgb.XGBClassifier, Dict]]:
+    """
+    Train a first-stage model for cascade inference and calibrate its exit threshold.
+    
+    The first stage (n_estimators rounds of depth-max_depth trees) learns the full
+    model's decisions on X_transfer, unlabeled inputs the full model was not
+    trained on (on its own training rows it reproduces label noise that the
+    first stage cannot, and should not, learn). The threshold is the lowest
+    top-class probability at which the first stage agrees with the full model
+    on at least min_agreement of the calibration rows that exit. Exit rate,
+    agreement, accuracy and single-row latency are then reported on
+    train_model's held-out split. Returns (first_stage, report), or None if no
+    threshold reaches min_agreement.
+    """
+    logger.info("\n" + "="*60)
+    logger.info("CASCADE FIRST STAGE")
+    logger.info("="*60)
+    
+    y_encoded = label_encoder.transform(y)
+    _X_train, X_test, _y_train, y_test = _split_train_test(X, y_encoded)
+    X_transfer = X_transfer[FEATURE_NAMES]
+    teacher = model.predict(X_transfer)
+    X_fit, X_calibration, teacher_fit, teacher_calibration = train_test_split(
+        X_transfer, teacher, test_size=calibration_fraction, random_state=42, stratify=teacher
+    )
+    
+    # A higher learning rate gives a handful of trees confident enough probabilities to exit on
+    params = {**MODEL_PARAMS, "max_depth": max_depth, "n_estimators": n_estimators, "learning_rate": 0.3,
+              "tree_method": "hist"}
+    params.pop("scale_pos_weight", None)
+    first_stage = xgb.XGBClassifier(**params).fit(X_fit, teacher_fit, verbose=False)
+    
+    threshold = calibrate_threshold(first_stage.predict_proba(X_calibration), teacher_calibration, min_agreement)
+    if threshold is None:
+        logger.warning(f"⚠️  No first-stage threshold reaches {min_agreement:.2%} agreement; cascade not saved.")
+        return None
+    
+    full_proba = model.predict_proba(X_test)
+    first_proba = first_stage.predict_proba(X_test)
+    report = evaluate_cascade(first_proba, full_proba, threshold, labels=y_test)
+    report.update(min_agreement=min_agreement, max_depth=max_depth, n_estimators=n_estimators)
+    
+    report.update(_cascade_latency(model, ConfidenceCascade(first_stage, model, threshold), X_test))
+    
+    logger.info(f"Threshold: {threshold:.4f} (calibrated for {min_agreement:.2%} agreement on exits)")
+    logger.info(f"Held-out exit rate: {report['exit_rate']:.2%} of {report['rows']} rows")
+    if report["exit_agreement"] is not None:
+        logger.info(f"Agreement with the full model: {report['exit_agreement']:.2%} on exits, {report['agreement']:.2%} overall")
+    logger.info(f"Accuracy: cascade {report['accuracy']:.4f}, full model {report['full_accuracy']:.4f}")
+    logger.info(f"Single-row latency: cascade {report['cascade_latency_ms']:.3f} ms, "
+                f"full model {report['full_latency_ms']:.3f} ms ({report['latency_saved']:.1%} saved on average)")
+    logger.info(f"Batch latency per row: cascade {report['cascade_batch_latency_us_per_row']:.2f} us, "
+                f"full model {report['full_batch_latency_us_per_row']:.2f} us ({report['batch_latency_saved']:.1%} saved)")
+    return first_stage, report
+
+
+def _cascade_latency(model: xgb.XGBClassifier, cascade: ConfidenceCascade, X_test: pd.DataFrame,
+                     rows: int = 500, repeats: int = 5) -> Dict[str, float]:
+    """Average single-row and in-batch latency of the full model and the cascade, with serving thread counts."""
+    serving = threading_profiles.serving_profile()
+    for estimator in (model, cascade.first_stage):
+        serving.configure(estimator)
+    try:
+        X_test = X_test.reset_index(drop=True)
+        timings = {"full": 0.0, "cascade": 0.0}
+        for i in range(min(rows, len(X_test))):
+            row = X_test.iloc[i:i + 1]
+            for name, scorer in (("full", model), ("cascade", cascade)):
+                start = time.perf_counter()
+                scorer.predict_proba(row)
+                timings[name] += time.perf_counter() - start
+        batch_timings = {}
+        for name, scorer in (("full", model), ("cascade", cascade)):
+            start = time.perf_counter()
+            for _ in range(repeats):
+                scorer.predict_proba(X_test)
+            batch_timings[name] = (time.perf_counter() - start) / repeats / len(X_test)
+    finally:
+        for estimator in (model, cascade.first_stage):
+            THREADING_PROFILE.configure(estimator)
+    
+    timed_rows = min(rows, len(X_test))
+    full_ms, cascade_ms = timings["full"] / timed_rows * 1e3, timings["cascade"] / timed_rows * 1e3
+    full_us, cascade_us = batch_timings["full"] * 1e6, batch_timings["cascade"] * 1e6
+    return {
+        "full_latency_ms": full_ms,
+        "cascade_latency_ms": cascade_ms,
+        "latency_saved": 1.0 - cascade_ms / full_ms,
+        "full_batch_latency_us_per_row": full_us,
+        "cascade_batch_latency_us_per_row": cascade_us,
+        "batch_latency_saved": 1.0 - cascade_us / full_us,
+    }
+
+
+def save_cascade(first_stage: xgb.XGBClassifier, report: Dict):
+    """Save the first stage with its threshold, tied to the saved full model's version."""
+    with open(CASCADE_MODEL_PATH, 'wb') as f:
+        pickle.dump(first_stage, f)
+    with open(MODEL_PATH, 'rb') as f:
+        model_version = hashlib.sha256(f.read()).hexdigest()[:12]
+    with open(CASCADE_CONFIG_PATH, 'w') as f:
+        json.dump({"threshold": report["threshold"], "model_version": model_version, "report": report}, f, indent=2)
+    logger.info(f"   - Cascade: {CASCADE_MODEL_PATH}, {CASCADE_CONFIG_PATH}")
+
+
+def dataset_paths(source: Path) -> List[Path]:
+    """Resolve a shard directory (or a single file) to its shard files in order."""
+    source = Path(source)
+    if source.is_file():
+        return [source]
+    paths = sorted(
+        p for p in source.iterdir()
+        if p.suffix in (".parquet", ".csv") or p.name.endswith(".features.npy")
+    )
+    if not paths:
+        raise FileNotFoundError(f"No .parquet, .csv or .features.npy shards found in {source}")
+    return paths
+
+
+def iter_dataset_batches(paths: List[Path], batch_rows: int) -> Iterator[Tuple[pd.DataFrame, np.ndarray]]:
+    """
+    Yield (features, labels) batches of at most batch_rows rows from on-disk shards.
+    
+    Only one batch is held in memory at a time, whatever the shard sizes.
+    """
+    columns = FEATURE_NAMES + [TARGET_COLUMN]
+    for path in paths:
+        if path.suffix == ".parquet":
+            import pyarrow.parquet as pq
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_rows, columns=columns):
+                frame = batch.to_pandas()
+                yield frame[FEATURE_NAMES], frame[TARGET_COLUMN].to_numpy()
+        elif path.suffix == ".csv":
+            for frame in pd.read_csv(path, chunksize=batch_rows, usecols=columns):
+                yield frame[FEATURE_NAMES], frame[TARGET_COLUMN].to_numpy()
+        else:
+            features = np.load(path, mmap_mode="r")
+            labels = np.load(path.with_name(path.name.replace(".features.npy", ".labels.npy")), mmap_mode="r")
+            for start in range(0, len(features), batch_rows):
+                frame = pd.DataFrame(np.asarray(features[start:start + batch_rows]), columns=FEATURE_NAMES)
+                yield frame, np.asarray(labels[start:start + batch_rows])
+
+
+def hash_split_mask(X: pd.DataFrame, test_fraction: float) -> np.ndarray:
+    """
+    Return a boolean mask of rows that belong to the test split.
+    
+    The split is a hash of the feature values, so it is stable across runs and
+    batch boundaries, and identical rows always land on the same side.
+    """
+    buckets = pd.util.hash_pandas_object(X, index=False).to_numpy() % 10_000
+    return buckets < int(round(test_fraction * 10_000))
+
+
+class ShardIterator(xgb.DataIter):
+    """Feed one split of an on-disk dataset to XGBoost batch by batch."""
+    
+    def __init__(self, paths: List[Path], label_encoder: LabelEncoder, class_weights: Dict[int, float],
+                 test: bool, test_fraction: float, batch_rows: int, cache_prefix: str):
+        self._paths = paths
+        self._label_encoder = label_encoder
+        self._weights = np.array([class_weights.get(i, 1.0) for i in range(len(label_encoder.classes_))])
+        self._test = test
+        self._test_fraction = test_fraction
+        self._batch_rows = batch_rows
+        self._batches = None
+        self.rows = 0
+        super().__init__(cache_prefix=cache_prefix)
+    
+    def reset(self):
+        self._batches = None
+    
+    def next(self, input_data) -> bool:
+        if self._batches is None:
+            self._batches = iter_dataset_batches(self._paths, self._batch_rows)
+            self.rows = 0
+        for X, labels in self._batches:
+            mask = hash_split_mask(X, self._test_fraction)
+            if not self._test:
+                mask = ~mask
+            if not mask.any():
+                continue
+            y = self._label_encoder.transform(labels[mask])
+            self.rows += len(y)
+            input_data(data=X[mask], label=y, weight=self._weights[y])
+            return True
+        return False
+
+
+def _count_labels(paths: List[Path], batch_rows: int) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for _X, labels in iter_dataset_batches(paths, batch_rows):
+        values, batch_counts = np.unique(labels.astype(str), return_counts=True)
+        for value, count in zip(values, batch_counts):
+            counts[str(value)] = counts.get(str(value), 0) + int(count)
+    return counts
+
+
+def evaluate_in_chunks(booster: xgb.Booster, paths: List[Path], label_encoder: LabelEncoder,
+                       test_fraction: float, batch_rows: int) -> Tuple[float, float, np.ndarray]:
+    """Compute accuracy, log-loss and the confusion matrix on the test split one batch at a time."""
+    n_classes = len(label_encoder.classes_)
+    cm = np.zeros((n_classes, n_classes), dtype=np.int64)
+    log_loss_sum = 0.0
+    for X, labels in iter_dataset_batches(paths, batch_rows):
+        mask = hash_split_mask(X, test_fraction)
+        if not mask.any():
+            continue
+        y = label_encoder.transform(labels[mask])
+        proba = booster.inplace_predict(X[mask])
+        np.add.at(cm, (y, proba.argmax(axis=1)), 1)
+        log_loss_sum -= np.log(np.clip(proba[np.arange(len(y)), y], 1e-15, 1.0)).sum()
+    total = cm.sum()
+    if total == 0:
+        raise ValueError("Test split is empty; increase --test-fraction or provide more data")
+    return float(np.trace(cm) / total), float(log_loss_sum / total), cm
+
+
+def train_model_out_of_core(paths: List[Path], test_fraction: float = 0.2, batch_rows: int = 100_000,
+                            cache_dir: Optional[Path] = None) -> Tuple[xgb.XGBClassifier, LabelEncoder]:
+    """
+    Train on on-disk shards without loading the dataset into memory.
+    
+    Batches are streamed through a DataIter into an external-memory quantile
+    DMatrix (pages cached under cache_dir), the train/test split is a hash of
+    each row, and evaluation runs batch by batch, so peak memory depends on
+    batch_rows rather than on the dataset size.
+    """
+    logger.info(f"Training XGBoost model out-of-core on {len(paths)} shard(s)...")
+    
+    label_encoder = LabelEncoder().fit(DECISION_LABELS)
+    
+    # Class weights from one label-counting pass
+    label_counts = _count_labels(paths, batch_rows)
+    unknown = set(label_counts) - set(DECISION_LABELS)
+    if unknown:
+        raise ValueError(f"Unknown labels in dataset: {sorted(unknown)}")
+    total_samples = sum(label_counts.values())
+    class_weights = {
+        int(label_encoder.transform([label])[0]): total_samples / (len(label_counts) * count)
+        for label, count in label_counts.items()
+    }
+    logger.info(f"Label counts: {label_counts}")
+    logger.info(f"Class weights: {class_weights}")
+    
+    cache_dir = Path(cache_dir) if cache_dir else MODEL_DIR / "xgb_cache"
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    
+    train_iter = ShardIterator(paths, label_encoder, class_weights, test=False, test_fraction=test_fraction,
+                               batch_rows=batch_rows, cache_prefix=str(cache_dir / "train"))
+    test_iter = ShardIterator(paths, label_encoder, class_weights, test=True, test_fraction=test_fraction,
+                              batch_rows=batch_rows, cache_prefix=str(cache_dir / "test"))
+    dtrain = xgb.ExtMemQuantileDMatrix(train_iter)
+    dtest = xgb.ExtMemQuantileDMatrix(test_iter, ref=dtrain)
+    logger.info(f"Training set: {dtrain.num_row()} samples")
+    logger.info(f"Test set: {dtest.num_row()} samples")
+    
+    params, num_boost_round = _booster_params(MODEL_PARAMS)
+    
+    booster = xgb.train(params, dtrain, num_boost_round=num_boost_round,
+                        evals=[(dtest, "test")], verbose_eval=False)
+    
+    accuracy, log_loss, cm = evaluate_in_chunks(booster, paths, label_encoder, test_fraction, batch_rows)
+    _log_accuracy(accuracy)
+    logger.info(f"Log-loss: {log_loss:.4f}")
+    logger.info("\nConfusion Matrix:")
+    logger.info(f"\n{cm}")
+    
+    # Wrap the booster so it is saved and served exactly like an in-memory model
+    return _as_classifier(booster), label_encoder
+
+
+def _booster_params(params: Dict) -> Tuple[Dict, int]:
+    """XGBClassifier parameters as xgb.train parameters and boosting rounds."""
+    params = dict(params)
+    num_boost_round = params.pop("n_estimators")
+    params["seed"] = params.pop("random_state")
+    params["nthread"] = params.pop("n_jobs")
+    params["tree_method"] = "hist"
+    params.pop("scale_pos_weight", None)  # Balancing comes from the per-row weights
+    return params, num_boost_round
+
+
+# Plausible ranges for real records; rows outside them are dropped during validation
+FEATURE_RANGES = {
+    "Temperature": (30.0, 45.0),
+    "Age": (0, 120),
+    "BMI": (10.0, 80.0),
+    "Fever_Duration": (0, 90),
+    "Compliance_Rate": (0, 100),
+    "Headache": (0, 1),
+    "Body_Ache": (0, 1),
+    "Fatigue": (0, 1),
+    "Chronic_Conditions": (0, 1),
+}
+
+PREVIOUS_MODEL_PATH = MODEL_DIR / "fever_model.previous.pkl"
+
+
+def _read_records(path: Path) -> pd.DataFrame:
+    if path.suffix == ".parquet":
+        return pd.read_parquet(path)
+    if path.suffix == ".csv":
+        return pd.read_csv(path)
+    raise ValueError(f"Unsupported record file: {path} (expected .csv or .parquet)")
+
+
+def load_labeled_records(sources: List[Path], label_column: str = TARGET_COLUMN) -> Tuple[pd.DataFrame, pd.Series]:
+    """
+    Load real labeled records exported in the API's normalized feature schema.
+    
+    Files must contain every FEATURE_NAMES column and label_column. Rows with
+    missing or non-numeric features, out-of-range values or unknown labels are
+    dropped, as are exact duplicates; each is logged.
+    """
+    paths = [path for source in sources for path in dataset_paths(source) if path.suffix in (".csv", ".parquet")]
+    if not paths:
+        raise FileNotFoundError(f"No .csv or .parquet record files found in {[str(s) for s in sources]}")
+    
+    frames = []
+    for path in paths:
+        frame = _read_records(path)
+        missing = [column for column in FEATURE_NAMES + [label_column] if column not in frame.columns]
+        if missing:
+            raise ValueError(f"{path} is missing required column(s): {missing}")
+        frames.append(frame[FEATURE_NAMES + [label_column]])
+    records = pd.concat(frames, ignore_index=True)
+    total = len(records)
+    
+    records[FEATURE_NAMES] = records[FEATURE_NAMES].apply(pd.to_numeric, errors="coerce")
+    valid = records[FEATURE_NAMES].notna().all(axis=1) & records[label_column].notna()
+    logger.info(f"Dropping {int((~valid).sum())} record(s) with missing or non-numeric values")
+    
+    in_range = pd.Series(True, index=records.index)
+    for column, (low, high) in FEATURE_RANGES.items():
+        in_range &= records[column].between(low, high)
+    logger.info(f"Dropping {int((valid & ~in_range).sum())} record(s) with out-of-range values")
+    
+    known = records[label_column].isin(DECISION_LABELS)
+    logger.info(f"Dropping {int((valid & in_range & ~known).sum())} record(s) with unknown labels")
+    
+    records = records[valid & in_range & known]
+    before = len(records)
+    records = records.drop_duplicates()
+    logger.info(f"Dropping {before - len(records)} duplicate record(s)")
+    
+    conflicting = records.duplicated(subset=FEATURE_NAMES, keep=False).sum()
+    if conflicting:
+        logger.warning(f"{conflicting} record(s) share identical features but have different labels")
+    
+    logger.info(f"Loaded {len(records)} of {total} record(s) from {len(paths)} file(s)")
+    return records[FEATURE_NAMES].reset_index(drop=True), records[label_column].astype(str).reset_index(drop=True)
+
+
+def load_saved_model() -> Tuple[xgb.XGBClassifier, LabelEncoder]:
+    """Load the currently deployed model and label encoder."""
+    if not MODEL_PATH.exists():
+        raise FileNotFoundError(f"No deployed model at {MODEL_PATH}. Train one first.")
+    with open(MODEL_PATH, 'rb') as f:
+        model = pickle.load(f)
+    with open(LABEL_ENCODER_PATH, 'rb') as f:
+        label_encoder = pickle.load(f)
+    return model, label_encoder
+
+
+def _holdout_metrics(model: xgb.XGBClassifier, X: pd.DataFrame, y_encoded: np.ndarray) -> Tuple[float, float]:
+    proba = model.predict_proba(X)
+    return (accuracy_score(y_encoded, proba.argmax(axis=1)),
+            log_loss(y_encoded, proba, labels=np.arange(proba.shape[1])))
+
+
+def warm_start_model(
+    X: pd.DataFrame,
+    y: pd.Series,
+    rounds: int = 50,
+    holdout_fraction: float = 0.2,
+    max_accuracy_drop: float = 0.0,
+    force: bool = False,
+    previous: Optional[Tuple[xgb.XGBClassifier, LabelEncoder]] = None,
+) -> Optional[Tuple[xgb.XGBClassifier, LabelEncoder]]:
+    """
+    Continue boosting the deployed model (or previous) on new records.
+    
+    The records are hash-split (see hash_split_mask) so a record stays in the
+    same split across refreshes. The deployed model gains `rounds` trees on the
+    training part, then both versions are compared on the hold-out. Returns
+    None (keep the deployed model) when the new version loses more than
+    max_accuracy_drop hold-out accuracy, unless force is set.
+    
+    The records need not contain every decision: boosting continues on the
+    booster with its own classes rather than re-inferring them from the labels.
+    """
+    logger.info("Warm-starting from the deployed model...")
+    previous, label_encoder = previous or load_saved_model()
+    y_encoded = label_encoder.transform(y)
+    
+    is_holdout = hash_split_mask(X, holdout_fraction)
+    X_train, y_train = X[~is_holdout], y_encoded[~is_holdout]
+    X_holdout, y_holdout = X[is_holdout], y_encoded[is_holdout]
+    logger.info(f"Training set: {len(X_train)} records")
+    logger.info(f"Hold-out set: {len(X_holdout)} records")
+    if not len(X_train):
+        raise ValueError("No training records left after the hold-out split")
+    
+    class_weights = _class_weights(y_encoded)
+    weights = np.array([class_weights[label] for label in y_train])
+    
+    missing = [str(label) for i, label in enumerate(label_encoder.classes_) if i not in set(y_train.tolist())]
+    if missing:
+        logger.info(f"No training records for {missing}; those classes only get trees fit to the other records")
+    
+    params, _rounds = _booster_params({**MODEL_PARAMS, "num_class": len(label_encoder.classes_)})
+    start = time.perf_counter()
+    booster = xgb.train(params, xgb.DMatrix(X_train, y_train, weight=weights), num_boost_round=rounds,
+                        xgb_model=previous.get_booster())
+    model = _as_classifier(booster)
+    logger.info(f"Added {rounds} boosting rounds in {time.perf_counter() - start:.2f}s "
+                f"({booster.num_boosted_rounds()} rounds total)")
+    
+    if not len(X_holdout):
+        logger.warning("Hold-out set is empty; cannot compare against the previous model")
+        return (model, label_encoder) if force else None
+    
+    absent = [str(label) for i, label in enumerate(label_encoder.classes_) if i not in set(y_holdout.tolist())]
+    if absent:
+        logger.warning(f"⚠️  Hold-out set has no {absent} records; the comparison does not cover those decisions.")
+    previous_accuracy, previous_loss = _holdout_metrics(previous, X_holdout, y_holdout)
+    accuracy, loss = _holdout_metrics(model, X_holdout, y_holdout)
+    logger.info(f"Previous model: accuracy {previous_accuracy:.4f}, log-loss {previous_loss:.4f}")
+    logger.info(f"Updated model:  accuracy {accuracy:.4f}, log-loss {loss:.4f}")
+    
+    if accuracy < previous_accuracy - max_accuracy_drop and not force:
+        logger.warning("⚠️  Updated model is worse on the hold-out set; keeping the deployed model.")
+        return None
+    return model, label_encoder
+
+
+def save_model(model: xgb.XGBClassifier, label_encoder: LabelEncoder, reference: Optional[pd.DataFrame] = None):
     """
     Save model and metadata to disk.
+    
+    With reference (training features), also save the histogram profile that
+    the API's drift monitor compares live traffic against.
     """
     logger.info(f"Saving model to {MODEL_PATH}...")
     
@@ -288,10 +1196,19 @@ def save_model(model: xgb.XGBClassifier, label_encoder: LabelEncoder):
     with open(FEATURE_NAMES_PATH, 'w') as f:
         json.dump(FEATURE_NAMES, f, indent=2)
     
+    # Save drift reference profile
+    if reference is not None:
+        reference = reference[FEATURE_NAMES]
+        profile = build_reference_profile(reference.to_numpy(), FEATURE_NAMES, model.predict_proba(reference),
+                                          label_encoder.classes_)
+        save_reference_profile(profile, REFERENCE_PROFILE_PATH)
+    
     logger.info("✅ Model saved successfully!")
     logger.info(f"   - Model: {MODEL_PATH}")
     logger.info(f"   - Label Encoder: {LABEL_ENCODER_PATH}")
     logger.info(f"   - Feature Names: {FEATURE_NAMES_PATH}")
+    if reference is not None:
+        logger.info(f"   - Reference Profile: {REFERENCE_PROFILE_PATH} ({len(reference)} rows)")
 
 
 def test_sample_predictions(model: xgb.XGBClassifier, label_encoder: LabelEncoder):
@@ -302,56 +1219,7 @@ def test_sample_predictions(model: xgb.XGBClassifier, label_encoder: LabelEncode
     logger.info("TESTING SAMPLE PREDICTIONS")
     logger.info("="*60)
     
-    # Test scenarios
-    scenarios = [
-        {
-            "name": "SCENARIO 1: Should CONTINUE",
-            "data": {
-                "Temperature": 39.2,
-                "Age": 28,
-                "BMI": 24.5,
-                "Fever_Duration": 3,
-                "Compliance_Rate": 85,
-                "Headache": 1,
-                "Body_Ache": 1,
-                "Fatigue": 1,
-                "Chronic_Conditions": 0
-            },
-            "expected": "CONTINUE"
-        },
-        {
-            "name": "SCENARIO 2: Should CONSULT_DOCTOR",
-            "data": {
-                "Temperature": 38.0,
-                "Age": 35,
-                "BMI": 26.0,  # Default BMI if not provided
-                "Fever_Duration": 4,
-                "Compliance_Rate": 60,
-                "Headache": 1,
-                "Body_Ache": 0,
-                "Fatigue": 0,
-                "Chronic_Conditions": 0
-            },
-            "expected": "CONSULT_DOCTOR"
-        },
-        {
-            "name": "SCENARIO 3: Should LIKELY_SAFE_TO_STOP",
-            "data": {
-                "Temperature": 37.1,
-                "Age": 25,
-                "BMI": 22.0,
-                "Fever_Duration": 7,
-                "Compliance_Rate": 95,
-                "Headache": 0,
-                "Body_Ache": 0,
-                "Fatigue": 0,
-                "Chronic_Conditions": 0
-            },
-            "expected": "LIKELY_SAFE_TO_STOP"
-        }
-    ]
-    
-    for scenario in scenarios:
+    for scenario in SAMPLE_SCENARIOS:
         logger.info(f"\n{scenario['name']}")
         logger.info("-" * 60)
         logger.info(f"Input Data: {json.dumps(scenario['data'], indent=2)}")
@@ -386,22 +1254,143 @@ def test_sample_predictions(model: xgb.XGBClassifier, label_encoder: LabelEncode
             logger.warning(f"⚠️  MISMATCH: Expected {scenario['expected']}, got {prediction}")
 
 
-def main():
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Train the fever recovery prediction model.")
+    parser.add_argument("--samples", type=int, default=5000, help="Number of synthetic samples to generate")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for synthetic data generation")
+    
+    dataset = parser.add_argument_group("synthetic dataset export")
+    dataset.add_argument("--write-dataset", type=Path, metavar="DIR",
+                         help="Write --samples synthetic rows to DIR as shards and exit without training")
+    dataset.add_argument("--chunk-size", type=int, default=300_000, help="Rows per shard")
+    dataset.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    dataset.add_argument("--format", choices=["parquet", "csv", "npy"], default="parquet", help="Shard format")
+    
+    out_of_core = parser.add_argument_group("out-of-core training")
+    out_of_core.add_argument("--data", type=Path, metavar="PATH",
+                             help="Train from on-disk shards (directory or file) instead of generating data in memory")
+    out_of_core.add_argument("--batch-rows", type=int, default=100_000, help="Rows read per batch")
+    out_of_core.add_argument("--test-fraction", type=float, default=0.2, help="Hash-split test fraction")
+    out_of_core.add_argument("--cache-dir", type=Path, default=None,
+                             help="External-memory cache directory (default: models/xgb_cache)")
+    
+    search = parser.add_argument_group("hyperparameter search")
+    search.add_argument("--search", action="store_true",
+                        help="Cross-validate a parameter space and train the final model with the best parameters")
+    search.add_argument("--search-space", type=Path, metavar="FILE",
+                        help="JSON object mapping parameter names to lists of values")
+    search.add_argument("--cv-folds", type=int, default=5, help="Stratified CV folds per trial")
+    search.add_argument("--search-workers", type=int, default=None, help="Parallel trials (default: CPU count)")
+    search.add_argument("--search-cpus", type=int, default=None, help="Total CPU budget shared by trials")
+    search.add_argument("--time-budget", type=float, default=None, help="Total search time budget in seconds")
+    search.add_argument("--max-trials", type=int, default=None, help="Randomly sample at most this many candidates")
+    search.add_argument("--early-stopping-rounds", type=int, default=20)
+    search.add_argument("--leaderboard", type=Path, default=SEARCH_LEADERBOARD_PATH, help="Leaderboard CSV path")
+    
+    compression = parser.add_argument_group("model compression")
+    compression.add_argument("--compress", action="store_true",
+                             help="Compare pruned, shallower and distilled models and save a compact one")
+    compression.add_argument("--max-accuracy-drop", type=float, default=0.005,
+                             help="Largest accuracy loss accepted for the compact model")
+    compression.add_argument("--max-log-loss-increase", type=float, default=0.02,
+                             help="Largest log-loss increase accepted for the compact model")
+    compression.add_argument("--compress-pick", metavar="NAME", default=None,
+                             help="Save this candidate from the compression report instead of auto-selecting")
+    compression.add_argument("--compression-report", type=Path, default=COMPRESSION_REPORT_PATH)
+    
+    cascade = parser.add_argument_group("cascade inference")
+    cascade.add_argument("--cascade", action="store_true",
+                         help="Also train a small first-stage model that answers confident requests early")
+    cascade.add_argument("--cascade-min-agreement", type=float, default=0.995,
+                         help="Agreement with the full model required on the requests the first stage answers")
+    cascade.add_argument("--cascade-depth", type=int, default=2, help="First-stage tree depth")
+    cascade.add_argument("--cascade-trees", type=int, default=10, help="First-stage boosting rounds")
+    
+    warm_start = parser.add_argument_group("incremental training on real records")
+    warm_start.add_argument("--warm-start", type=Path, nargs="+", metavar="PATH",
+                            help="Continue boosting the deployed model on labeled CSV/Parquet records")
+    warm_start.add_argument("--label-column", default=TARGET_COLUMN, help="Label column in the records")
+    warm_start.add_argument("--warm-start-rounds", type=int, default=50, help="Boosting rounds to add")
+    warm_start.add_argument("--holdout-fraction", type=float, default=0.2, help="Hash-split hold-out fraction")
+    warm_start.add_argument("--force", action="store_true",
+                            help="Save the updated model even if it does worse on the hold-out set")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
     """
     Main training pipeline.
     """
+    args = parse_args(argv)
+    
+    if args.write_dataset:
+        write_synthetic_dataset(args.write_dataset, args.samples, chunk_size=args.chunk_size,
+                                seed=args.seed, workers=args.workers, fmt=args.format)
+        return
+    
     logger.info("="*60)
     logger.info("FEVER RECOVERY PREDICTION MODEL TRAINING")
     logger.info("="*60)
     
-    # Generate synthetic data
-    X, y = generate_synthetic_data(n_samples=5000)
-    
-    # Train model
-    model, label_encoder = train_model(X, y)
+    cascade = None
+    if args.search and (args.warm_start or args.data):
+        logger.warning("--search needs in-memory training data and is ignored with --warm-start and --data.")
+    if args.compress and (args.warm_start or args.data):
+        logger.warning("--compress needs in-memory training data and is ignored with --warm-start and --data.")
+    if args.cascade and (args.warm_start or args.data):
+        logger.warning("--cascade needs in-memory training data and is ignored with --warm-start and --data.")
+    if args.warm_start:
+        # Refresh the deployed model with new real records
+        X, y = load_labeled_records(args.warm_start, label_column=args.label_column)
+        result = warm_start_model(X, y, rounds=args.warm_start_rounds,
+                                  holdout_fraction=args.holdout_fraction, force=args.force)
+        if result is None:
+            return
+        model, label_encoder = result
+        reference = X
+        shutil.copyfile(MODEL_PATH, PREVIOUS_MODEL_PATH)
+        logger.info(f"Previous model kept at {PREVIOUS_MODEL_PATH}")
+    elif args.data:
+        # Train from on-disk shards with bounded memory
+        model, label_encoder = train_model_out_of_core(
+            dataset_paths(args.data), test_fraction=args.test_fraction,
+            batch_rows=args.batch_rows, cache_dir=args.cache_dir
+        )
+        # The drift reference is profiled on the first batch rather than the whole dataset
+        reference, _labels = next(iter_dataset_batches(dataset_paths(args.data), args.batch_rows))
+    else:
+        # Generate synthetic data
+        X, y = generate_synthetic_data(n_samples=args.samples, seed=args.seed)
+        
+        params = None
+        if args.search:
+            space = json.loads(args.search_space.read_text()) if args.search_space else None
+            params = search_hyperparameters(
+                X, y, space=space, n_folds=args.cv_folds, workers=args.search_workers,
+                cpus=args.search_cpus, time_budget=args.time_budget, max_trials=args.max_trials,
+                early_stopping_rounds=args.early_stopping_rounds, leaderboard_path=args.leaderboard,
+                seed=args.seed
+            )
+        
+        # Train model
+        model, label_encoder = train_model(X, y, params=params)
+        reference = X
+        
+        if args.compress:
+            model = compress_model(model, label_encoder, X, y, max_accuracy_drop=args.max_accuracy_drop,
+                                   max_log_loss_increase=args.max_log_loss_increase,
+                                   pick=args.compress_pick, report_path=args.compression_report)
+        
+        if args.cascade:
+            # Fresh synthetic inputs, labeled by the full model, to distill the first stage from
+            X_transfer, _y = generate_synthetic_data(n_samples=args.samples, seed=args.seed + 1)
+            cascade = train_cascade(model, label_encoder, X, y, X_transfer, min_agreement=args.cascade_min_agreement,
+                                    max_depth=args.cascade_depth, n_estimators=args.cascade_trees)
     
     # Save model
-    save_model(model, label_encoder)
+    save_model(model, label_encoder, reference=reference)
+    if cascade is not None:
+        save_cascade(*cascade)
     
     # Test sample predictions
     test_sample_predictions(model, label_encoder)
@@ -27,6 +27,112 @@ const MEDICATION_TYPE_MAP: Record<string, MedicationCategory> = {
   other: "Other",
 };
 
+type PartialMedicationFields = Partial<Record<keyof MedicationData, unknown>>;
+
+const FIELD_LABELS: Partial<Record<keyof MedicationData, string>> = {
+  medication_name: "Medication",
+  medication_type: "Type",
+  dosage: "Dosage",
+  frequency: "Frequency",
+  duration_days: "Duration (days)",
+  confidence: "Confidence",
+};
+
+const describeExtractionError = (status: number, error: string | undefined): string => {
+  let errorMessage = error ?? "Failed to extract medication";
+
+  // Provide helpful error messages
+  if (status === 500 && errorMessage.includes("GEMINI_API_KEY")) {
+    errorMessage = "Gemini API key is not configured. Please set GEMINI_API_KEY in .env file.";
+  } else if (status === 500 && errorMessage.includes("Tesseract")) {
+    errorMessage = "Tesseract OCR is not installed. Please install Tesseract OCR to use this feature.";
+  } else if (status === 400 && errorMessage.includes("No image")) {
+    errorMessage = "No image was provided. Please select an image file.";
+  } else if (status === 400 && errorMessage.includes("Could not extract text")) {
+    errorMessage = "Could not read text from image. Please use a clearer, well-lit photo.";
+  }
+
+  return errorMessage;
+};
+
+const normalizeMedicationData = (payload: any): MedicationData => {
+  if (!payload?.success || !payload.medication_data) {
+    throw new Error("Unexpected response from extraction service");
+  }
+
+  const rawData = payload.medication_data;
+  const durationValue = rawData.duration_days;
+  let parsedDuration: number | null = null;
+
+  if (durationValue !== null && durationValue !== undefined && durationValue !== "") {
+    const numericDuration = Number(durationValue);
+    parsedDuration = Number.isFinite(numericDuration) ? numericDuration : null;
+  }
+
+  const confidenceLower = typeof rawData.confidence === "string"
+    ? rawData.confidence.toLowerCase()
+    : "low";
+
+  const medicationTypeValue = typeof rawData.medication_type === "string"
+    ? MEDICATION_TYPE_MAP[rawData.medication_type.trim().toLowerCase()] ?? "Other"
+    : "Other";
+
+  return {
+    medication_name: typeof rawData.medication_name === "string" ? rawData.medication_name.trim() : "",
+    medication_type: medicationTypeValue,
+    dosage: rawData.dosage ? String(rawData.dosage).trim() : null,
+    frequency: rawData.frequency ? String(rawData.frequency).trim() : null,
+    duration_days: parsedDuration,
+    confidence: ["high", "medium", "low"].includes(confidenceLower)
+      ? (confidenceLower as MedicationConfidence)
+      : "low",
+    extracted_text: rawData.extracted_text ?? payload?.extracted_text ?? "",
+  };
+};
+
+// Reads a text/event-stream body and calls onEvent for every complete event
+const readServerSentEvents = async (
+  response: Response,
+  onEvent: (event: string, data: any) => void,
+) => {
+  if (!response.body) {
+    throw new Error("Streaming is not supported by this browser");
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  for (;;) {
+    const { done, value } = await reader.read();
+    buffer += decoder.decode(value, { stream: !done });
+
+    let boundary = buffer.indexOf("\n\n");
+    while (boundary !== -1) {
+      const block = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      boundary = buffer.indexOf("\n\n");
+
+      let event = "message";
+      const dataLines: string[] = [];
+      for (const line of block.split("\n")) {
+        if (line.startsWith("event:")) {
+          event = line.slice(6).trim();
+        } else if (line.startsWith("data:")) {
+          dataLines.push(line.slice(5).trimStart());
+        }
+      }
+      if (dataLines.length > 0) {
+        onEvent(event, JSON.parse(dataLines.join("\n")));
+      }
+    }
+
+    if (done) {
+      return;
+    }
+  }
+};
+
 export function PrescriptionUploader({
   onMedicationExtracted,
   onError,
@@ -34,6 +140,9 @@ export function PrescriptionUploader({
   const [loading, setLoading] = useState(false);
   const [preview, setPreview] = useState<string | null>(null);
   const [selectedFile, setSelectedFile] = useState<File | null>(null);
+  const [stage, setStage] = useState<"ocr" | "gemini" | null>(null);
+  const [partialText, setPartialText] = useState<string | null>(null);
+  const [partialFields, setPartialFields] = useState<PartialMedicationFields>({});
 
   const handleFileSelect = (event: ChangeEvent<HTMLInputElement>) => {
     const file = event.target.files?.[0] ?? null;
@@ -64,14 +173,19 @@ export function PrescriptionUploader({
     }
 
     setLoading(true);
+    setStage("ocr");
+    setPartialText(null);
+    setPartialFields({});
 
     const formData = new FormData();
     formData.append("image", selectedFile);
 
     try {
-      const response = await fetch("/api/extract-medication", {
+      // Server-sent events: OCR text, then each medication field as Gemini produces it, then the result
+      const response = await fetch("/api/extract-medication/stream", {
         method: "POST",
         body: formData,
+        headers: { Accept: "text/event-stream" },
       });
 
       // Handle network errors
@@ -79,64 +193,42 @@ export function PrescriptionUploader({
         throw new Error("Cannot connect to extraction service. Please make sure the Flask server is running on port 5000.");
       }
 
-      const payload = await response.json().catch(() => null);
-
       if (!response.ok) {
-        let errorMessage = payload?.error ?? "Failed to extract medication";
-        
-        // Provide helpful error messages
-        if (response.status === 500 && errorMessage.includes("GEMINI_API_KEY")) {
-          errorMessage = "Gemini API key is not configured. Please set GEMINI_API_KEY in .env file.";
-        } else if (response.status === 500 && errorMessage.includes("Tesseract")) {
-          errorMessage = "Tesseract OCR is not installed. Please install Tesseract OCR to use this feature.";
-        } else if (response.status === 400 && errorMessage.includes("No image")) {
-          errorMessage = "No image was provided. Please select an image file.";
-        } else if (response.status === 400 && errorMessage.includes("Could not extract text")) {
-          errorMessage = "Could not read text from image. Please use a clearer, well-lit photo.";
-        }
-        
-        throw new Error(errorMessage);
+        const payload = await response.json().catch(() => null);
+        throw new Error(describeExtractionError(response.status, payload?.error));
       }
 
-      if (!payload?.success || !payload.medication_data) {
-        throw new Error("Unexpected response from extraction service");
-      }
+      let result: MedicationData | null = null;
+      let streamError: string | null = null;
 
-      const rawData = payload.medication_data;
-      const durationValue = rawData.duration_days;
-      let parsedDuration: number | null = null;
+      await readServerSentEvents(response, (event, data) => {
+        if (event === "status") {
+          setStage(data.stage);
+        } else if (event === "ocr") {
+          setPartialText(data.extracted_text);
+        } else if (event === "field") {
+          setPartialFields((fields) => ({ ...fields, [data.field]: data.value }));
+        } else if (event === "result") {
+          result = normalizeMedicationData(data);
+        } else if (event === "error") {
+          streamError = describeExtractionError(data.status, data.error);
+        }
+      });
 
-      if (durationValue !== null && durationValue !== undefined && durationValue !== "") {
-        const numericDuration = Number(durationValue);
-        parsedDuration = Number.isFinite(numericDuration) ? numericDuration : null;
+      if (streamError) {
+        throw new Error(streamError);
+      }
+      if (!result) {
+        throw new Error("Unexpected response from extraction service");
       }
 
-      const confidenceLower = typeof rawData.confidence === "string"
-        ? rawData.confidence.toLowerCase()
-        : "low";
-
-      const medicationTypeValue = typeof rawData.medication_type === "string"
-        ? MEDICATION_TYPE_MAP[rawData.medication_type.trim().toLowerCase()] ?? "Other"
-        : "Other";
-
-      const normalizedData: MedicationData = {
-        medication_name: typeof rawData.medication_name === "string" ? rawData.medication_name.trim() : "",
-        medication_type: medicationTypeValue,
-        dosage: rawData.dosage ? String(rawData.dosage).trim() : null,
-        frequency: rawData.frequency ? String(rawData.frequency).trim() : null,
-        duration_days: parsedDuration,
-        confidence: ["high", "medium", "low"].includes(confidenceLower)
-          ? (confidenceLower as MedicationConfidence)
-          : "low",
-        extracted_text: rawData.extracted_text ?? payload?.extracted_text ?? "",
-      };
-
-      onMedicationExtracted(normalizedData);
+      onMedicationExtracted(result);
     } catch (error) {
       const message = error instanceof Error ? error.message : "Unknown error occurred";
       onError(message);
     } finally {
       setLoading(false);
+      setStage(null);
     }
   };
 
@@ -182,7 +274,7 @@ export function PrescriptionUploader({
         {loading ? (
           <>
             <Loader2 className="mr-2 h-4 w-4 animate-spin" />
-            Processing...
+            {stage === "gemini" ? "Reading medication..." : "Reading prescription..."}
           </>
         ) : (
           <>
@@ -192,6 +284,22 @@ export function PrescriptionUploader({
         )}
       </Button>
 
+      {loading && (partialText || Object.keys(partialFields).length > 0) && (
+        <div className="mt-4 rounded-md border border-slate-200 bg-slate-50 p-3 text-sm">
+          {Object.entries(FIELD_LABELS).map(([field, label]) => {
+            const value = partialFields[field as keyof MedicationData];
+            return value === undefined || value === null ? null : (
+              <p key={field} className="text-slate-700">
+                <span className="font-medium">{label}:</span> {String(value)}
+              </p>
+            );
+          })}
+          {partialText && (
+            <p className="mt-2 text-xs text-slate-500 whitespace-pre-line line-clamp-4">{partialText}</p>
+          )}
+        </div>
+      )}
+
       <p className="text-xs text-slate-500 mt-3 text-center">
         Upload a clear prescription photo. We will extract the medication details automatically.
       </p>
@@ -49,11 +49,24 @@ serve(async (req) => {
       );
     }
 
+    // Only request the fields the app stores; the API skips computing the rest
+    const responseFields = [
+      "decision",
+      "recovery_probability",
+      "confidence",
+      "risk_assessment",
+      "explanation",
+      "key_factors",
+      "next_steps",
+      "warning_signs",
+      "doctor_note",
+    ].join(",");
+
     console.log(`Calling Python API at: ${PYTHON_API_URL}/api/predict-fever`);
 
     // Call Python Flask API with XGBoost model
     const response = await fetch(
-      `${PYTHON_API_URL}/api/predict-fever`,
+      `${PYTHON_API_URL}/api/predict-fever?fields=${responseFields}`,
       {
         method: "POST",
         headers: {
@@ -69,6 +82,21 @@ serve(async (req) => {
       const errorText = await response.text();
       console.error("Python API error", response.status, errorText);
 
+      // Load shedding: the API is busy, not broken, and says when to retry
+      const retryAfter = response.headers.get("Retry-After");
+      if (response.status === 503 && retryAfter) {
+        return new Response(
+          JSON.stringify({
+            error: "The prediction service is busy. Please try again shortly.",
+            retry_after: Number(retryAfter),
+          }),
+          {
+            status: 503,
+            headers: { ...corsHeaders, "Content-Type": "application/json", "Retry-After": retryAfter },
+          }
+        );
+      }
+
       if (response.status === 503) {
         return new Response(
           JSON.stringify({ 